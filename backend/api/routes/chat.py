@@ -3,12 +3,15 @@ AI Health Chatbot routes (protected, per-user sessions).
 """
 import logging
 from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, List
 
+from core.database import get_db
 from core.deps import get_current_user
 from models.database import User
 from schemas.schemas import ChatInput, ChatResponse
 from services.chatbot import chat_with_gemini
+from services.health_index import retrieve_context, format_context
 from core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -21,9 +24,10 @@ _user_sessions: Dict[str, List[dict]] = {}
 @router.post("/message", response_model=ChatResponse)
 async def send_message(
     data: ChatInput,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Send a message to the AI health chatbot."""
+    """Send a message to the AI health chatbot, grounded in the user's own records."""
     user_id = current_user.id
 
     if user_id not in _user_sessions:
@@ -32,10 +36,14 @@ async def send_message(
     history = _user_sessions[user_id]
     history.append({"role": "user", "content": data.message})
 
+    # Only the top-k relevant records go into the prompt
+    snippets = await retrieve_context(db, user_id, data.message)
+
     result = await chat_with_gemini(
         user_message=data.message,
         chat_history=history,
         gemini_api_key=settings.GEMINI_API_KEY,
+        context=format_context(snippets),
     )
 
     history.append({"role": "assistant", "content": result["content"]})
@@ -10,6 +10,10 @@ from typing import Dict, Any
 from core.database import get_db
 from core.deps import get_current_user
 from models.database import User, RiskPrediction, SymptomLog, MedicalReport
+from services.risk_percentiles import stored_percentile
+from services.risk_history import latest_per_disease, risk_trend
+
+DASHBOARD_TREND_POINTS = 20  # per disease
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
@@ -23,28 +27,28 @@ async def get_dashboard_summary(
     """Get aggregated health dashboard data for the current user."""
     user_id = current_user.id
 
-    # Latest risk predictions
-    risk_result = await db.execute(
-        select(RiskPrediction).where(RiskPrediction.user_id == user_id)
-        .order_by(desc(RiskPrediction.created_at)).limit(10)
+    # Latest prediction per disease (window query) and a downsampled trend
+    latest_risks = {
+        r.disease_type: {
+            "disease_type": r.disease_type,
+            "risk_score": r.risk_score,
+            "risk_category": r.risk_category,
+            **stored_percentile(r),
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        }
+        for r in await latest_per_disease(db, user_id)
+    }
+
+    trend = await risk_trend(db, user_id, DASHBOARD_TREND_POINTS)
+    risk_trend_points = sorted(
+        (
+            {"disease_type": disease, **point}
+            for disease, series in trend.items()
+            for point in series["points"]
+        ),
+        key=lambda p: p["created_at"],
+        reverse=True,
     )
-    risks = risk_result.scalars().all()
-
-    latest_risks = {}
-    for r in risks:
-        if r.disease_type not in latest_risks:
-            latest_risks[r.disease_type] = {
-                "disease_type": r.disease_type,
-                "risk_score": r.risk_score,
-                "risk_category": r.risk_category,
-                "created_at": r.created_at.isoformat() if r.created_at else None,
-            }
-
-    risk_trend = [
-        {"disease_type": r.disease_type, "risk_score": r.risk_score,
-         "created_at": r.created_at.isoformat() if r.created_at else None}
-        for r in risks
-    ]
 
     import asyncio
     
@@ -93,7 +97,7 @@ async def get_dashboard_summary(
         "user_name": current_user.full_name or current_user.email.split("@")[0],
         "health_score": health_score,
         "latest_risks": latest_risks,
-        "risk_trend": risk_trend,
+        "risk_trend": risk_trend_points,
         "total_assessments": total_assessments,
         "total_symptom_checks": total_symptom_checks,
         "total_reports": total_reports,
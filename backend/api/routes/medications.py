@@ -12,6 +12,8 @@ from datetime import datetime, timezone
 from core.database import get_db
 from core.deps import get_current_user
 from models.database import User, Medication, MedicationLog
+from services.health_index import index_record
+from services.medication_adherence import ADHERENCE_WINDOWS, adherence_summary, record_dose
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/medications", tags=["Medication Tracker"])
@@ -63,7 +65,8 @@ async def add_medication(
         notes=data.notes,
     )
     db.add(med)
-    await db.flush()
+    await db.commit()
+    index_record(current_user.id, "medication", med)
     return {"id": med.id, "name": med.name, "dosage": med.dosage, "frequency": med.frequency}
 
 
@@ -81,6 +84,8 @@ async def remove_medication(
     if not med:
         raise HTTPException(status_code=404, detail="Medication not found.")
     med.is_active = False
+    await db.commit()
+    index_record(current_user.id, "medication", med)
     return {"message": "Medication deactivated."}
 
 
@@ -105,9 +110,11 @@ async def log_medication(
         user_id=current_user.id,
         taken=data.taken,
         notes=data.notes,
+        logged_at=datetime.now(timezone.utc),
     )
     db.add(log)
     await db.flush()
+    await record_dose(db, med.id, current_user.id, data.taken, log.logged_at.date())
     return {"message": "Medication logged.", "taken": data.taken}
 
 
@@ -118,12 +125,27 @@ async def medication_history(
 ):
     """Get medication adherence history."""
     result = await db.execute(
-        select(MedicationLog).where(MedicationLog.user_id == current_user.id)
+        select(MedicationLog, Medication.name)
+        .join(Medication, Medication.id == MedicationLog.medication_id)
+        .where(MedicationLog.user_id == current_user.id)
         .order_by(desc(MedicationLog.logged_at)).limit(50)
     )
-    logs = result.scalars().all()
     return [
-        {"medication_id": l.medication_id, "taken": l.taken,
+        {"medication_id": l.medication_id, "medication_name": name, "taken": l.taken,
          "notes": l.notes, "logged_at": l.logged_at.isoformat() if l.logged_at else None}
-        for l in logs
+        for l, name in result.all()
     ]
+
+
+@router.get("/adherence")
+async def medication_adherence(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Per-medication taken / missed counts and adherence over 7, 30 and 90 days, with streaks."""
+    as_of = datetime.now(timezone.utc).date()
+    return {
+        "as_of": as_of.isoformat(),
+        "windows": [f"{w}d" for w in ADHERENCE_WINDOWS],
+        "medications": await adherence_summary(db, current_user.id, as_of),
+    }
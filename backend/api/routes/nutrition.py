@@ -1,45 +1,57 @@
 """
 Nutrition & Lifestyle routes (protected).
 """
+import json
 import logging
 from fastapi import APIRouter, Depends
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Any
+from typing import List
 from datetime import datetime, timezone
 
 from core.database import get_db
 from core.deps import get_current_user
-from models.database import User, NutritionPlan
-from schemas.schemas import NutritionOut
-from services.nutrition_engine import generate_nutrition_plan
+from models.database import User, UserProfile, NutritionPlan, NutritionPlanContent
+from schemas.schemas import NutritionOut, NutritionRiskInput
+from services.meal_planner import diet_targets
+from services.nutrition_engine import CachedPlan, cached_plan, plan_key
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/nutrition", tags=["Nutrition & Lifestyle"])
 
 
+async def _store_content(db: AsyncSession, entry: CachedPlan) -> None:
+    """Insert the plan body unless a row with its hash already exists."""
+    if await db.get(NutritionPlanContent, entry.sha256) is None:
+        try:
+            async with db.begin_nested():
+                db.add(NutritionPlanContent(sha256=entry.sha256, body=json.loads(entry.body_json)))
+        except IntegrityError:
+            pass  # stored concurrently by another request
+
+
 @router.post("/plan", response_model=NutritionOut)
 async def get_nutrition_plan(
-    risk_predictions: List[Dict[str, Any]],
+    risk_predictions: List[NutritionRiskInput],
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """Generate a personalized nutrition and lifestyle plan."""
-    result = generate_nutrition_plan(risk_predictions)
+    profile = (await db.execute(
+        select(UserProfile).where(UserProfile.user_id == current_user.id)
+    )).scalar_one_or_none()
+    key = plan_key([r.model_dump() for r in risk_predictions])
+    entry = cached_plan(key, diet_targets(dict(key), profile))
+    await _store_content(db, entry)
 
     plan = NutritionPlan(
         user_id=current_user.id,
-        risk_context=result["risk_context"],
-        diet_recommendations=result["diet_recommendations"],
-        lifestyle_recommendations=result["lifestyle_recommendations"],
+        content_sha256=entry.sha256,
+        created_at=datetime.now(timezone.utc),
     )
     db.add(plan)
-    await db.flush()
+    await db.commit()
 
     logger.info(f"Nutrition plan for user {current_user.id}")
-    return NutritionOut(
-        id=plan.id,
-        risk_context=result["risk_context"],
-        diet_recommendations=result["diet_recommendations"],
-        lifestyle_recommendations=result["lifestyle_recommendations"],
-        created_at=plan.created_at or datetime.now(timezone.utc),
-    )
+    return NutritionOut(id=plan.id, created_at=plan.created_at, **json.loads(entry.body_json))
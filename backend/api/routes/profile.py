@@ -10,6 +10,8 @@ from core.database import get_db
 from core.deps import get_current_user
 from models.database import User, UserProfile
 from schemas.schemas import ProfileUpdate, ProfileOut
+from services.health_index import invalidate_user_index
+from services.reference_ranges import reflag_user_reports
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/profile", tags=["User Profile"])
@@ -52,6 +54,13 @@ async def update_profile(
     for key, value in update_data.items():
         setattr(profile, key, value)
 
+    # Lab reference ranges depend on age and sex
+    if {"date_of_birth", "gender"} & update_data.keys():
+        count = await reflag_user_reports(db, current_user.id, profile)
+        await db.commit()
+        invalidate_user_index(current_user.id)  # indexed report texts include the old flags
+        logger.info(f"Re-flagged {count} reports for user {current_user.id} after profile change")
+
     await db.flush()
     logger.info(f"Profile updated for user {current_user.id}")
     return profile
@@ -1,102 +1,142 @@
 """
 Medical Report upload and analysis routes (protected).
-Uses Gemini Vision for AI analysis when GEMINI_API_KEY is set and file is an image.
+Uploads are stored and queued; analysis (local text-layer parsing for PDFs, Gemini
+Vision for images and unparseable PDFs when GEMINI_API_KEY is set, simulated
+extraction otherwise) runs in the background job queue.
 """
+import asyncio
+import json
 import logging
 import os
-import uuid
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Query
+from fastapi.responses import StreamingResponse, FileResponse, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, delete
 
-from core.database import get_db
+from core.database import get_db, AsyncSessionLocal
 from core.deps import get_current_user
 from core.config import settings
-from models.database import User, MedicalReport
-from services.report_analyzer import (
-    analyze_report_with_gemini,
-    simulate_lab_extraction,
-    generate_ai_summary_from_values,
+from models.database import User, MedicalReport, ReportAnalysisJob, StoredFile
+from services.blob_store import acquire_blob, release_blob
+from services.health_index import index_record, unindex_record
+from services.previews import (
+    preview_key, preview_status, preview_url, LIST_PREVIEW_SIZE, DETAIL_PREVIEW_SIZE, PREVIEW_SIZES,
+)
+from services.reference_ranges import apply_reference_ranges
+from services.report_jobs import report_jobs, TERMINAL_STATUSES
+from services.storage import storage, storage_key, file_url_for
+from services.uploads import (
+    stage_upload, publish_upload, discard_upload, UploadTooLarge, MAX_UPLOAD_BYTES, UPLOAD_TOO_LARGE_DETAIL,
 )
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/reports", tags=["Medical Reports"])
 
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-ALLOWED_TYPES = {"application/pdf", "image/png", "image/jpeg", "image/jpg"}
+# Stored files are named <sha256>.<ext>, the extension fixed by the validated content type
+# (never taken from the client's filename)
+FILE_EXTENSIONS = {"application/pdf": "pdf", "image/png": "png", "image/jpeg": "jpg", "image/jpg": "jpg"}
+ALLOWED_TYPES = set(FILE_EXTENSIONS)
 IMAGE_TYPES = {"image/png", "image/jpeg", "image/jpg"}
 
+SSE_POLL_SECONDS = 2.0
+SSE_MAX_SECONDS = 600
+
+# Stored files never change under a given report (content-addressed / uuid names);
+# private because every response is behind auth
+FILE_CACHE_CONTROL = "private, max-age=31536000, immutable"
 
-@router.post("/upload")
+
+@router.post("/upload", status_code=202)
 async def upload_report(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Upload a medical report for AI analysis (Gemini Vision for images when API key is set)."""
+    """
+    Upload a medical report; analysis runs in the background (poll /status or stream /events).
+    Byte-identical re-uploads share the stored file and reuse its cached analysis.
+    """
     if file.content_type not in ALLOWED_TYPES:
         raise HTTPException(status_code=400, detail="Only PDF, PNG, and JPG files are allowed.")
 
-    if file.size and file.size > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size cannot exceed 10MB.")
-
-    # Save file
-    ext = file.filename.split(".")[-1] if file.filename else "bin"
-    saved_name = f"{uuid.uuid4()}.{ext}"
-    save_path = os.path.join(UPLOAD_DIR, saved_name)
-
-    content = await file.read()
-    with open(save_path, "wb") as f:
-        f.write(content)
-
-    # AI analysis: Gemini Vision for images when key is set, else simulated
-    values: dict = {}
-    abnormal: list = []
-    ai_summary: str
-
-    if file.content_type in IMAGE_TYPES and settings.GEMINI_API_KEY:
-        try:
-            values, abnormal, ai_summary = analyze_report_with_gemini(
-                content,
-                file.content_type or "image/jpeg",
-                settings.GEMINI_API_KEY,
-            )
-            logger.info("Report analyzed with Gemini Vision.")
-        except Exception as e:
-            logger.warning(f"Gemini report analysis failed, using fallback: {e}")
-            extracted = simulate_lab_extraction(file.filename or "report")
-            values = extracted["values"]
-            abnormal = extracted["abnormal"]
-            ai_summary = generate_ai_summary_from_values(values, abnormal)
-    else:
-        # PDF or no Gemini key: use simulated extraction
-        extracted = simulate_lab_extraction(file.filename or "report")
-        values = extracted["values"]
-        abnormal = extracted["abnormal"]
-        ai_summary = generate_ai_summary_from_values(values, abnormal)
+    # The raw body is capped by UploadSizeLimit; this is the limit on the file itself
+    if file.size and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+
+    # Stage the file (streamed in chunks, hashed on the fly)
+    ext = FILE_EXTENSIONS[file.content_type]
+    try:
+        staged = await stage_upload(file)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+
+    # Reference the blob, then publish under its key (the same bytes may be stored under
+    # another extension) before this transaction commits; see services.uploads
+    try:
+        blob = await acquire_blob(
+            db, staged.sha256, file_url_for(f"{staged.sha256}.{ext}"), staged.size, file.content_type
+        )
+        await publish_upload(staged, storage_key(blob.file_url), file.content_type)
+    finally:
+        await discard_upload(staged)
 
     report = MedicalReport(
         user_id=current_user.id,
         file_name=file.filename or "unknown",
-        file_url=f"/uploads/{saved_name}",
+        file_url=blob.file_url,
         file_type="pdf" if "pdf" in (file.content_type or "") else "image",
-        extracted_values=values,
-        ai_summary=ai_summary,
-        abnormal_flags=abnormal,
+        file_size=staged.size,
+        file_sha256=staged.sha256,
+        analysis_status="pending",
     )
+
+    if blob.analysis_status == "completed":
+        # Identical file analyzed before — reuse instead of paying for another analysis
+        report.ocr_text = blob.ocr_text
+        report.extracted_values = blob.extracted_values
+        report.abnormal_flags = blob.abnormal_flags
+        report.ai_summary = blob.ai_summary
+        report.analysis_status = "completed"
+        await apply_reference_ranges(db, report)
+        db.add(report)
+        await db.commit()
+        index_record(current_user.id, "report", report)
+        logger.info(f"Report uploaded for user {current_user.id}: {file.filename} (reused analysis)")
+        return {
+            "id": report.id,
+            "job_id": None,
+            "file_name": report.file_name,
+            "file_type": report.file_type,
+            "analysis_status": report.analysis_status,
+            "status_url": f"/api/v1/reports/{report.id}/status",
+            "events_url": f"/api/v1/reports/{report.id}/events",
+            "created_at": report.created_at.isoformat() if report.created_at else None,
+        }
+
     db.add(report)
     await db.flush()
 
-    logger.info(f"Report uploaded for user {current_user.id}: {file.filename}")
+    job = ReportAnalysisJob(
+        report_id=report.id,
+        user_id=current_user.id,
+        content_type=file.content_type or "application/octet-stream",
+        max_attempts=settings.REPORT_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    # Commit before waking the workers so they can see the job
+    await db.commit()
+    report_jobs.notify()
+
+    logger.info(f"Report uploaded for user {current_user.id}: {file.filename} (job {job.id})")
     return {
         "id": report.id,
+        "job_id": job.id,
         "file_name": report.file_name,
         "file_type": report.file_type,
-        "extracted_values": report.extracted_values,
-        "ai_summary": report.ai_summary,
-        "abnormal_flags": report.abnormal_flags,
+        "analysis_status": report.analysis_status,
+        "status_url": f"/api/v1/reports/{report.id}/status",
+        "events_url": f"/api/v1/reports/{report.id}/events",
         "created_at": report.created_at.isoformat() if report.created_at else None,
     }
 
@@ -106,21 +146,25 @@ async def list_reports(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List all reports for the current user."""
+    """List all reports for the current user, with a small preview thumbnail URL when available."""
     result = await db.execute(
-        select(MedicalReport).where(MedicalReport.user_id == current_user.id)
+        select(MedicalReport, StoredFile.preview_sizes)
+        .outerjoin(StoredFile, StoredFile.sha256 == MedicalReport.file_sha256)
+        .where(MedicalReport.user_id == current_user.id)
         .order_by(desc(MedicalReport.created_at))
     )
-    reports = result.scalars().all()
     return [
         {
             "id": r.id,
             "file_name": r.file_name,
             "file_type": r.file_type,
             "abnormal_flags": r.abnormal_flags,
+            "analysis_status": r.analysis_status or "completed",
+            "preview_url": preview_url(r.id, preview_sizes, LIST_PREVIEW_SIZE),
+            "preview_status": preview_status(preview_sizes),
             "created_at": r.created_at.isoformat() if r.created_at else None,
         }
-        for r in reports
+        for r, preview_sizes in result.all()
     ]
 
 
@@ -132,22 +176,203 @@ async def get_report(
 ):
     """Get a specific report's details."""
     result = await db.execute(
-        select(MedicalReport).where(
+        select(MedicalReport, StoredFile.preview_sizes)
+        .outerjoin(StoredFile, StoredFile.sha256 == MedicalReport.file_sha256)
+        .where(
             MedicalReport.id == report_id,
             MedicalReport.user_id == current_user.id,
         )
     )
-    report = result.scalar_one_or_none()
-    if not report:
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Report not found.")
+    report, preview_sizes = row
     return {
         "id": report.id,
         "file_name": report.file_name,
         "file_type": report.file_type,
         "extracted_values": report.extracted_values,
         "ai_summary": report.ai_summary,
+        "summary_needs_reanalysis": bool(report.summary_needs_reanalysis),
         "abnormal_flags": report.abnormal_flags,
+        "analysis_status": report.analysis_status or "completed",
+        "file_url": f"/api/v1/reports/{report.id}/file",
+        "preview_url": preview_url(report.id, preview_sizes, DETAIL_PREVIEW_SIZE),
+        "preview_status": preview_status(preview_sizes),
         "created_at": report.created_at.isoformat() if report.created_at else None,
     }
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison per RFC 9110 §13.1.2 (If-None-Match)."""
+    if if_none_match.strip() == "*":
+        return True
+    tags = (t.strip() for t in if_none_match.split(","))
+    return any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+
+@router.get("/{report_id}/file")
+async def download_report_file(
+    report_id: str,
+    request: Request,
+    size: Optional[int] = Query(None, description="Serve the preview thumbnail of this size instead"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Serve the original uploaded file (or a preview thumbnail) to its owner. Supports
+    Range/If-Range (resumable downloads), a strong content-hash ETag with 304 on
+    revalidation, and immutable caching.
+    """
+    result = await db.execute(
+        select(MedicalReport.file_url, MedicalReport.file_name, MedicalReport.file_sha256, StoredFile.preview_sizes)
+        .outerjoin(StoredFile, StoredFile.sha256 == MedicalReport.file_sha256)
+        .where(
+            MedicalReport.id == report_id,
+            MedicalReport.user_id == current_user.id,
+        )
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Report not found.")
+
+    key = storage_key(row.file_url)
+    file_name = row.file_name
+    if size is not None:
+        if size not in (row.preview_sizes or []):
+            raise HTTPException(status_code=404, detail="Preview not available.")
+        key = preview_key(key, size)
+        file_name = None
+    try:
+        path = await storage.local_path(key)
+        stat_result = await asyncio.to_thread(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Report file not found.")
+
+    # Legacy uploads aren't hashed; their uuid-named files are never rewritten either
+    if row.file_sha256:
+        etag = f'"{row.file_sha256}-{size}"' if size is not None else f'"{row.file_sha256}"'
+    else:
+        etag = f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+    headers = {"ETag": etag, "Cache-Control": FILE_CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # FileResponse handles Range/If-Range and uses the server's zero-copy
+    # http.response.pathsend extension for full-file responses when available
+    return FileResponse(
+        path,
+        headers=headers,
+        filename=file_name,
+        content_disposition_type="inline",
+        stat_result=stat_result,
+    )
+
+
+async def _job_status(db: AsyncSession, report_id: str, user_id: str) -> dict:
+    result = await db.execute(
+        select(MedicalReport.analysis_status, ReportAnalysisJob)
+        .outerjoin(ReportAnalysisJob, ReportAnalysisJob.report_id == MedicalReport.id)
+        .where(MedicalReport.id == report_id, MedicalReport.user_id == user_id)
+        .order_by(desc(ReportAnalysisJob.created_at)).limit(1)
+    )
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Report not found.")
+    analysis_status, job = row
+    return {
+        "report_id": report_id,
+        "analysis_status": analysis_status or "completed",
+        "job_id": job.id if job else None,
+        "job_status": job.status if job else "succeeded",
+        "attempts": job.attempts if job else 0,
+        "pages_total": job.pages_total if job else None,
+        "pages_done": job.pages_done if job else None,
+        "next_run_at": job.next_run_at.isoformat() if job and job.status == "queued" and job.next_run_at else None,
+        "last_error": job.last_error if job else None,
+    }
+
+
+@router.get("/{report_id}/status")
+async def get_report_status(
+    report_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Poll the analysis status of an uploaded report."""
+    return await _job_status(db, report_id, current_user.id)
+
+
+@router.get("/{report_id}/events")
+async def stream_report_status(
+    report_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Server-Sent Events stream of analysis status changes; ends when the job finishes."""
+    initial = await _job_status(db, report_id, current_user.id)
+    user_id = current_user.id
+
+    async def events():
+        status = initial
+        last = None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SSE_MAX_SECONDS
+        while True:
+            payload = json.dumps(status)
+            if payload != last:
+                yield f"event: status\ndata: {payload}\n\n"
+                last = payload
+            else:
+                yield ": keep-alive\n\n"
+            if status["job_status"] in TERMINAL_STATUSES or loop.time() > deadline:
+                return
+            await report_jobs.wait_for_change(report_id, SSE_POLL_SECONDS)
+            async with AsyncSessionLocal() as session:
+                try:
+                    status = await _job_status(session, report_id, user_id)
+                except HTTPException:
+                    return  # the report was deleted
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/{report_id}")
+async def delete_report(
+    report_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Delete a report; the stored file is removed once no report references it."""
+    result = await db.execute(
+        select(MedicalReport).where(
+            MedicalReport.id == report_id,
+            MedicalReport.user_id == current_user.id,
+        )
+    )
+    report = result.scalar_one_or_none()
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found.")
+
+    if report.file_sha256:
+        orphaned_url = await release_blob(db, report.file_sha256)
+    else:
+        orphaned_url = report.file_url  # legacy upload, not content-addressed
+    # SQLite doesn't enforce ON DELETE CASCADE: remove the jobs so no worker picks them up
+    await db.execute(delete(ReportAnalysisJob).where(ReportAnalysisJob.report_id == report_id))
+    await db.delete(report)
+    if orphaned_url:
+        # Before the commit: a concurrent upload of the same bytes waits for it and re-publishes
+        key = storage_key(orphaned_url)
+        for k in [key] + [preview_key(key, s) for s in PREVIEW_SIZES]:
+            await storage.delete(k)
+    await db.commit()
+    report_jobs.report_changed(report_id)
+    unindex_record(current_user.id, "report", report_id)
+    return {"message": "Report deleted."}
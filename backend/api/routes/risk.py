@@ -1,21 +1,44 @@
 """
 Disease Risk Prediction routes (protected).
 """
+import asyncio
 import logging
-from fastapi import APIRouter, Depends
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
+from typing import List, Optional
 
 from core.database import get_db
 from core.deps import get_current_user
-from models.database import User, RiskPrediction
-from schemas.schemas import RiskInput, RiskResult
-from services.risk_prediction import predict_diabetes_risk, predict_heart_disease_risk
+from models.database import User, RiskPrediction, generate_uuid
+from schemas.schemas import RiskInput, RiskResult, RiskBatchInput, RiskWhatIfInput
+from services.risk_prediction import (
+    predict_diabetes_risk,
+    predict_heart_disease_risk,
+    predict_risk_batch,
+    predict_all_risks,
+    what_if_grid,
+    RISK_CATEGORIES,
+)
+from services.health_index import index_record, invalidate_user_index
+from services.risk_percentiles import risk_percentiles, stored_percentile
+from services.risk_history import latest_per_disease, risk_trend, TREND_MAX_POINTS
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/risk", tags=["Risk Prediction"])
 
 
+def _rank(result: dict, age) -> dict:
+    """Count a committed prediction in the cohort histograms and return its percentile fields."""
+    risk_percentiles.record(result["disease_type"], [result["risk_score"]], [age])
+    rank = risk_percentiles.percentile(result["disease_type"], result["risk_score"], age)
+    if rank is None:
+        return {"percentile": None, "percentile_cohort": None}
+    return {"percentile": rank["percentile"], "percentile_cohort": rank["cohort"]}
+
+
 @router.post("/diabetes", response_model=RiskResult)
 async def predict_diabetes(
     data: RiskInput,
@@ -34,9 +57,12 @@ async def predict_diabetes(
         input_data=input_data,
         feature_importance=result["feature_importance"],
         explanation=result["explanation"],
+        model_version=result["model_version"],
     )
     db.add(prediction)
-    await db.flush()
+    await db.commit()
+    index_record(current_user.id, "risk", prediction)
+    rank = _rank(result, data.age)
 
     logger.info(f"Diabetes risk for user {current_user.id}: {result['risk_category']}")
     return RiskResult(
@@ -46,6 +72,8 @@ async def predict_diabetes(
         risk_category=result["risk_category"],
         feature_importance=result["feature_importance"],
         explanation=result["explanation"],
+        model_version=result["model_version"],
+        **rank,
         created_at=prediction.created_at or datetime.now(timezone.utc),
     )
 
@@ -68,9 +96,12 @@ async def predict_heart(
         input_data=input_data,
         feature_importance=result["feature_importance"],
         explanation=result["explanation"],
+        model_version=result["model_version"],
     )
     db.add(prediction)
-    await db.flush()
+    await db.commit()
+    index_record(current_user.id, "risk", prediction)
+    rank = _rank(result, data.age)
 
     logger.info(f"Heart risk for user {current_user.id}: {result['risk_category']}")
     return RiskResult(
@@ -80,5 +111,182 @@ async def predict_heart(
         risk_category=result["risk_category"],
         feature_importance=result["feature_importance"],
         explanation=result["explanation"],
+        model_version=result["model_version"],
+        **rank,
         created_at=prediction.created_at or datetime.now(timezone.utc),
     )
+
+
+@router.post("/assess", response_model=List[RiskResult])
+async def assess_all(
+    data: RiskInput,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Score the input against every registered disease model at once and store
+    all predictions with one batched INSERT, instead of one request per disease.
+    """
+    input_data = data.model_dump()
+    results = predict_all_risks(input_data)
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "id": generate_uuid(),
+            "user_id": current_user.id,
+            "disease_type": result["disease_type"],
+            "risk_score": result["risk_score"],
+            "risk_category": result["risk_category"],
+            "input_data": input_data,
+            "feature_importance": result["feature_importance"],
+            "explanation": result["explanation"],
+            "model_version": result["model_version"],
+            "created_at": now,
+        }
+        for result in results
+    ]
+    await db.execute(insert(RiskPrediction), rows)
+    await db.commit()
+    for row in rows:
+        index_record(current_user.id, "risk", RiskPrediction(**row))
+    ranks = [_rank(result, data.age) for result in results]
+
+    logger.info(
+        f"Risk assessment for user {current_user.id}: "
+        + ", ".join(f"{r['disease_type']}={r['risk_category']}" for r in results)
+    )
+    return [
+        RiskResult(
+            id=row["id"],
+            disease_type=row["disease_type"],
+            risk_score=row["risk_score"],
+            risk_category=row["risk_category"],
+            feature_importance=row["feature_importance"],
+            explanation=row["explanation"],
+            model_version=row["model_version"],
+            **rank,
+            created_at=now,
+        )
+        for row, rank in zip(rows, ranks)
+    ]
+
+
+@router.post("/batch")
+async def predict_batch(
+    data: RiskBatchInput,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Score many records for one disease in a single vectorized pass, e.g. to
+    screen a cohort (persist=false) or backfill predictions for imported data.
+    Stored rows are written with one bulk INSERT. Percentiles rank each score
+    against stored predictions (including this batch when persisted).
+    """
+    inputs = [r.model_dump(exclude={"measured_at"}) for r in data.records]
+    results = await asyncio.to_thread(predict_risk_batch, data.disease_type, inputs)
+
+    ids = [None] * len(results)
+    if data.persist:
+        now = datetime.now(timezone.utc)
+        ids = [generate_uuid() for _ in results]
+        await db.execute(
+            insert(RiskPrediction),
+            [
+                {
+                    "id": prediction_id,
+                    "user_id": current_user.id,
+                    "disease_type": result["disease_type"],
+                    "risk_score": result["risk_score"],
+                    "risk_category": result["risk_category"],
+                    "input_data": input_data,
+                    "feature_importance": result["feature_importance"],
+                    "explanation": result["explanation"],
+                    "model_version": result["model_version"],
+                    "created_at": record.measured_at or now,
+                }
+                for prediction_id, result, input_data, record in zip(ids, results, inputs, data.records)
+            ],
+        )
+        await db.commit()
+        invalidate_user_index(current_user.id)
+        risk_percentiles.record(data.disease_type, [r["risk_score"] for r in results], [d["age"] for d in inputs])
+
+    ranks = [
+        risk_percentiles.percentile(data.disease_type, r["risk_score"], d["age"]) or {}
+        for r, d in zip(results, inputs)
+    ]
+    counts = Counter(r["risk_category"] for r in results)
+    logger.info(f"Batch {data.disease_type} risk for user {current_user.id}: {len(results)} records")
+    return {
+        "disease_type": data.disease_type,
+        "count": len(results),
+        "persisted": data.persist,
+        "model_version": results[0]["model_version"],
+        "categories": {c: counts.get(c, 0) for c in RISK_CATEGORIES},
+        "results": [
+            {
+                "id": prediction_id,
+                "risk_score": r["risk_score"],
+                "risk_category": r["risk_category"],
+                "feature_importance": r["feature_importance"],
+                "percentile": rank.get("percentile"),
+                "percentile_cohort": rank.get("cohort"),
+            }
+            for prediction_id, r, rank in zip(ids, results, ranks)
+        ],
+    }
+
+
+@router.post("/what-if")
+async def what_if(
+    data: RiskWhatIfInput,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    How the risk score would change if one or two inputs changed, e.g. BMI
+    -5..0 against systolic BP -20..0: every grid point is scored in one
+    vectorized pass. Nothing is stored.
+    """
+    try:
+        return what_if_grid(
+            data.disease_type,
+            data.base.model_dump(),
+            [(a.feature, a.min_delta, a.max_delta, a.steps) for a in data.axes],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.get("/history")
+async def get_history(
+    points: int = Query(100, ge=3, le=TREND_MAX_POINTS, description="max trend points per disease"),
+    disease_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Latest result for every disease plus a per-disease score trend, reduced to
+    at most `points` points with LTTB downsampling.
+    """
+    latest = await latest_per_disease(db, current_user.id)
+    trend = await risk_trend(db, current_user.id, points, disease_type=disease_type, since=since)
+    return {
+        "latest": [
+            {
+                "id": r.id,
+                "disease_type": r.disease_type,
+                "risk_score": r.risk_score,
+                "risk_category": r.risk_category,
+                "model_version": r.model_version,
+                **stored_percentile(r),
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+            }
+            for r in latest
+            if not disease_type or r.disease_type == disease_type
+        ],
+        "trend": trend,
+    }
+
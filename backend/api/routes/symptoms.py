@@ -32,6 +32,7 @@ async def check_symptoms(
         possible_conditions=result["possible_conditions"],
         urgency_level=result["urgency_level"],
         recommendations=result["recommendations"],
+        analyzer_version=result["analyzer_version"],
     )
     db.add(log)
     await db.flush()
@@ -11,6 +11,7 @@ from core.database import get_db
 from core.deps import get_current_user
 from models.database import User, VitalRecord
 from schemas.schemas import VitalInput, VitalOut
+from services.health_index import index_record
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/vitals", tags=["Vitals"])
@@ -37,7 +38,8 @@ async def record_vital(
         oxygen_saturation=data.oxygen_saturation,
     )
     db.add(vital)
-    await db.flush()
+    await db.commit()
+    index_record(current_user.id, "vital", vital)
     logger.info(f"Vital recorded for user {current_user.id} (source={data.source})")
     return vital
 
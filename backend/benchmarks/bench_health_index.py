@@ -0,0 +1,113 @@
+"""
+Benchmark: per-user health record retrieval for chat grounding.
+
+Builds synthetic users with thousands of records and reports incremental
+insert cost, top-k query latency and the prompt size of the retrieved
+context versus pasting every record into the prompt.
+
+Run from backend/:  python -m benchmarks.bench_health_index
+"""
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from services.health_index import (
+    UserHealthIndex,
+    DEFAULT_TOP_K,
+    MAX_SNIPPET_CHARS,
+    format_context,
+    vital_to_text,
+    report_to_text,
+    risk_to_text,
+    medication_to_text,
+)
+
+QUERIES = [
+    "what was my blood pressure last month?",
+    "is my cholesterol getting better",
+    "how high is my diabetes risk",
+    "am I still taking metformin",
+    "my latest HbA1c and fasting glucose",
+    "heart rate and oxygen saturation trend",
+]
+
+LAB_TESTS = ["Hemoglobin", "Fasting Glucose", "Total Cholesterol", "HDL Cholesterol",
+             "LDL Cholesterol", "Triglycerides", "HbA1c", "Creatinine"]
+DRUGS = ["Metformin", "Lisinopril", "Atorvastatin", "Aspirin", "Levothyroxine", "Amlodipine"]
+
+
+def _synthetic_records(n: int, rng: random.Random):
+    start = datetime(2020, 1, 1)
+    for i in range(n):
+        when = start + timedelta(hours=i * 7)
+        kind = rng.choices(["vital", "report", "risk", "medication"], weights=[70, 10, 15, 5])[0]
+        if kind == "vital":
+            rec = SimpleNamespace(
+                id=str(i), source="manual", recorded_at=when,
+                blood_pressure_systolic=rng.randint(100, 160), blood_pressure_diastolic=rng.randint(60, 100),
+                heart_rate=rng.randint(55, 110), blood_glucose=rng.randint(70, 180),
+                weight_kg=rng.randint(55, 110), oxygen_saturation=rng.randint(92, 100),
+                temperature=None, steps=rng.randint(0, 15000), sleep_hours=rng.randint(4, 9),
+            )
+            yield f"vital:{i}", vital_to_text(rec)
+        elif kind == "report":
+            values = {t: {"value": str(rng.randint(1, 250)), "unit": "mg/dL",
+                          "status": rng.choice(["normal", "high", "low"]), "ref": "n/a"} for t in LAB_TESTS}
+            rec = SimpleNamespace(
+                id=str(i), file_name=f"labs_{i}.pdf", created_at=when, extracted_values=values,
+                abnormal_flags=[k for k, v in values.items() if v["status"] != "normal"],
+            )
+            yield f"report:{i}", report_to_text(rec)
+        elif kind == "risk":
+            rec = SimpleNamespace(
+                id=str(i), disease_type=rng.choice(["diabetes", "heart_disease"]), created_at=when,
+                risk_score=rng.random(), risk_category=rng.choice(["low", "moderate", "high"]),
+                feature_importance={"glucose": 0.4, "bmi": 0.3, "age": 0.2},
+            )
+            yield f"risk:{i}", risk_to_text(rec)
+        else:
+            rec = SimpleNamespace(
+                id=str(i), name=rng.choice(DRUGS), dosage="10mg", frequency="once daily",
+                is_active=rng.random() > 0.3, notes=None,
+            )
+            yield f"medication:{i}", medication_to_text(rec)
+
+
+def bench(n_records: int, rng: random.Random) -> None:
+    records = list(_synthetic_records(n_records, rng))
+    index = UserHealthIndex()
+
+    t0 = time.perf_counter()
+    for doc_id, text in records:
+        index.add(doc_id, text)
+    insert_us = (time.perf_counter() - t0) / n_records * 1e6
+
+    latencies = []
+    prompt_chars = []
+    for _ in range(200):
+        q = rng.choice(QUERIES)
+        t0 = time.perf_counter()
+        hits = index.search(q, DEFAULT_TOP_K)
+        latencies.append((time.perf_counter() - t0) * 1e3)
+        ctx = format_context([text[:MAX_SNIPPET_CHARS] for _, _, text in hits]) or ""
+        prompt_chars.append(len(ctx))
+
+    full_dump = sum(len(text) + 3 for _, text in records)
+    latencies.sort()
+    print(
+        f"{n_records:>7} records | insert {insert_us:6.1f} µs/rec | "
+        f"query p50 {statistics.median(latencies):6.2f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms | "
+        f"context {statistics.mean(prompt_chars):6.0f} chars vs full dump {full_dump:>9} chars"
+    )
+
+
+def main() -> None:
+    rng = random.Random(42)
+    for n in (1_000, 5_000, 20_000):
+        bench(n, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: report image preprocessing before Gemini Vision.
+
+For each image in the corpus, compares the Gemini request body size and the
+analyze_report_with_gemini round trip (against benchmarks/fake_gemini.py) with
+and without preprocessing, and reports the preprocessing cost itself.
+
+Without --corpus a synthetic corpus of phone-photo-sized lab sheets is generated
+(12 MP, EXIF-rotated, JPEG q95 / PNG).
+
+Run from backend/:  python -m benchmarks.bench_image_preprocess [--corpus DIR]
+"""
+import argparse
+import asyncio
+import base64
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List, Tuple
+
+from benchmarks.bench_llm_load import _start, _wait_ready
+
+LAB_LINES = [
+    ("Hemoglobin", "13.5", "g/dL", "12.0 - 17.5"),
+    ("Fasting Glucose", "126", "mg/dL", "70 - 100"),
+    ("Total Cholesterol", "210", "mg/dL", "< 200"),
+    ("HDL Cholesterol", "45", "mg/dL", "> 40"),
+    ("LDL Cholesterol", "140", "mg/dL", "< 100"),
+    ("Triglycerides", "180", "mg/dL", "< 150"),
+    ("HbA1c", "6.8", "%", "< 5.7"),
+    ("Creatinine", "1.0", "mg/dL", "0.7 - 1.3"),
+]
+
+
+def synthetic_corpus(directory: str, n: int, seed: int = 7) -> List[Tuple[str, str]]:
+    """Render n lab-sheet 'photos' (4032x3024, tinted paper, noise, EXIF rotation)."""
+    from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+    rng = random.Random(seed)
+    font = ImageFont.load_default(size=64)
+    files = []
+    for i in range(n):
+        w, h = 4032, 3024
+        paper = tuple(rng.randint(200, 235) for _ in range(3))
+        img = Image.new("RGB", (w, h), paper)
+        draw = ImageDraw.Draw(img)
+        draw.text((200, 150), "CITY LAB — COMPLETE METABOLIC PANEL", fill=(20, 20, 20), font=font)
+        for row, (name, value, unit, ref) in enumerate(LAB_LINES):
+            y = 400 + row * 220
+            for x, text in ((200, name), (1700, value), (2300, unit), (2900, ref)):
+                draw.text((x, y), text, fill=(30, 30, 40), font=font)
+        noise = Image.effect_noise((w, h), 24).convert("RGB")
+        img = Image.blend(img, noise, 0.12).filter(ImageFilter.GaussianBlur(1.2))
+
+        exif = Image.Exif()
+        exif[0x0112] = rng.choice([1, 3, 6, 8])  # orientation
+        fmt = "PNG" if i % 4 == 3 else "JPEG"
+        path = os.path.join(directory, f"lab_{i}.{fmt.lower()}")
+        if fmt == "JPEG":
+            img.save(path, format="JPEG", quality=95, exif=exif)
+            files.append((path, "image/jpeg"))
+        else:
+            img.save(path, format="PNG")
+            files.append((path, "image/png"))
+    return files
+
+
+def _corpus_from_dir(directory: str) -> List[Tuple[str, str]]:
+    mime = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+    return [
+        (os.path.join(directory, f), mime[os.path.splitext(f)[1].lower()])
+        for f in sorted(os.listdir(directory))
+        if os.path.splitext(f)[1].lower() in mime
+    ]
+
+
+def _request_body_bytes(data: bytes) -> int:
+    """Approximate JSON request body size: the inline image is base64-encoded."""
+    return len(base64.standard_b64encode(data)) + 1500
+
+
+async def run(args: argparse.Namespace) -> None:
+    from services.image_preprocess import preprocess_report_image, shutdown_preprocess_pool
+    from services.report_analyzer import analyze_report_with_gemini
+
+    tmp = tempfile.mkdtemp(prefix="healthlens-img-")
+    corpus = _corpus_from_dir(args.corpus) if args.corpus else synthetic_corpus(tmp, args.images)
+
+    env = dict(os.environ)
+    fake = _start(["-m", "benchmarks.fake_gemini", "--port", str(args.fake_port), "--latency", "constant:0"], env)
+    rows = []
+    try:
+        await _wait_ready(f"http://127.0.0.1:{args.fake_port}/_stats")
+        os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{args.fake_port}"
+        from core.config import settings
+        settings.GEMINI_BASE_URL = os.environ["GEMINI_BASE_URL"]
+
+        # Warm the process pool so worker start-up isn't billed to the first image
+        await preprocess_report_image(corpus[0][0], corpus[0][1])
+
+        for path, mime in corpus:
+            with open(path, "rb") as f:
+                raw = f.read()
+
+            t0 = time.perf_counter()
+            processed, out_mime = await preprocess_report_image(path, mime)
+            prep_ms = (time.perf_counter() - t0) * 1e3
+
+            t0 = time.perf_counter()
+            await asyncio.to_thread(analyze_report_with_gemini, raw, mime, "fake")
+            raw_ms = (time.perf_counter() - t0) * 1e3
+
+            t0 = time.perf_counter()
+            await asyncio.to_thread(analyze_report_with_gemini, processed, out_mime, "fake")
+            proc_ms = (time.perf_counter() - t0) * 1e3
+
+            rows.append((os.path.basename(path), len(raw), len(processed),
+                         _request_body_bytes(raw), _request_body_bytes(processed), prep_ms, raw_ms, proc_ms))
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+        shutdown_preprocess_pool()
+
+    print(f"{'image':<14} {'file KB':>9} {'->':>3} {'KB':>7} {'body KB':>9} {'->':>3} {'KB':>7} "
+          f"{'prep ms':>8} {'rt raw ms':>10} {'rt prep ms':>11}")
+    for name, fr, fp, br, bp, prep, rr, rp in rows:
+        print(f"{name:<14} {fr / 1024:>9.0f} {'':>3} {fp / 1024:>7.0f} {br / 1024:>9.0f} {'':>3} {bp / 1024:>7.0f} "
+              f"{prep:>8.1f} {rr:>10.1f} {rp:>11.1f}")
+    body_red = 1 - sum(r[4] for r in rows) / sum(r[3] for r in rows)
+    print(f"\nrequest body reduction: {body_red:.1%}")
+    print(f"median round trip: raw {statistics.median(r[6] for r in rows):.1f} ms, "
+          f"preprocessed {statistics.median(r[7] for r in rows):.1f} ms "
+          f"(+ {statistics.median(r[5] for r in rows):.1f} ms preprocessing, off the event loop)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report image preprocessing benchmark.")
+    parser.add_argument("--corpus", help="directory of sample report images (PNG/JPEG)")
+    parser.add_argument("--images", type=int, default=8, help="synthetic corpus size")
+    parser.add_argument("--fake-port", type=int, default=8767)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
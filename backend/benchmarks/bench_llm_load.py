@@ -0,0 +1,187 @@
+"""
+End-to-end load benchmark for the LLM paths (/chat/message, /reports/upload).
+Upload latency is measured until the background analysis job has finished.
+
+Starts benchmarks/fake_gemini.py and the real FastAPI app (uvicorn, throwaway
+SQLite DB) as subprocesses, registers a pool of users, then drives each endpoint
+at increasing concurrency and reports throughput and tail latency.
+
+Run from backend/:
+    python -m benchmarks.bench_llm_load --concurrency 1,4,16,64 --requests 200 \
+        --latency lognormal:0.8:0.35 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API = "/api/v1"
+
+
+def tiny_png(width: int = 64, height: int = 64, tag: str = "") -> bytes:
+    """A valid grayscale PNG, generated without any imaging dependency (`tag` makes the bytes unique)."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    raw = b"".join(b"\x00" + bytes((x * 4) & 0xFF for x in range(width)) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"tEXt", b"Comment\x00" + tag.encode())
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _start(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+async def _register_users(client: httpx.AsyncClient, n: int) -> List[str]:
+    async def one(i: int) -> str:
+        r = await client.post(f"{API}/auth/register", json={
+            "email": f"load{i}@bench.local", "password": "Bench!pass1", "full_name": f"Load {i}",
+        })
+        r.raise_for_status()
+        return r.json()["access_token"]
+    return list(await asyncio.gather(*(one(i) for i in range(n))))
+
+
+async def _run_level(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    tokens: List[str],
+    concurrency: int,
+    total: int,
+    same_file: bool,
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker(wid: int) -> None:
+        nonlocal errors
+        headers = {"Authorization": f"Bearer {tokens[wid % len(tokens)]}"}
+        for i in counter:
+            png = tiny_png(tag="" if same_file else f"{concurrency}-{i}")
+            t0 = time.perf_counter()
+            if endpoint == "chat":
+                r = await client.post(f"{API}/chat/message", headers=headers,
+                                      json={"message": f"Is my blood pressure ok? ({i})"})
+            else:
+                r = await client.post(f"{API}/reports/upload", headers=headers,
+                                      files={"file": (f"lab_{i}.png", png, "image/png")})
+                # Uploads return 202; measure until the background analysis finishes
+                if r.status_code < 400:
+                    status_url = f"{API}/reports/{r.json()['id']}/status"
+                    while True:
+                        await asyncio.sleep(0.05)
+                        r = await client.get(status_url, headers=headers)
+                        if r.status_code >= 400 or r.json()["job_status"] in ("succeeded", "failed"):
+                            break
+            latencies.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+
+    return {
+        "rps": len(latencies) / wall,
+        "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99),
+        "errors": errors,
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    tmp = tempfile.mkdtemp(prefix="healthlens-bench-")
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{tmp}/bench.db",
+        "GEMINI_API_KEY": "fake-key",
+        "GEMINI_BASE_URL": fake_url,
+        "UPLOAD_DIR": os.path.join(tmp, "uploads"),
+    })
+
+    fake_cmd = ["-m", "benchmarks.fake_gemini", "--port", str(args.fake_port),
+                "--latency", args.latency, "--error-rate", str(args.error_rate),
+                "--report-mode", args.report_mode]
+    app_cmd = ["-m", "uvicorn", "main:app", "--port", str(args.app_port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+
+    procs = [_start(fake_cmd, env), _start(app_cmd, env)]
+    try:
+        await _wait_ready(f"{fake_url}/_stats")
+        await _wait_ready(f"{app_url}/health")
+
+        limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+        async with httpx.AsyncClient(base_url=app_url, timeout=120.0, limits=limits) as client:
+            tokens = await _register_users(client, args.users)
+            print(f"fake latency={args.latency} error_rate={args.error_rate} workers={args.workers}")
+            print(f"{'endpoint':<8} {'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+            for endpoint in args.endpoints.split(","):
+                for conc in args.concurrency:
+                    r = await _run_level(client, endpoint, tokens, conc, args.requests, args.same_file)
+                    print(f"{endpoint:<8} {conc:>5} {r['rps']:>8.1f} {r['p50']:>9.1f} "
+                          f"{r['p95']:>9.1f} {r['p99']:>9.1f} {r['errors']:>7}")
+
+            stats = (await client.get(f"{fake_url}/_stats")).json()
+            print(f"fake gemini: {stats}")
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM-path load benchmark against a fake Gemini.")
+    parser.add_argument("--endpoints", default="chat,upload")
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--latency", default="lognormal:0.8:0.35")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--report-mode", default="json")
+    parser.add_argument("--same-file", action="store_true",
+                        help="upload identical bytes every time (exercises dedup / single-flight)")
+    parser.add_argument("--fake-port", type=int, default=8765)
+    parser.add_argument("--app-port", type=int, default=8766)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: 7-day meal plans from the food / nutrient matrix (services.meal_planner).
+
+Generates random users (height, weight, age, sex, activity, allergies,
+conditions, risk context), derives their diet targets and times plan_week per
+user, uncached. Reports latency and plan quality: energy / macro error against
+the targets, days over the sodium / saturated-fat / sugar limits, distinct
+dishes per week, and allergen violations (must be 0). Runs on the shipped food
+database and on synthetic ones 4x and 16x its size (perturbed copies of every
+dish), where the per-slot candidate cap keeps the search size fixed.
+
+Run from backend/:  python -m benchmarks.bench_meal_planner [--users 500]
+"""
+import argparse
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+
+from core.config import settings
+from services.meal_planner import FoodDatabase, diet_targets, plan_week
+
+with open(settings.FOOD_DB_PATH, encoding="utf-8") as _f:
+    FOOD_DOC: Dict[str, Any] = json.load(_f)
+
+ALLERGIES = ("Peanuts", "tree nuts", "milk", "eggs", "shellfish", "soy", "wheat", "sesame", "fish", "Penicillin")
+CONDITIONS = ("Type 2 Diabetes", "Hypertension", "High cholesterol", "Asthma", "celiac disease", "lactose intolerance")
+ACTIVITY = ("sedentary", "light", "moderate", "active")
+RISK_LEVELS = ("low", "moderate", "high")
+
+
+def synthetic_doc(scale: int, rng: random.Random) -> Dict[str, Any]:
+    foods = list(FOOD_DOC["foods"])
+    for i in range(len(FOOD_DOC["foods"]) * (scale - 1)):
+        base = rng.choice(FOOD_DOC["foods"])
+        foods.append({
+            **base,
+            "name": f"{base['name']} (variant {i})",
+            "per_serving": {k: round(v * rng.uniform(0.8, 1.2), 1) for k, v in base["per_serving"].items()},
+        })
+    return {**FOOD_DOC, "foods": foods}
+
+
+def random_user(rng: random.Random) -> SimpleNamespace:
+    height = rng.uniform(150, 195)
+    return SimpleNamespace(
+        height_cm=round(height, 1),
+        weight_kg=round(rng.uniform(18, 38) * (height / 100) ** 2, 1),
+        date_of_birth=f"{rng.randint(1940, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        gender=rng.choice(("male", "female", "")),
+        allergies=rng.sample(ALLERGIES, rng.choice((0, 0, 1, 1, 2, 3))),
+        medical_conditions=rng.sample(CONDITIONS, rng.choice((0, 0, 1, 2))),
+        lifestyle={"activity_level": rng.choice(ACTIVITY)},
+    )
+
+
+def bench(scale: int, n_users: int, seed: int) -> None:
+    rng = random.Random(seed)
+    db = FoodDatabase(synthetic_doc(scale, rng) if scale > 1 else FOOD_DOC)
+    users = [random_user(rng) for _ in range(n_users)]
+    risks = [{"diabetes": rng.choice(RISK_LEVELS), "heart_disease": rng.choice(RISK_LEVELS)} for _ in users]
+    plan_week(diet_targets(risks[0], users[0], db), db=db)  # warm-up
+
+    latencies = np.empty(n_users)
+    kcal_err: List[float] = []
+    macro_err: List[float] = []
+    over_limit = days = distinct = violations = empty = 0
+    for i, (user, risk) in enumerate(zip(users, risks)):
+        t0 = time.perf_counter()
+        targets = diet_targets(risk, user, db)
+        week = plan_week(targets, db=db)
+        latencies[i] = time.perf_counter() - t0
+        if not week:
+            empty += 1
+            continue
+
+        banned = {db.allergens.index(a) for a in targets.exclude}
+        names = set()
+        for day in week:
+            t = day["totals"]
+            kcal_err.append(abs(t["kcal"] - targets.kcal) / targets.kcal)
+            macro_err.append(np.mean([abs(t[k] - getattr(targets, k)) / getattr(targets, k)
+                                      for k in ("protein_g", "carbs_g", "fat_g")]))
+            over_limit += (t["sodium_mg"] > targets.sodium_max_mg or t["sat_fat_g"] > targets.sat_fat_max_g
+                           or t["sugar_g"] > targets.sugar_max_g)
+            days += 1
+            for name in day["meals"].values():
+                names.add(name)
+                row = db.names.index(name)
+                violations += any(db.allergen_mask[row, a] for a in banned)
+        distinct += len(names)
+
+    planned = max(n_users - empty, 1)
+    print(f"{scale:>4}x {len(db.names):>6,} {latencies.mean() * 1e3:>8.2f} {np.percentile(latencies, 50) * 1e3:>8.2f} "
+          f"{np.percentile(latencies, 99) * 1e3:>8.2f} {np.mean(kcal_err) * 100:>8.1f}% {np.mean(macro_err) * 100:>8.1f}% "
+          f"{over_limit / max(days, 1) * 100:>8.1f}% {distinct / planned:>9.1f} {violations:>10} {empty:>6}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Meal planner benchmark.")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'scale':>5} {'foods':>6} {'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8} {'kcal err':>9} {'macro err':>9} "
+          f"{'over lim':>9} {'distinct':>9} {'allergens':>10} {'empty':>6}")
+    for scale in (1, 4, 16):
+        bench(scale, args.users, args.seed)
+
+
+if __name__ == "__main__":
+    main()
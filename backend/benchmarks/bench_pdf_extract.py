@@ -0,0 +1,128 @@
+"""
+Benchmark: local PDF text-layer lab extraction (services.report_analyzer).
+
+Generates multi-page lab reports with a real text layer (one results table per
+page plus header/footer noise) and measures end-to-end pages/sec for
+extract_pdf_lab_values, along with the split between pypdf text extraction and
+the lab-line parser. Also times how quickly a scanned (image-only) PDF is
+rejected to the LLM fallback.
+
+Run from backend/:  python -m benchmarks.bench_pdf_extract [--pages 1 10 50]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from services.report_analyzer import extract_pdf_lab_values, iter_pdf_pages, parse_lab_line
+
+TESTS = [
+    ("Hemoglobin", "g/dL", 12.0, 17.5), ("Hematocrit", "%", 36, 50), ("WBC", "x10^3/uL", 4.0, 10.0),
+    ("Platelets", "x10^3/uL", 150, 400), ("MCV", "fL", 80, 100), ("Fasting Glucose", "mg/dL", 70, 100),
+    ("HbA1c", "%", 4.0, 5.7), ("Sodium", "mmol/L", 135, 145), ("Potassium", "mmol/L", 3.5, 5.1),
+    ("Creatinine", "mg/dL", 0.7, 1.3), ("BUN", "mg/dL", 7, 20), ("ALT", "U/L", 7, 56),
+    ("AST", "U/L", 10, 40), ("TSH", "mIU/L", 0.4, 4.0), ("Vitamin D", "ng/mL", 30, 100),
+    ("Ferritin", "ng/mL", 30, 400),
+]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_text_pdf(path: str, pages: List[List[str]]) -> None:
+    """Minimal PDF writer: one Helvetica text line per entry, real text layer, no dependencies."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 800 Td"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{k} 0 R" for k in kids).encode(), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def lab_report_pages(n_pages: int, rng: random.Random) -> List[List[str]]:
+    pages = []
+    for p in range(n_pages):
+        lines = ["CITY DIAGNOSTICS LABORATORY", f"Patient ID 10{rng.randint(1000, 9999)}   Collected on 12/03/2024",
+                 "Test Result Unit Reference Range"]
+        for name, unit, lo, hi in TESTS:
+            value = round(rng.uniform(lo * 0.8, hi * 1.2), 1)
+            flag = " H" if value > hi else " L" if value < lo else ""
+            lines.append(f"{name} (panel {p + 1}) {value}{flag} {unit} {lo} - {hi}")
+        lines += ["Results should be interpreted by a physician.", f"Page {p + 1} of {n_pages}"]
+        pages.append(lines)
+    return pages
+
+
+def bench(path: str, n_pages: int, repeat: int) -> None:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = extract_pdf_lab_values(path)
+    total = (time.perf_counter() - t0) / repeat
+    assert result is not None and len(result[0]) == n_pages * len(TESTS), "parser missed lines"
+
+    t0 = time.perf_counter()
+    texts = list(iter_pdf_pages(path))
+    text_s = time.perf_counter() - t0
+    lines = [line for t in texts for line in t.splitlines()]
+    t0 = time.perf_counter()
+    for line in lines:
+        parse_lab_line(line)
+    parse_s = time.perf_counter() - t0
+
+    print(f"{n_pages:>6} {len(result[0]):>8} {total * 1e3:>10.1f} {n_pages / total:>10.0f} "
+          f"{text_s * 1e3:>10.1f} {parse_s * 1e3:>9.2f} {len(lines) / parse_s / 1e3:>10.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local PDF lab extraction benchmark.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    tmp = tempfile.mkdtemp(prefix="healthlens-pdf-")
+    print(f"{'pages':>6} {'values':>8} {'total ms':>10} {'pages/s':>10} {'pypdf ms':>10} {'parse ms':>9} {'klines/s':>10}")
+    for n in args.pages:
+        path = os.path.join(tmp, f"report_{n}.pdf")
+        write_text_pdf(path, lab_report_pages(n, rng))
+        bench(path, n, args.repeat)
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return
+    scanned = os.path.join(tmp, "scanned.pdf")
+    frames = [Image.new("L", (1240, 1754), 255) for _ in range(20)]
+    frames[0].save(scanned, save_all=True, append_images=frames[1:])
+    t0 = time.perf_counter()
+    assert extract_pdf_lab_values(scanned) is None
+    print(f"\nscanned 20-page PDF rejected to LLM fallback in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
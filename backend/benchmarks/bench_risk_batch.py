@@ -0,0 +1,167 @@
+"""
+Benchmark: vectorized batch risk scoring (services.risk_prediction).
+
+Scores a synthetic cohort (default 1M records, missing values included) with
+the per-row path (predict_*_risk in a Python loop) and with predict_risk_batch,
+in chunks so the dicts for both never sit in memory at once, and checks that
+the two are identical (importance order included). Also times RiskModel.score_matrix alone on the whole cohort packed
+as one matrix (columnar imports), and per-row ORM inserts against the single bulk
+INSERT used by /risk/batch.
+
+Run from backend/:  python -m benchmarks.bench_risk_batch [--records 1000000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Before any core.config import: the insert benchmark must not touch the real database
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='healthlens-risk-')}/bench.db")
+
+from services.model_registry import model_registry, BUILTIN_WEIGHTS
+from services.risk_prediction import predict_diabetes_risk, predict_heart_disease_risk, predict_risk_batch
+
+PER_ROW = {"diabetes": predict_diabetes_risk, "heart_disease": predict_heart_disease_risk}
+
+# feature: (low, high, fraction missing)
+FEATURE_RANGES = {
+    "age": (18, 90, 0.0),
+    "bmi": (16, 45, 0.0),
+    "glucose": (60, 250, 0.3),
+    "cholesterol": (120, 320, 0.3),
+    "blood_pressure_systolic": (90, 190, 0.0),
+    "blood_pressure_diastolic": (55, 120, 0.0),
+    "insulin": (2, 300, 0.5),
+    "skin_thickness": (5, 60, 0.6),
+    "pregnancies": (0, 8, 0.5),
+}
+
+
+def synthetic_records(n: int, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    columns: Dict[str, List[Any]] = {}
+    for name, (lo, hi, missing) in FEATURE_RANGES.items():
+        values = rng.uniform(lo, hi, n)
+        if name in ("age", "pregnancies"):
+            values = np.floor(values)
+        col: List[Any] = values.round(1).tolist()
+        for i in np.flatnonzero(rng.random(n) < missing).tolist():
+            col[i] = None
+        columns[name] = col
+    columns["smoking"] = (rng.random(n) < 0.25).tolist()
+    columns["alcohol"] = (rng.random(n) < 0.3).tolist()
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def bench_scoring(disease: str, total: int, chunk: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    per_row_s = batch_s = 0.0
+    mismatched = 0
+    done = 0
+    while done < total:
+        records = synthetic_records(min(chunk, total - done), rng)
+        fn = PER_ROW[disease]
+        t0 = time.perf_counter()
+        expected = [fn(r) for r in records]
+        per_row_s += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        got = predict_risk_batch(disease, records)
+        batch_s += time.perf_counter() - t0
+
+        mismatched += sum(
+            1 for a, b in zip(expected, got)
+            if a != b or list(a["feature_importance"]) != list(b["feature_importance"])
+        )
+        done += len(records)
+
+    print(f"{disease:<14} {total:>9,} {per_row_s:>11.2f} {batch_s:>9.2f} {per_row_s / batch_s:>8.1f}x "
+          f"{total / batch_s / 1e3:>10.0f} {mismatched / total:>10.5%}")
+
+
+def bench_matrix(disease: str, total: int, seed: int) -> None:
+    """Columnar input: the cohort is already a matrix, no dicts in or out."""
+    model = model_registry.get(disease)
+    features = model.features
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.uniform(*FEATURE_RANGES[f][:2], total) if f in FEATURE_RANGES else (rng.random(total) < 0.3)
+        for f in features
+    ]).astype(float)
+    mask = np.column_stack([rng.random(total) >= FEATURE_RANGES.get(f, (0, 0, 0.0))[2] for f in features])
+    t0 = time.perf_counter()
+    scores, _, _, _ = model.score_matrix(X, mask)
+    elapsed = time.perf_counter() - t0
+    print(f"{disease:<14} {total:>9,} rows  score_matrix {elapsed * 1e3:>8.1f} ms  "
+          f"({total / elapsed / 1e6:.1f} M rows/s, mean score {scores.mean():.3f})")
+
+
+async def bench_insert(rows: int) -> None:
+    """Per-row ORM add + flush (the single-prediction routes) vs one bulk INSERT."""
+    from sqlalchemy import insert
+
+    from core.database import AsyncSessionLocal, init_db
+    from models.database import RiskPrediction, User, generate_uuid
+
+    await init_db()
+    records = synthetic_records(rows, np.random.default_rng(1))
+    results = predict_risk_batch("diabetes", records)
+    async with AsyncSessionLocal() as session:
+        user = User(email=f"bench-{generate_uuid()}@example.com", hashed_password="x")
+        session.add(user)
+        await session.commit()
+        user_id = user.id
+
+    def row(result: Dict[str, Any], input_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "user_id": user_id, "disease_type": result["disease_type"], "risk_score": result["risk_score"],
+            "risk_category": result["risk_category"], "input_data": input_data,
+            "feature_importance": result["feature_importance"], "explanation": result["explanation"],
+        }
+
+    async with AsyncSessionLocal() as session:
+        t0 = time.perf_counter()
+        for result, input_data in zip(results, records):
+            session.add(RiskPrediction(**row(result, input_data)))
+            await session.flush()
+        await session.commit()
+        per_row_s = time.perf_counter() - t0
+
+    async with AsyncSessionLocal() as session:
+        t0 = time.perf_counter()
+        await session.execute(
+            insert(RiskPrediction),
+            [{"id": generate_uuid(), **row(r, d)} for r, d in zip(results, records)],
+        )
+        await session.commit()
+        bulk_s = time.perf_counter() - t0
+
+    print(f"insert {rows:,} rows: per-row flush {per_row_s:.2f} s, bulk INSERT {bulk_s:.2f} s "
+          f"({per_row_s / bulk_s:.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch risk scoring benchmark.")
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=100_000, help="records materialized as dicts at a time")
+    parser.add_argument("--insert-rows", type=int, default=20_000, help="0 to skip the database part")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'disease':<14} {'records':>9} {'per-row s':>11} {'batch s':>9} {'speedup':>9} {'krows/s':>10} {'mismatch':>10}")
+    for disease in BUILTIN_WEIGHTS:
+        bench_scoring(disease, args.records, args.chunk, args.seed)
+    print()
+    for disease in BUILTIN_WEIGHTS:
+        bench_matrix(disease, args.records, args.seed)
+    if args.insert_rows:
+        print()
+        asyncio.run(bench_insert(args.insert_rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Benchmark: symptom keyword extraction + condition scoring (services.symptom_kb).
+
+Compares the previous per-call approach (rebuild the keyword set, substring test
+per keyword, scan every condition) with the compiled SymptomIndex on the shipped
+knowledge base and on synthetic ones 10x, 100x and 500x (5,000 conditions) its
+size. Synthetic conditions mix real keywords with generated multi-word symptom
+phrases; each synthetic knowledge base is written to a JSON file and loaded
+through load_kb_file, as at startup or on hot reload. The "typo" column runs
+the same texts with one adjacent-letter swap per text (fuzzy matching path;
+each text is new, so corrections are not served from the memo).
+
+Before timing, the shipped knowledge base is checked against EXPECTED: everyday
+words one edit from a keyword ("sweeping", "couch", "fewer") must not become
+symptoms, real typos must still be corrected, and a condition matched only
+through corrections must not reach high / emergency urgency.
+
+Run from backend/:  python -m benchmarks.bench_symptoms [--texts 2000] [--write-kb PATH]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from core.config import settings
+from services.symptom_analyzer import analyze_symptoms
+from services.symptom_kb import load_kb_file
+
+with open(settings.SYMPTOM_KB_PATH, encoding="utf-8") as _f:
+    CONDITION_DB: List[Dict[str, Any]] = json.load(_f)["conditions"]
+LEGACY_MAX_TEXTS = 200
+
+# (text, expected classified symptoms, highest acceptable urgency)
+EXPECTED = (
+    ("I was sweeping the floor all morning", [], "low"),
+    ("I slept on the couch last night", [], "low"),
+    ("I have fewer friends than I used to", [], "low"),
+    ("my cramped apartment", [], "low"),
+    ("I tried to paint the fence and could not stick with it", [], "low"),
+    ("nausia after eating", ["nausea"], "moderate"),
+    ("chest pian and sweatting", ["chest pain", "sweating"], "moderate"),
+    ("chest pain and sweating", ["chest pain", "sweating"], "emergency"),
+    ("bad coughh and a sore throat", ["sore throat", "cough"], "moderate"),
+)
+URGENCY_ORDER = ("low", "moderate", "high", "emergency")  # the old path takes milliseconds per text on large knowledge bases
+
+FILLER = ("i", "have", "had", "a", "bad", "since", "yesterday", "and", "some", "really", "my", "with", "the",
+          "morning", "feel", "also", "after", "eating", "very", "it", "gets", "worse", "at", "night")
+BODY = ("arm", "leg", "back", "neck", "knee", "ear", "eye", "skin", "foot", "hip", "wrist", "chest", "throat")
+QUALITY = ("sharp", "dull", "burning", "stabbing", "throbbing", "itchy", "swollen", "numb", "stiff", "tender")
+
+
+def synthetic_kb(scale: int, rng: random.Random) -> List[Dict[str, Any]]:
+    real = sorted({kw for c in CONDITION_DB for kw in c["keywords"]})
+    generated = [f"{q} {b}" for q in QUALITY for b in BODY] + [f"{b} {q} pain" for q in QUALITY for b in BODY]
+    conditions = list(CONDITION_DB)
+    for i in range(len(CONDITION_DB) * (scale - 1)):
+        keywords = rng.sample(real, rng.randint(1, 3)) + rng.sample(generated, rng.randint(3, 6))
+        conditions.append({
+            "name": f"Synthetic condition {i}",
+            "keywords": keywords,
+            "urgency": rng.choice(("low", "moderate", "high")),
+            "description": "",
+        })
+    return conditions
+
+
+def synthetic_texts(conditions: List[Dict[str, Any]], n: int, rng: random.Random) -> List[str]:
+    keywords = sorted({kw for c in conditions for kw in c["keywords"]})
+    texts = []
+    for _ in range(n):
+        words = rng.choices(FILLER, k=rng.randint(8, 30))
+        for kw in rng.sample(keywords, rng.randint(1, 4)):
+            words.insert(rng.randrange(len(words) + 1), kw)
+        texts.append(" ".join(words))
+    return texts
+
+
+def with_typo(text: str, rng: random.Random) -> str:
+    words = text.split(" ")
+    long_words = [i for i, w in enumerate(words) if len(w) >= 5]
+    if not long_words:
+        return text
+    i = rng.choice(long_words)
+    w = words[i]
+    j = rng.randrange(1, len(w) - 1)
+    words[i] = w[:j] + w[j + 1] + w[j] + w[j + 2:]
+    return " ".join(words)
+
+
+def legacy_analyze(conditions: List[Dict[str, Any]], text: str) -> List[Dict[str, Any]]:
+    """The pre-index implementation of _extract_symptoms + _match_conditions."""
+    text_lower = text.lower()
+    all_keywords = set()
+    for condition in conditions:
+        all_keywords.update(condition["keywords"])
+    symptoms = [kw for kw in all_keywords if kw in text_lower]
+    results = []
+    for condition in conditions:
+        matched = [s for s in symptoms if s in condition["keywords"]]
+        if matched:
+            score = len(matched) / len(condition["keywords"])
+            results.append({"name": condition["name"], "probability": round(min(score, 0.95), 2)})
+    results.sort(key=lambda x: -x["probability"])
+    return results[:3]
+
+
+def check_expected() -> None:
+    index = load_kb_file(settings.SYMPTOM_KB_PATH)
+    failures = []
+    for text, symptoms, max_urgency in EXPECTED:
+        result = analyze_symptoms(text, index)
+        if (sorted(result["classified_symptoms"]) != sorted(symptoms)
+                or URGENCY_ORDER.index(result["urgency_level"]) > URGENCY_ORDER.index(max_urgency)):
+            failures.append(f"{text!r}: {result['classified_symptoms']} ({result['urgency_level']})")
+    if failures:
+        raise SystemExit("Unexpected symptom matches:\n  " + "\n  ".join(failures))
+    print(f"{len(EXPECTED)} expected-match checks passed")
+
+
+def bench(scale: int, n_texts: int, seed: int, write_kb: str = "") -> None:
+    rng = random.Random(seed)
+    conditions = synthetic_kb(scale, rng) if scale > 1 else CONDITION_DB
+    texts = synthetic_texts(conditions, n_texts, rng)
+
+    path = write_kb or os.path.join(tempfile.mkdtemp(prefix="healthlens-kb-"), "conditions.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": f"synthetic-{scale}x", "conditions": conditions}, f)
+    t0 = time.perf_counter()
+    index = load_kb_file(path)
+    load_ms = (time.perf_counter() - t0) * 1e3
+
+    legacy_texts = texts[:LEGACY_MAX_TEXTS]
+    t0 = time.perf_counter()
+    for text in legacy_texts:
+        legacy_analyze(conditions, text)
+    legacy_us = (time.perf_counter() - t0) / len(legacy_texts) * 1e6
+
+    latencies = np.empty(n_texts)
+    for i, text in enumerate(texts):
+        t0 = time.perf_counter()
+        index.top_conditions(index.match(text), k=3)
+        latencies[i] = time.perf_counter() - t0
+    index_us = latencies.mean() * 1e6
+    p99_us = np.percentile(latencies, 99) * 1e6
+
+    typo_texts = [with_typo(text, rng) for text in texts]
+    t0 = time.perf_counter()
+    for text in typo_texts:
+        index._corrections.clear()
+        index.top_conditions(index.match(text), k=3)
+    typo_us = (time.perf_counter() - t0) / n_texts * 1e6
+
+    print(f"{scale:>4}x {len(conditions):>10,} {len(index.keywords):>9,} {load_ms:>9.1f} "
+          f"{legacy_us:>11.1f} {index_us:>10.1f} {p99_us:>8.1f} {legacy_us / index_us:>8.1f}x {typo_us:>9.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Symptom knowledge base benchmark.")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--write-kb", default="", help="also keep the largest synthetic knowledge base at this path")
+    args = parser.parse_args()
+
+    check_expected()
+    scales = (1, 10, 100, 500)
+    print(f"{'scale':>5} {'conditions':>10} {'keywords':>9} {'load ms':>9} {'legacy µs':>11} {'index µs':>10} "
+          f"{'p99 µs':>8} {'speedup':>9} {'typo µs':>9}")
+    for scale in scales:
+        bench(scale, args.texts, args.seed, args.write_kb if scale == scales[-1] else "")
+
+
+if __name__ == "__main__":
+    main()
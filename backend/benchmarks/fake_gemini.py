@@ -0,0 +1,202 @@
+"""
+Local stand-in for the subset of the Gemini REST API the backend uses.
+
+Speaks `models/{model}:generateContent` and `models/{model}:streamGenerateContent`
+(SSE) as called by google-genai, accepts text and inline_data (image) parts, and
+answers with canned chat text or lab-report bodies. Latency, error rate and the
+shape of report bodies are configurable so the LLM paths can be load-tested
+offline without spending quota.
+
+Run from backend/:
+    python -m benchmarks.fake_gemini --port 8765 --latency lognormal:0.8:0.35 --error-rate 0.02
+then start the API with GEMINI_API_KEY=fake GEMINI_BASE_URL=http://127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPORT_VALUES = {
+    "Hemoglobin": {"value": "13.1", "unit": "g/dL", "status": "normal", "ref": "12.0-17.5"},
+    "Fasting Glucose": {"value": "118", "unit": "mg/dL", "status": "high", "ref": "70-100"},
+    "Total Cholesterol": {"value": "205", "unit": "mg/dL", "status": "borderline", "ref": "<200"},
+    "HDL Cholesterol": {"value": "52", "unit": "mg/dL", "status": "normal", "ref": ">40"},
+    "Creatinine": {"value": "0.9", "unit": "mg/dL", "status": "normal", "ref": "0.7-1.3"},
+}
+
+CHAT_REPLY = (
+    "Thanks for sharing that. Based on what you describe, it would be sensible to keep an eye on "
+    "your symptoms, stay hydrated and rest. If anything worsens or you develop chest pain or "
+    "difficulty breathing, seek medical care right away. This is not a medical diagnosis."
+)
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour knobs for the fake server."""
+    latency: str = "constant:0.5"           # constant:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA (seconds)
+    error_rate: float = 0.0                 # fraction of requests answered with an injected error
+    error_codes: List[int] = field(default_factory=lambda: [429, 500, 503])
+    report_mode: str = "json"               # json | fenced | text | mixed
+    stream_chunks: int = 6                  # SSE chunks per streamed response
+    seed: Optional[int] = None
+
+
+def _parse_latency(spec: str) -> Tuple[str, List[float]]:
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    expected = {"constant": 1, "uniform": 2, "lognormal": 2}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+    return kind, values
+
+
+class FakeGemini:
+    def __init__(self, config: FakeConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.latency_kind, self.latency_params = _parse_latency(config.latency)
+        self.stats = {"requests": 0, "errors": 0, "images": 0, "image_bytes": 0}
+
+    def sample_latency(self) -> float:
+        p = self.latency_params
+        if self.latency_kind == "constant":
+            return p[0]
+        if self.latency_kind == "uniform":
+            return self.rng.uniform(p[0], p[1])
+        return p[0] * self.rng.lognormvariate(0.0, p[1])
+
+    def maybe_error(self) -> Optional[JSONResponse]:
+        if self.rng.random() >= self.config.error_rate:
+            return None
+        self.stats["errors"] += 1
+        code = self.rng.choice(self.config.error_codes)
+        status = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}.get(code, "UNKNOWN")
+        return JSONResponse(
+            status_code=code,
+            content={"error": {"code": code, "message": "Injected fake error.", "status": status}},
+        )
+
+    def reply_text(self, body: Dict[str, Any]) -> str:
+        """Pick a chat or report answer depending on whether an image was sent."""
+        image_parts = [
+            part for content in body.get("contents", [])
+            for part in content.get("parts", [])
+            if "inline_data" in part or "inlineData" in part
+        ]
+        if not image_parts:
+            return CHAT_REPLY
+
+        self.stats["images"] += len(image_parts)
+        for part in image_parts:
+            data = (part.get("inline_data") or part.get("inlineData") or {}).get("data", "")
+            self.stats["image_bytes"] += len(data)
+
+        mode = self.config.report_mode
+        if mode == "mixed":
+            mode = self.rng.choice(["json", "fenced", "text"])
+        payload = {
+            "values": REPORT_VALUES,
+            "abnormal": [k for k, v in REPORT_VALUES.items() if v["status"] != "normal"],
+            "summary": "Fasting glucose is above range and total cholesterol is borderline. "
+                       "Discuss both with your doctor at your next visit.",
+        }
+        if mode == "json":
+            return json.dumps(payload)
+        if mode == "fenced":
+            return "```json\n" + json.dumps(payload, indent=2) + "\n```"
+        return "I could not find a structured table in this image, but glucose appears elevated."
+
+
+def _response_body(text: str, model: str, finish: Optional[str] = "STOP") -> Dict[str, Any]:
+    candidate: Dict[str, Any] = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finish:
+        candidate["finishReason"] = finish
+    tokens = max(1, len(text) // 4)
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": tokens, "totalTokenCount": 100 + tokens},
+        "modelVersion": model,
+    }
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    fake = FakeGemini(config or FakeConfig())
+    app = FastAPI(title="Fake Gemini")
+    app.state.fake = fake
+
+    @app.post("/{api_version}/models/{model}:generateContent")
+    async def generate_content(api_version: str, model: str, request: Request):
+        fake.stats["requests"] += 1
+        body = await request.json()
+        await asyncio.sleep(fake.sample_latency())
+        error = fake.maybe_error()
+        if error is not None:
+            return error
+        return _response_body(fake.reply_text(body), model)
+
+    @app.post("/{api_version}/models/{model}:streamGenerateContent")
+    async def stream_generate_content(api_version: str, model: str, request: Request):
+        fake.stats["requests"] += 1
+        body = await request.json()
+        total = fake.sample_latency()
+        n = max(1, fake.config.stream_chunks)
+        # Time-to-first-token is roughly a third of the total latency
+        await asyncio.sleep(total / 3)
+        error = fake.maybe_error()
+        if error is not None:
+            return error
+
+        text = fake.reply_text(body)
+        step = max(1, -(-len(text) // n))
+        pieces = [text[i:i + step] for i in range(0, len(text), step)]
+
+        async def events():
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(total * 2 / 3 / len(pieces))
+                finish = "STOP" if i == len(pieces) - 1 else None
+                yield f"data: {json.dumps(_response_body(piece, model, finish))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/_stats")
+    async def stats():
+        return fake.stats
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local fake Gemini API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="constant:0.5",
+                        help="constant:S | uniform:LO:HI | lognormal:MEDIAN:SIGMA (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-codes", default="429,500,503")
+    parser.add_argument("--report-mode", choices=["json", "fenced", "text", "mixed"], default="json")
+    parser.add_argument("--stream-chunks", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_codes=[int(c) for c in args.error_codes.split(",") if c],
+        report_mode=args.report_mode,
+        stream_chunks=args.stream_chunks,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
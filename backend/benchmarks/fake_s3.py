@@ -0,0 +1,155 @@
+"""
+Local stand-in for the subset of the S3 API the storage backend uses.
+
+Speaks path-style PutObject / GetObject / HeadObject / DeleteObject and
+ListObjectsV2 as called by boto3, keeps objects in memory, creates buckets on
+first write and ignores request signing, so STORAGE_BACKEND=s3 can be exercised
+offline without MinIO or AWS credentials.
+
+Run from backend/:
+    python -m benchmarks.fake_s3 --port 9000
+then start the API with STORAGE_BACKEND=s3 S3_BUCKET=healthlens
+S3_ENDPOINT_URL=http://127.0.0.1:9000 S3_ACCESS_KEY_ID=fake S3_SECRET_ACCESS_KEY=fake
+"""
+import argparse
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict
+from xml.sax.saxutils import escape
+
+from fastapi import FastAPI, Request, Response
+
+
+@dataclass
+class StoredObject:
+    data: bytes
+    content_type: str
+    etag: str
+    last_modified: datetime
+
+
+def _decode_aws_chunked(body: bytes) -> bytes:
+    """Strip aws-chunked framing ("<hex size>[;ext]\\r\\n<data>\\r\\n ... 0\\r\\n<trailers>")."""
+    out = bytearray()
+    pos = 0
+    while True:
+        eol = body.index(b"\r\n", pos)
+        size = int(body[pos:eol].split(b";")[0], 16)
+        if size == 0:
+            return bytes(out)
+        out += body[eol + 2:eol + 2 + size]
+        pos = eol + 2 + size + 2
+
+
+def _error(status: int, code: str, message: str) -> Response:
+    xml = f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><Error><Code>{code}</Code><Message>{message}</Message></Error>"
+    return Response(xml, status_code=status, media_type="application/xml")
+
+
+def _object_headers(obj: StoredObject) -> Dict[str, str]:
+    return {
+        "ETag": obj.etag,
+        "Last-Modified": format_datetime(obj.last_modified, usegmt=True),
+        "Content-Length": str(len(obj.data)),
+    }
+
+
+def create_app() -> FastAPI:
+    buckets: Dict[str, Dict[str, StoredObject]] = {}
+    stats = {"put": 0, "get": 0, "head": 0, "delete": 0, "list": 0}
+    app = FastAPI(title="Fake S3")
+    app.state.buckets = buckets
+
+    @app.get("/_stats")
+    async def get_stats():
+        return {**stats, "objects": sum(len(b) for b in buckets.values())}
+
+    @app.put("/{bucket}")
+    async def create_bucket(bucket: str):
+        buckets.setdefault(bucket, {})
+        return Response(status_code=200)
+
+    @app.get("/{bucket}")
+    async def list_objects(bucket: str, request: Request):
+        stats["list"] += 1
+        if bucket not in buckets:
+            return _error(404, "NoSuchBucket", "The specified bucket does not exist")
+        prefix = request.query_params.get("prefix", "")
+        max_keys = int(request.query_params.get("max-keys", 1000))
+        continuation_token = request.query_params.get("continuation-token")
+        keys = sorted(k for k in buckets[bucket] if k.startswith(prefix) and (not continuation_token or k > continuation_token))
+        page, truncated = keys[:max_keys], len(keys) > max_keys
+        contents = "".join(
+            f"<Contents><Key>{escape(k)}</Key><Size>{len(buckets[bucket][k].data)}</Size>"
+            f"<ETag>{escape(buckets[bucket][k].etag)}</ETag>"
+            f"<LastModified>{buckets[bucket][k].last_modified.strftime('%Y-%m-%dT%H:%M:%S.000Z')}</LastModified>"
+            f"<StorageClass>STANDARD</StorageClass></Contents>"
+            for k in page
+        )
+        next_token = f"<NextContinuationToken>{escape(page[-1])}</NextContinuationToken>" if truncated else ""
+        xml = (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
+            "<ListBucketResult xmlns=\"http://s3.amazonaws.com/doc/2006-03-01/\">"
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>"
+            f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+            f"{contents}{next_token}</ListBucketResult>"
+        )
+        return Response(xml, media_type="application/xml")
+
+    @app.put("/{bucket}/{key:path}")
+    async def put_object(bucket: str, key: str, request: Request):
+        stats["put"] += 1
+        data = await request.body()
+        if "aws-chunked" in request.headers.get("content-encoding", "") or \
+                request.headers.get("x-amz-content-sha256", "").startswith("STREAMING-"):
+            data = _decode_aws_chunked(data)
+        etag = f"\"{hashlib.md5(data).hexdigest()}\""
+        buckets.setdefault(bucket, {})[key] = StoredObject(
+            data=data,
+            content_type=request.headers.get("content-type", "application/octet-stream"),
+            etag=etag,
+            last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+        )
+        return Response(status_code=200, headers={"ETag": etag})
+
+    @app.head("/{bucket}/{key:path}")
+    async def head_object(bucket: str, key: str):
+        stats["head"] += 1
+        obj = buckets.get(bucket, {}).get(key)
+        if obj is None:
+            return Response(status_code=404)
+        return Response(status_code=200, headers=_object_headers(obj), media_type=obj.content_type)
+
+    @app.get("/{bucket}/{key:path}")
+    async def get_object(bucket: str, key: str):
+        stats["get"] += 1
+        obj = buckets.get(bucket, {}).get(key)
+        if obj is None:
+            return _error(404, "NoSuchKey", "The specified key does not exist.")
+        headers = _object_headers(obj)
+        del headers["Content-Length"]  # set by Response from the body
+        return Response(obj.data, headers=headers, media_type=obj.content_type)
+
+    @app.delete("/{bucket}/{key:path}")
+    async def delete_object(bucket: str, key: str):
+        stats["delete"] += 1
+        buckets.get(bucket, {}).pop(key, None)
+        return Response(status_code=204)
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local fake S3 server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,42 @@ class Settings(BaseSettings):
 
     # Gemini AI
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_BASE_URL: str = os.getenv("GEMINI_BASE_URL", "")  # override endpoint (local fake for load tests)
+
+    # Uploaded report files
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads"))
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")  # "local" (sharded UPLOAD_DIR) or "s3"
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")  # MinIO / local stand-in; empty for AWS
+    S3_REGION: str = os.getenv("S3_REGION", "")
+    S3_ACCESS_KEY_ID: str = os.getenv("S3_ACCESS_KEY_ID", "")
+    S3_SECRET_ACCESS_KEY: str = os.getenv("S3_SECRET_ACCESS_KEY", "")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "")
+    STORAGE_CACHE_MAX_MB: int = int(os.getenv("STORAGE_CACHE_MAX_MB", "512"))  # local read cache for S3
+
+    # Background report analysis
+    REPORT_WORKERS: int = int(os.getenv("REPORT_WORKERS", "2"))
+    REPORT_MAX_ATTEMPTS: int = int(os.getenv("REPORT_MAX_ATTEMPTS", "3"))
+    REPORT_PAGE_CONCURRENCY: int = int(os.getenv("REPORT_PAGE_CONCURRENCY", "4"))  # pages in flight per report
+
+    # Risk models (services.model_registry)
+    RISK_MODEL_DIR: str = os.getenv("RISK_MODEL_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "risk_models"))
+    RISK_MODEL_RELOAD_SECONDS: float = float(os.getenv("RISK_MODEL_RELOAD_SECONDS", "30"))  # 0 disables hot reload
+    RISK_SKETCH_FLUSH_SECONDS: float = float(os.getenv("RISK_SKETCH_FLUSH_SECONDS", "60"))  # percentile histograms; 0 = only on shutdown
+
+    # Symptom knowledge base (services.symptom_kb)
+    SYMPTOM_KB_PATH: str = os.getenv("SYMPTOM_KB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "symptom_conditions.json"))
+    SYMPTOM_KB_RELOAD_SECONDS: float = float(os.getenv("SYMPTOM_KB_RELOAD_SECONDS", "30"))  # 0 disables hot reload
+    # Common English words that spell correction must leave alone ("tried" is not "tired")
+    SYMPTOM_LEXICON_PATH: str = os.getenv("SYMPTOM_LEXICON_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "common_words.txt"))
+    # Re-analysis of stored symptom logs when the analyzer or knowledge base changes (services.symptom_reanalysis)
+    SYMPTOM_REANALYZE_AUTO: bool = os.getenv("SYMPTOM_REANALYZE_AUTO", "true").lower() == "true"
+    SYMPTOM_REANALYZE_WORKERS: int = int(os.getenv("SYMPTOM_REANALYZE_WORKERS", "2"))  # worker processes
+    SYMPTOM_REANALYZE_CHUNK: int = int(os.getenv("SYMPTOM_REANALYZE_CHUNK", "500"))  # logs per read / bulk update
+    SYMPTOM_REANALYZE_DUTY: float = float(os.getenv("SYMPTOM_REANALYZE_DUTY", "0.5"))  # max share of wall time spent working
+
+    # Food / nutrient database for meal plans (services.meal_planner)
+    FOOD_DB_PATH: str = os.getenv("FOOD_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "foods.json"))
 
     # Email (Resend)
     RESEND_API_KEY: str = os.getenv("RESEND_API_KEY", "")
@@ -1,10 +1,14 @@
 """
 Async database session management.
 """
+import logging
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from core.config import settings
 from models.database import Base
 
+logger = logging.getLogger(__name__)
+
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,
@@ -20,9 +24,25 @@ AsyncSessionLocal = async_sessionmaker(
 
 
 async def init_db():
-    """Create all tables on startup."""
+    """Create all tables on startup and add any new nullable columns to existing ones."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+
+
+def _add_missing_columns(sync_conn) -> None:
+    """Additive schema sync: create_all() only creates missing tables, not columns."""
+    inspector = inspect(sync_conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            col_type = column.type.compile(dialect=sync_conn.dialect)
+            sync_conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}')
+            logger.info(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
 
 async def get_db() -> AsyncSession:
@@ -5,12 +5,20 @@ import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
 
 from api.routes import auth, risk, symptoms, chat, nutrition
 from api.routes import dashboard, profile, reports, medications, vitals
-from core.database import init_db
+from core.config import settings
+from core.database import init_db, AsyncSessionLocal
+from services.report_jobs import report_jobs
+from services.image_preprocess import shutdown_preprocess_pool
+from services.medication_adherence import backfill_adherence
+from services.model_registry import model_registry
+from services.risk_percentiles import risk_percentiles
+from services.symptom_kb import symptom_kb
+from services.symptom_reanalysis import symptom_reanalysis
+from services.uploads import UploadSizeLimit
 
 # ── Logging ──────────────────────────────────────────
 logging.basicConfig(
@@ -23,12 +31,25 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Create DB tables on startup."""
+    """Create DB tables and start background workers on startup."""
     logger.info("Starting HealthLens AI backend...")
     await init_db()
     logger.info("Database initialized — tables created.")
+    await backfill_adherence(AsyncSessionLocal)
+    await model_registry.start()
+    await symptom_kb.start()
+    await risk_percentiles.start(AsyncSessionLocal)
+    await report_jobs.start()
+    if settings.SYMPTOM_REANALYZE_AUTO:
+        await symptom_reanalysis.start(AsyncSessionLocal)
     yield
     logger.info("Shutting down HealthLens AI backend.")
+    await model_registry.stop()
+    await symptom_kb.stop()
+    await symptom_reanalysis.stop()
+    await risk_percentiles.stop()
+    await report_jobs.stop()
+    shutdown_preprocess_pool()
 
 
 app = FastAPI(
@@ -52,10 +73,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ── Static files (uploads) ──────────────────────────
-uploads_dir = os.path.join(os.path.dirname(__file__), "uploads")
-os.makedirs(uploads_dir, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+# ── Upload size limit (before multipart parsing spools the body) ──
+app.add_middleware(UploadSizeLimit, paths={"/api/v1/reports/upload"})
 
 # ── Routes ───────────────────────────────────────────
 app.include_router(auth.router, prefix="/api/v1")
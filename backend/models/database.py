@@ -6,7 +6,7 @@ import uuid
 from datetime import datetime, timezone
 from sqlalchemy import (
     Column, String, Integer, Float, Text, Boolean,
-    DateTime, ForeignKey, JSON
+    Date, DateTime, ForeignKey, JSON, Index
 )
 from sqlalchemy.orm import relationship, DeclarativeBase
 from sqlalchemy.sql import func
@@ -86,10 +86,25 @@ class RiskPrediction(Base):
     input_data = Column(JSON, nullable=False)
     feature_importance = Column(JSON, nullable=True)
     explanation = Column(Text, nullable=True)
+    model_version = Column(String(50), nullable=True)
     created_at = Column(DateTime, default=utc_now, index=True)
 
     user = relationship("User", back_populates="risk_predictions")
 
+    # Latest-per-disease window and trend series (services.risk_history)
+    __table_args__ = (Index("ix_risk_predictions_user_disease_created", "user_id", "disease_type", "created_at"),)
+
+
+class RiskScoreSketch(Base):
+    """Persisted score histogram per disease and age band (services.risk_percentiles)."""
+    __tablename__ = "risk_score_sketches"
+
+    disease_type = Column(String(100), primary_key=True)
+    age_band = Column(String(20), primary_key=True)  # "all", "<30", "30-39", ..., "70+"
+    counts = Column(JSON, nullable=False, default=dict)  # sparse {"<score bin>": count}
+    total = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
+
 
 # ── SYMPTOM LOGS ──────────────────────────────────────
 class SymptomLog(Base):
@@ -102,6 +117,7 @@ class SymptomLog(Base):
     possible_conditions = Column(JSON, nullable=True)
     urgency_level = Column(String(20), nullable=True)
     recommendations = Column(JSON, nullable=True)
+    analyzer_version = Column(String(50), nullable=True, index=True)  # services.symptom_analyzer.analyzer_version
     created_at = Column(DateTime, default=utc_now, index=True)
 
     user = relationship("User", back_populates="symptom_logs")
@@ -116,15 +132,66 @@ class MedicalReport(Base):
     file_name = Column(String(255), nullable=False)
     file_url = Column(Text, nullable=False)
     file_type = Column(String(50), nullable=True)
+    file_size = Column(Integer, nullable=True)
+    file_sha256 = Column(String(64), nullable=True, index=True)
     ocr_text = Column(Text, nullable=True)
     extracted_values = Column(JSON, nullable=True)
     ai_summary = Column(Text, nullable=True)
     abnormal_flags = Column(JSON, nullable=True)
+    ranges_version = Column(String(20), nullable=True)  # reference-range table used for abnormal_flags
+    # The narrative (Gemini) summary was replaced after re-flagging changed the flags
+    summary_needs_reanalysis = Column(Boolean, nullable=True)
+    analysis_status = Column(String(20), nullable=True)  # "pending", "completed", "failed"
     created_at = Column(DateTime, default=utc_now, index=True)
 
     user = relationship("User", back_populates="medical_reports")
 
 
+class StoredFile(Base):
+    """Content-addressed upload blob shared by every report with byte-identical content."""
+    __tablename__ = "stored_files"
+
+    sha256 = Column(String(64), primary_key=True)
+    file_url = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    content_type = Column(String(100), nullable=True)
+    ref_count = Column(Integer, default=0)
+    preview_sizes = Column(JSON, nullable=True)  # thumbnail sizes written next to the file; [] if none possible
+    # Cached analysis, reused for re-uploads of the same bytes
+    analysis_status = Column(String(20), nullable=True)  # None, "running", "completed"
+    analysis_lease_expires_at = Column(DateTime, nullable=True)
+    ocr_text = Column(Text, nullable=True)
+    extracted_values = Column(JSON, nullable=True)
+    abnormal_flags = Column(JSON, nullable=True)
+    ai_summary = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
+
+
+class ReportAnalysisJob(Base):
+    """Durable queue entry for background report analysis."""
+    __tablename__ = "report_analysis_jobs"
+
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    report_id = Column(String(36), ForeignKey("medical_reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    content_type = Column(String(100), nullable=False)
+    status = Column(String(20), default="queued", index=True)  # "queued", "running", "succeeded", "failed"
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    next_run_at = Column(DateTime, default=utc_now, index=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    lease_owner = Column(String(36), nullable=True)  # claim token; renewed and checked by the running worker
+    last_error = Column(Text, nullable=True)
+    # Page-parallel analysis progress; page_results survive retries so finished pages aren't re-sent
+    pages_total = Column(Integer, nullable=True)
+    pages_done = Column(Integer, nullable=True)
+    page_results = Column(JSON, nullable=True)  # {"<page index>": {"values": {...}, "summary": "..."}}
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
+    finished_at = Column(DateTime, nullable=True)
+
+
 # ── CHAT MESSAGES ─────────────────────────────────────
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -146,12 +213,24 @@ class NutritionPlan(Base):
 
     id = Column(String(36), primary_key=True, default=generate_uuid)
     user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    content_sha256 = Column(String(64), ForeignKey("nutrition_plan_contents.sha256"), nullable=True, index=True)
+    # Inline plan body: rows written before content_sha256 existed
     risk_context = Column(JSON, nullable=True)
     diet_recommendations = Column(JSON, nullable=True)
     lifestyle_recommendations = Column(JSON, nullable=True)
     created_at = Column(DateTime, default=utc_now, index=True)
 
     user = relationship("User", back_populates="nutrition_plans")
+    content = relationship("NutritionPlanContent")
+
+
+class NutritionPlanContent(Base):
+    """Plan body stored once per distinct content, shared by every NutritionPlan with the same hash."""
+    __tablename__ = "nutrition_plan_contents"
+
+    sha256 = Column(String(64), primary_key=True)  # of the canonical JSON body
+    body = Column(JSON, nullable=False)  # {"risk_context", "diet_recommendations", "lifestyle_recommendations"}
+    created_at = Column(DateTime, default=utc_now)
 
 
 # ── CONSENT RECORDS ───────────────────────────────────
@@ -198,6 +277,21 @@ class MedicationLog(Base):
     medication = relationship("Medication", back_populates="logs")
 
 
+class MedicationAdherenceDay(Base):
+    """Taken / missed counts per medication and UTC day (services.medication_adherence)."""
+    __tablename__ = "medication_adherence_days"
+
+    medication_id = Column(String(36), ForeignKey("medications.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    taken_count = Column(Integer, nullable=False, default=0)
+    missed_count = Column(Integer, nullable=False, default=0)
+    # Carried in from earlier days when the row is created: the adherent-day streak
+    # ending yesterday, and the longest streak before this day
+    prior_streak = Column(Integer, nullable=False, default=0)
+    prior_best_streak = Column(Integer, nullable=False, default=0)
+
+
 # ── VITAL RECORDS ────────────────────────────────────
 class VitalRecord(Base):
     __tablename__ = "vital_records"
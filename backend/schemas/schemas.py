@@ -1,10 +1,12 @@
 """
 Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from services.model_registry import model_registry
+
 
 # ── AUTH ──────────────────────────────────────────────
 
@@ -90,6 +92,54 @@ class RiskInput(BaseModel):
     alcohol: Optional[bool] = False
 
 
+RISK_BATCH_MAX_RECORDS = 10_000
+
+
+class RiskBatchRecord(RiskInput):
+    measured_at: Optional[datetime] = None  # backfilled predictions keep the source record's date
+
+
+def _registered_disease(v: str) -> str:
+    """Check disease_type against the models the registry serves at request time."""
+    registered = model_registry.disease_types()
+    if v not in registered:
+        raise ValueError(f"unknown disease_type; registered: {', '.join(registered)}")
+    return v
+
+
+class RiskBatchInput(BaseModel):
+    disease_type: str
+    records: List[RiskBatchRecord] = Field(..., min_length=1, max_length=RISK_BATCH_MAX_RECORDS)
+    persist: bool = True
+
+    _check_disease = field_validator("disease_type")(_registered_disease)
+
+
+WHAT_IF_MAX_STEPS = 50
+
+
+class WhatIfAxis(BaseModel):
+    feature: str
+    min_delta: float = 0.0
+    max_delta: float = 0.0
+    steps: int = Field(11, ge=2, le=WHAT_IF_MAX_STEPS)
+
+    @field_validator("max_delta")
+    @classmethod
+    def delta_order(cls, v, info):
+        if v < info.data.get("min_delta", v):
+            raise ValueError("max_delta must be >= min_delta")
+        return v
+
+
+class RiskWhatIfInput(BaseModel):
+    disease_type: str
+    base: RiskInput
+    axes: List[WhatIfAxis] = Field(..., min_length=1, max_length=2)
+
+    _check_disease = field_validator("disease_type")(_registered_disease)
+
+
 class RiskResult(BaseModel):
     id: str
     disease_type: str
@@ -97,6 +147,9 @@ class RiskResult(BaseModel):
     risk_category: str
     feature_importance: Dict[str, float]
     explanation: str
+    model_version: Optional[str] = None
+    percentile: Optional[float] = None  # share of stored scores (0-100) below this one
+    percentile_cohort: Optional[str] = None  # age band compared against, or "all"
     created_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
@@ -140,6 +193,12 @@ class ChatResponse(BaseModel):
 
 # ── NUTRITION ────────────────────────────────────────
 
+class NutritionRiskInput(BaseModel):
+    """One risk result driving the plan; other RiskResult fields sent along are ignored."""
+    disease_type: str
+    risk_category: str
+
+
 class NutritionOut(BaseModel):
     id: str
     risk_context: Dict[str, Any]
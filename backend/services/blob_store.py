@@ -0,0 +1,127 @@
+"""
+Reference-counted, content-addressed upload blobs.
+
+Every MedicalReport points at a StoredFile keyed by the SHA-256 of its bytes.
+Re-uploading identical bytes bumps the reference count instead of storing a new
+copy, and the blob caches the analysis so the paid Gemini call runs once per
+distinct file. Concurrent analyses of the same blob are coalesced with a
+DB-level lease (single-flight): one job leads, the others wait and copy.
+"""
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, delete, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import StoredFile, utc_now
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_LEASE_SECONDS = 300
+
+
+async def acquire_blob(
+    db: AsyncSession,
+    sha256: str,
+    file_url: str,
+    size: int,
+    content_type: Optional[str],
+) -> StoredFile:
+    """Add a reference to the blob for `sha256`, creating it on first upload."""
+    for _ in range(2):
+        result = await db.execute(
+            update(StoredFile).where(StoredFile.sha256 == sha256)
+            .values(ref_count=StoredFile.ref_count + 1)
+        )
+        if result.rowcount == 0:
+            try:
+                async with db.begin_nested():
+                    db.add(StoredFile(
+                        sha256=sha256, file_url=file_url, size=size,
+                        content_type=content_type, ref_count=1,
+                    ))
+            except IntegrityError:
+                continue  # created concurrently — take the UPDATE path
+        blob = await db.execute(
+            select(StoredFile).where(StoredFile.sha256 == sha256).execution_options(populate_existing=True)
+        )
+        return blob.scalar_one()
+    raise RuntimeError(f"Could not acquire blob {sha256}")
+
+
+async def release_blob(db: AsyncSession, sha256: str) -> Optional[str]:
+    """Drop a reference; returns the blob's file_url if it is now unreferenced and removed."""
+    await db.execute(
+        update(StoredFile).where(StoredFile.sha256 == sha256)
+        .values(ref_count=StoredFile.ref_count - 1)
+    )
+    file_url = (await db.execute(
+        select(StoredFile.file_url).where(StoredFile.sha256 == sha256, StoredFile.ref_count <= 0)
+    )).scalar_one_or_none()
+    if file_url is None:
+        return None
+    result = await db.execute(
+        delete(StoredFile).where(StoredFile.sha256 == sha256, StoredFile.ref_count <= 0)
+    )
+    return file_url if result.rowcount == 1 else None
+
+
+# ── Single-flight analysis ───────────────────────────
+
+async def try_lead_analysis(db: AsyncSession, sha256: str) -> str:
+    """
+    Try to become the one analysis run for this blob.
+    Returns "lead", "completed" (cached result available) or "wait" (another run holds the lease).
+    Commits the session.
+    """
+    now = utc_now()
+    result = await db.execute(
+        update(StoredFile)
+        .where(
+            StoredFile.sha256 == sha256,
+            or_(
+                StoredFile.analysis_status.is_(None),
+                and_(StoredFile.analysis_status == "running", StoredFile.analysis_lease_expires_at < now),
+            ),
+        )
+        .values(analysis_status="running", analysis_lease_expires_at=now + timedelta(seconds=ANALYSIS_LEASE_SECONDS))
+    )
+    await db.commit()
+    if result.rowcount == 1:
+        return "lead"
+    status = (await db.execute(
+        select(StoredFile.analysis_status).where(StoredFile.sha256 == sha256)
+    )).scalar_one_or_none()
+    return "completed" if status == "completed" else "wait"
+
+
+async def store_analysis(
+    db: AsyncSession,
+    sha256: str,
+    values: dict,
+    abnormal: list,
+    summary: str,
+    ocr_text: Optional[str] = None,
+) -> None:
+    """Cache the leader's result on the blob (caller commits)."""
+    await db.execute(
+        update(StoredFile).where(StoredFile.sha256 == sha256).values(
+            analysis_status="completed",
+            analysis_lease_expires_at=None,
+            ocr_text=ocr_text,
+            extracted_values=values,
+            abnormal_flags=abnormal,
+            ai_summary=summary,
+        )
+    )
+
+
+async def abandon_analysis(db: AsyncSession, sha256: str) -> None:
+    """Release the lease after a failed run so another job can lead (caller commits)."""
+    await db.execute(
+        update(StoredFile)
+        .where(StoredFile.sha256 == sha256, StoredFile.analysis_status == "running")
+        .values(analysis_status=None, analysis_lease_expires_at=None)
+    )
@@ -7,6 +7,7 @@ from typing import List, Dict, Any, Optional
 from services.risk_prediction import predict_diabetes_risk, predict_heart_disease_risk
 from services.symptom_analyzer import analyze_symptoms
 from services.nutrition_engine import generate_nutrition_plan
+from services.gemini_client import get_genai_client
 
 logger = logging.getLogger(__name__)
 
@@ -83,15 +84,17 @@ async def chat_with_gemini(
     user_message: str,
     chat_history: List[Dict[str, str]],
     gemini_api_key: Optional[str] = None,
+    context: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Process a chat message. Uses Gemini API if key is available,
     otherwise falls back to rule-based responses.
+    `context` is an optional block of retrieved user records appended to the system prompt.
     """
     # Try Gemini API first
     if gemini_api_key:
         try:
-            return await _gemini_chat(user_message, chat_history, gemini_api_key)
+            return await _gemini_chat(user_message, chat_history, gemini_api_key, context)
         except Exception as e:
             logger.warning(f"Gemini API failed, using fallback: {e}")
 
@@ -103,11 +106,10 @@ async def _gemini_chat(
     user_message: str,
     chat_history: List[Dict[str, str]],
     api_key: str,
+    context: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Use the Google Generative AI SDK to chat."""
-    from google import genai
-
-    client = genai.Client(api_key=api_key)
+    client = get_genai_client(api_key)
 
     # Build conversation history (exclude current message)
     contents = []
@@ -120,7 +122,7 @@ async def _gemini_chat(
     response = client.models.generate_content(
         model="gemini-2.0-flash",
         contents=contents,
-        config={"system_instruction": SYSTEM_PROMPT},
+        config={"system_instruction": f"{SYSTEM_PROMPT}\n{context}" if context else SYSTEM_PROMPT},
     )
 
     content = response.text if response.text else "I'm sorry, I couldn't generate a response."
@@ -0,0 +1,22 @@
+"""
+Shared Gemini client factory.
+
+Clients are cached per API key so the underlying HTTP connection pool is reused
+across requests. When GEMINI_BASE_URL is set, requests go to that endpoint instead
+of Google (e.g. the local stand-in in benchmarks/fake_gemini.py for load tests).
+"""
+from functools import lru_cache
+
+from core.config import settings
+
+
+@lru_cache(maxsize=8)
+def get_genai_client(api_key: str):
+    """Return a cached google.genai Client for the given key."""
+    from google import genai
+    from google.genai import types
+
+    http_options = None
+    if settings.GEMINI_BASE_URL:
+        http_options = types.HttpOptions(base_url=settings.GEMINI_BASE_URL)
+    return genai.Client(api_key=api_key, http_options=http_options)
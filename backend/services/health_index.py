@@ -0,0 +1,288 @@
+"""
+Per-user retrieval index over stored health records (chat grounding).
+
+Each user gets an in-memory BM25 index over their vitals, medical reports,
+risk predictions and medications. The index is built from the database the
+first time the user chats and is then kept up to date incrementally by the
+write routes, so a chat turn only pays for a top-k lookup instead of pasting
+the whole record history into the prompt. Writes that land while an index is
+being built make the build start over, so it never misses or resurrects them.
+"""
+import heapq
+import logging
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import VitalRecord, MedicalReport, RiskPrediction, Medication
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Maximum number of user indexes kept resident (least recently used evicted)
+MAX_RESIDENT_USERS = 1000
+
+# Builds restarted because of concurrent writes before giving up on caching the result
+MAX_BUILD_ATTEMPTS = 3
+
+# Prompt budget for retrieved context
+DEFAULT_TOP_K = 5
+MAX_SNIPPET_CHARS = 400
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "for", "from", "has", "have",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "that", "the", "this",
+    "to", "was", "what", "when", "with", "you", "your",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word/number tokenizer with a small stopword list."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class UserHealthIndex:
+    """Incremental BM25 index over one user's health records."""
+
+    def __init__(self) -> None:
+        self._docs: Dict[str, Tuple[str, Counter]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Insert or replace a document."""
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        tf = Counter(tokenize(text))
+        if not tf:
+            return
+        self._docs[doc_id] = (text, tf)
+        length = sum(tf.values())
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        for term, count in tf.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_id: str) -> None:
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        self._total_len -= self._doc_len.pop(doc_id)
+        for term in entry[1]:
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[term]
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K) -> List[Tuple[float, str, str]]:
+        """Return up to k (score, doc_id, text) tuples, best first."""
+        n_docs = len(self._docs)
+        if not n_docs:
+            return []
+        avg_len = self._total_len / n_docs
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+        return [(round(score, 4), doc_id, self._docs[doc_id][0]) for doc_id, score in top]
+
+
+# ── Record → text ────────────────────────────────────
+
+def _date(dt: Any) -> str:
+    return dt.strftime("%Y-%m-%d") if dt else "unknown date"
+
+
+def vital_to_text(v: Any) -> str:
+    parts = []
+    if v.blood_pressure_systolic:
+        parts.append(f"blood pressure {v.blood_pressure_systolic:g}/{v.blood_pressure_diastolic or 0:g} mmHg")
+    if v.heart_rate:
+        parts.append(f"heart rate {v.heart_rate:g} bpm")
+    if v.blood_glucose:
+        parts.append(f"blood glucose sugar {v.blood_glucose:g} mg/dL")
+    if v.weight_kg:
+        parts.append(f"weight {v.weight_kg:g} kg")
+    if v.oxygen_saturation:
+        parts.append(f"oxygen saturation {v.oxygen_saturation:g}%")
+    if v.temperature:
+        parts.append(f"temperature {v.temperature:g}")
+    if v.steps:
+        parts.append(f"steps {v.steps}")
+    if v.sleep_hours:
+        parts.append(f"sleep {v.sleep_hours:g} hours")
+    return f"Vitals on {_date(v.recorded_at)} ({v.source}): " + ", ".join(parts)
+
+
+def report_to_text(r: Any) -> str:
+    values = r.extracted_values or {}
+    items = []
+    for name, v in values.items():
+        if isinstance(v, dict):
+            items.append(f"{name} {v.get('value', '?')} {v.get('unit', '')} {v.get('status', '')}".strip())
+        else:
+            items.append(f"{name} {v}")
+    flagged = ", ".join(r.abnormal_flags or []) or "none"
+    return f"Lab report {r.file_name} on {_date(r.created_at)}: " + "; ".join(items) + f". Abnormal: {flagged}"
+
+
+def risk_to_text(r: Any) -> str:
+    disease = r.disease_type.replace("_", " ")
+    factors = ", ".join(list((r.feature_importance or {}).keys())[:3])
+    return (
+        f"Risk assessment on {_date(r.created_at)}: {disease} risk {r.risk_category} "
+        f"({r.risk_score:.0%}). Top factors: {factors}"
+    )
+
+
+def medication_to_text(m: Any) -> str:
+    status = "active" if m.is_active else "stopped"
+    text = f"Medication {m.name} {m.dosage or ''} {m.frequency or ''} ({status})"
+    if m.notes:
+        text += f". Notes: {m.notes}"
+    return text
+
+
+_FORMATTERS = {
+    "vital": vital_to_text,
+    "report": report_to_text,
+    "risk": risk_to_text,
+    "medication": medication_to_text,
+}
+
+
+# ── Per-user registry ────────────────────────────────
+
+_indexes: "OrderedDict[str, UserHealthIndex]" = OrderedDict()
+# Users with a build in flight -> [builds in flight, writes seen since the first one started]
+_builds: Dict[str, List[int]] = {}
+
+
+def _note_write(user_id: str) -> None:
+    build = _builds.get(user_id)
+    if build is not None:
+        build[1] += 1
+
+
+def index_record(user_id: str, kind: str, record: Any) -> None:
+    """
+    Add/replace a record in the user's index (if resident). Call after the
+    write is committed: the index outlives the session, and a rolled-back
+    record would otherwise stay searchable.
+    """
+    _note_write(user_id)
+    index = _indexes.get(user_id)
+    if index is None:
+        return  # built from the DB on first use
+    index.add(f"{kind}:{record.id}", _FORMATTERS[kind](record))
+
+
+def unindex_record(user_id: str, kind: str, record_id: str) -> None:
+    """Remove a deleted record from the user's index (if resident), after the commit."""
+    _note_write(user_id)
+    index = _indexes.get(user_id)
+    if index is not None:
+        index.remove(f"{kind}:{record_id}")
+
+
+def invalidate_user_index(user_id: str) -> None:
+    """Drop the user's resident index after a committed bulk write; it is rebuilt on next use."""
+    _note_write(user_id)
+    _indexes.pop(user_id, None)
+
+
+async def _build_index(db: AsyncSession, user_id: str) -> UserHealthIndex:
+    index = UserHealthIndex()
+    for kind, model in (
+        ("vital", VitalRecord),
+        ("report", MedicalReport),
+        ("risk", RiskPrediction),
+        ("medication", Medication),
+    ):
+        result = await db.execute(select(model).where(model.user_id == user_id))
+        for record in result.scalars():
+            index.add(f"{kind}:{record.id}", _FORMATTERS[kind](record))
+    return index
+
+
+async def get_user_index(db: AsyncSession, user_id: str) -> UserHealthIndex:
+    """
+    Return the user's index, building it from the DB on first access. A build
+    reads the tables one await at a time, so a write indexed meanwhile (which
+    finds no resident index to update) may be missing from what was read; such
+    a build is discarded and redone. If writes keep landing, the last build is
+    returned without being kept resident.
+    """
+    index = _indexes.get(user_id)
+    if index is not None:
+        _indexes.move_to_end(user_id)
+        return index
+
+    build = _builds.setdefault(user_id, [0, 0])
+    build[0] += 1
+    try:
+        for _ in range(MAX_BUILD_ATTEMPTS):
+            writes = build[1]
+            index = await _build_index(db, user_id)
+            if build[1] == writes:
+                break
+        else:
+            logger.warning(f"Health index for user {user_id} kept changing while building; not cached")
+            return index
+    finally:
+        build[0] -= 1
+        if not build[0]:
+            del _builds[user_id]
+
+    resident = _indexes.get(user_id)
+    if resident is not None:
+        return resident  # a concurrent build finished first
+    _indexes[user_id] = index
+    if len(_indexes) > MAX_RESIDENT_USERS:
+        _indexes.popitem(last=False)
+    logger.info(f"Health index built for user {user_id}: {len(index)} records")
+    return index
+
+
+async def retrieve_context(
+    db: AsyncSession,
+    user_id: str,
+    query: str,
+    k: int = DEFAULT_TOP_K,
+) -> List[str]:
+    """Top-k record snippets relevant to the query, truncated for the prompt."""
+    index = await get_user_index(db, user_id)
+    return [text[:MAX_SNIPPET_CHARS] for _, _, text in index.search(query, k)]
+
+
+def format_context(snippets: List[str]) -> Optional[str]:
+    """Render retrieved snippets as a prompt section (None if nothing matched)."""
+    if not snippets:
+        return None
+    lines = "\n".join(f"- {s}" for s in snippets)
+    return (
+        "Relevant records from this user's stored health history "
+        "(use only if relevant to the question):\n" + lines
+    )
@@ -0,0 +1,89 @@
+"""
+Report image preprocessing before Gemini Vision.
+
+Phone photos of lab sheets are typically several megabytes at 12+ MP, far more
+than the model needs to read printed text. Before analysis each image gets its
+EXIF orientation applied, is downscaled to REPORT_IMAGE_MAX_SIDE, converted to
+contrast-stretched grayscale and recompressed as JPEG. The work runs in a
+process pool so decoding/resampling never blocks the event loop; the worker
+reads the file itself so only the (small) result crosses the process boundary.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REPORT_IMAGE_MAX_SIDE = 2048
+REPORT_IMAGE_JPEG_QUALITY = 85
+PREPROCESS_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def preprocess_image_bytes(data: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """
+    Normalize a report image for OCR-style reading. Returns (bytes, mime_type).
+    Falls back to the original bytes if Pillow is unavailable, the image can't be
+    decoded, or recompression would not make it smaller.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return data, mime_type
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((REPORT_IMAGE_MAX_SIDE, REPORT_IMAGE_MAX_SIDE), Image.Resampling.LANCZOS)
+            img = ImageOps.autocontrast(img.convert("L"), cutoff=1)
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=REPORT_IMAGE_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        logger.warning(f"Image preprocessing failed, sending original: {e}")
+        return data, mime_type
+
+    processed = out.getvalue()
+    if len(processed) >= len(data):
+        return data, mime_type
+    return processed, "image/jpeg"
+
+
+def preprocess_image_file(path: str, mime_type: str) -> Tuple[bytes, str]:
+    """Process-pool entry point: read and preprocess in the worker process."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return preprocess_image_bytes(data, mime_type)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that owns event-loop / DB threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=PREPROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def run_in_process_pool(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a picklable, CPU-bound image function in the shared process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), fn, *args)
+
+
+async def preprocess_report_image(path: str, mime_type: str) -> Tuple[bytes, str]:
+    """Preprocess the image at `path` in the process pool."""
+    return await run_in_process_pool(preprocess_image_file, path, mime_type)
+
+
+def shutdown_preprocess_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
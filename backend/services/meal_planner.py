@@ -0,0 +1,232 @@
+"""
+Meal planning against a local food / nutrient database.
+
+The foods in FOOD_DB_PATH (backend/data/foods.json) are held as one float32
+matrix (food x nutrient per serving) with boolean meal-slot and allergen masks.
+diet_targets turns a UserProfile and the risk context into daily energy,
+macronutrient and limit targets (Mifflin-St Jeor energy, diabetes / heart
+adjustments, allergens to exclude), rounded so that similar profiles share
+one memoized plan.
+
+plan_week picks one breakfast, lunch, dinner and snack per day. Every
+allowed combination of the best MAX_CANDIDATES dishes per slot is scored at
+once with NumPy (day totals, the portion scale that best meets the energy
+target, squared relative deviation from the targets plus limit overshoot);
+the week is then built greedily, one day at a time, adding a penalty for
+dishes already used so the plan rotates through the database.
+"""
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+from services.reference_ranges import age_from_dob
+
+logger = logging.getLogger(__name__)
+
+NUTRIENTS = ("kcal", "protein_g", "carbs_g", "fat_g", "sat_fat_g", "fiber_g", "sugar_g", "sodium_mg")
+KCAL, PROTEIN, CARBS, FAT, SAT_FAT, FIBER, SUGAR, SODIUM = range(len(NUTRIENTS))
+SLOTS = ("breakfast", "lunch", "dinner", "snack")
+# Share of daily energy per slot, used to rank dishes before combining them
+SLOT_SHARE = np.array([0.25, 0.35, 0.30, 0.10], dtype=np.float32)
+
+MAX_CANDIDATES = 20  # dishes per slot entering the combination search (20^4 = 160k day combinations)
+SERVING_STEP = 0.25
+MIN_SERVINGS, MAX_SERVINGS = 0.75, 2.0
+VARIETY_PENALTY = 0.05  # per earlier use of a dish this week
+REPEAT_PENALTY = 0.10  # extra, for a dish also served the day before
+LIMIT_WEIGHT = 20.0  # squared relative overshoot of the sodium / saturated-fat / sugar limits
+
+# Default profile when fields are missing
+DEFAULT_AGE, DEFAULT_HEIGHT_CM, DEFAULT_WEIGHT_KG = 40, 170.0, 70.0
+ACTIVITY_FACTORS = {"sedentary": 1.2, "light": 1.375, "moderate": 1.55, "active": 1.725, "very_active": 1.9}
+DEFAULT_ACTIVITY = "light"
+
+DIABETES_TERMS = ("diabetes", "diabetic", "prediabetes", "prediabetic", "insulin")
+HEART_TERMS = ("hypertension", "heart", "cardiac", "cardiovascular", "cholesterol", "hyperlipidemia", "stroke")
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+class DietTargets(NamedTuple):
+    """Daily targets (hashable: part of the plan memo key)."""
+    kcal: int
+    protein_g: int
+    carbs_g: int
+    fat_g: int
+    fiber_min_g: int
+    sugar_max_g: int
+    sat_fat_max_g: int
+    sodium_max_mg: int
+    exclude: Tuple[str, ...]  # allergens
+
+
+class FoodDatabase:
+    """Foods as a nutrient matrix with meal-slot and allergen masks."""
+
+    def __init__(self, doc: Dict[str, Any]):
+        foods = doc["foods"]
+        self.version = str(doc.get("version", ""))
+        self.names: List[str] = [f["name"] for f in foods]
+        self.allergens: List[str] = list(doc["allergens"])
+        self.aliases: Dict[str, str] = {a: a for a in self.allergens}
+        self.aliases.update(doc.get("allergen_aliases", {}))
+        self.nutrients = np.array(
+            [[float(f["per_serving"].get(n, 0.0)) for n in NUTRIENTS] for f in foods], dtype=np.float32
+        )
+        self.slots = np.array([[s in f["meals"] for s in SLOTS] for f in foods], dtype=bool)
+        self.allergen_mask = np.array([[a in f["allergens"] for a in self.allergens] for f in foods], dtype=bool)
+
+    def excluded_allergens(self, texts: Iterable[str]) -> Tuple[str, ...]:
+        """Allergens named in free-text allergies / conditions ("Peanuts", "lactose intolerance")."""
+        found: Set[str] = set()
+        for text in texts:
+            for word in _WORD_RE.findall(str(text).lower()):
+                allergen = self.aliases.get(word) or self.aliases.get(_singular(word))
+                if allergen:
+                    found.add(allergen)
+        return tuple(sorted(found))
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def load_food_db(path: str) -> FoodDatabase:
+    with open(path, encoding="utf-8") as f:
+        db = FoodDatabase(json.load(f))
+    logger.info(f"Food database {db.version} loaded: {len(db.names)} foods")
+    return db
+
+
+@lru_cache(maxsize=1)
+def food_db() -> FoodDatabase:
+    return load_food_db(settings.FOOD_DB_PATH)
+
+
+# ── Targets ──────────────────────────────────────────
+
+def _mentions(texts: Iterable[str], terms: Tuple[str, ...]) -> bool:
+    return any(term in str(text).lower() for text in texts for term in terms)
+
+
+def diet_targets(risks: Dict[str, str], profile: Any = None, db: Optional[FoodDatabase] = None) -> DietTargets:
+    """Daily targets from a UserProfile (or None) and the {disease_type: risk_category} context."""
+    db = db or food_db()
+    weight = float(getattr(profile, "weight_kg", None) or DEFAULT_WEIGHT_KG)
+    height = float(getattr(profile, "height_cm", None) or DEFAULT_HEIGHT_CM)
+    age = age_from_dob(getattr(profile, "date_of_birth", None)) or DEFAULT_AGE
+    gender = str(getattr(profile, "gender", None) or "").strip().lower()
+    conditions = list(getattr(profile, "medical_conditions", None) or [])
+    allergies = list(getattr(profile, "allergies", None) or [])
+    lifestyle = getattr(profile, "lifestyle", None) or {}
+
+    # Mifflin-St Jeor resting energy; the sex constant is averaged when unknown
+    sex_offset = 5 if gender in ("m", "male", "man") else -161 if gender in ("f", "female", "woman") else -78
+    bmr = 10 * weight + 6.25 * height - 5 * age + sex_offset
+    activity = str(lifestyle.get("activity_level") or DEFAULT_ACTIVITY).strip().lower().replace(" ", "_")
+    kcal = bmr * ACTIVITY_FACTORS.get(activity, ACTIVITY_FACTORS[DEFAULT_ACTIVITY])
+    bmi = weight / (height / 100) ** 2
+    if bmi >= 25:
+        kcal -= 500  # ~0.5 kg/week
+    elif bmi < 18.5:
+        kcal += 300
+    kcal = int(round(max(kcal, 1500 if sex_offset == 5 else 1200) / 50) * 50)
+
+    diabetes = risks.get("diabetes") in ("moderate", "high") or _mentions(conditions, DIABETES_TERMS)
+    heart = risks.get("heart_disease") in ("moderate", "high") or _mentions(conditions, HEART_TERMS)
+    protein_pct, carbs_pct, fat_pct = (0.25, 0.40, 0.35) if diabetes else (0.20, 0.50, 0.30)
+
+    return DietTargets(
+        kcal=kcal,
+        protein_g=int(round(kcal * protein_pct / 4)),
+        carbs_g=int(round(kcal * carbs_pct / 4)),
+        fat_g=int(round(kcal * fat_pct / 9)),
+        fiber_min_g=int(round(kcal / 1000 * (17 if diabetes else 14))),
+        sugar_max_g=int(round(kcal * (0.07 if diabetes else 0.10) / 4)),
+        sat_fat_max_g=int(round(kcal * (0.06 if heart else 0.10) / 9)),
+        sodium_max_mg=1500 if heart else 2300,
+        exclude=db.excluded_allergens(allergies + conditions),
+    )
+
+
+# ── Solver ───────────────────────────────────────────
+
+def _target_arrays(t: DietTargets) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    goals = np.array([t.kcal, t.protein_g, t.carbs_g, t.fat_g], dtype=np.float32)
+    goal_weights = np.array([4.0, 1.0, 1.0, 1.0], dtype=np.float32)
+    limits = np.array([t.sat_fat_max_g, t.sugar_max_g, t.sodium_max_mg], dtype=np.float32)
+    return goals, goal_weights, limits
+
+
+def _day_cost(totals: np.ndarray, t: DietTargets) -> Tuple[np.ndarray, np.ndarray]:
+    """(cost, servings) for day totals (..., nutrient) at one serving of each dish."""
+    goals, goal_weights, limits = _target_arrays(t)
+    servings = np.clip(
+        np.round(t.kcal / np.maximum(totals[..., KCAL], 1.0) / SERVING_STEP) * SERVING_STEP,
+        MIN_SERVINGS, MAX_SERVINGS,
+    ).astype(np.float32)
+    scaled = totals * servings[..., None]
+    cost = (((scaled[..., :FAT + 1] - goals) / goals) ** 2 * goal_weights).sum(axis=-1)
+    over = np.maximum(scaled[..., [SAT_FAT, SUGAR, SODIUM]] / limits - 1.0, 0.0)
+    cost += LIMIT_WEIGHT * (over ** 2).sum(axis=-1)
+    cost += np.maximum(1.0 - scaled[..., FIBER] / max(t.fiber_min_g, 1), 0.0) ** 2
+    return cost, servings
+
+
+def _candidates(db: FoodDatabase, t: DietTargets, allowed: np.ndarray) -> List[np.ndarray]:
+    """Per slot, the MAX_CANDIDATES allowed dishes closest to the slot's share of the targets."""
+    result = []
+    for s in range(len(SLOTS)):
+        rows = np.flatnonzero(db.slots[:, s] & allowed)
+        if len(rows) > MAX_CANDIDATES:
+            # Judge a dish as if the whole day looked like it (scale-free)
+            cost, _ = _day_cost(db.nutrients[rows] / SLOT_SHARE[s], t)
+            rows = rows[np.argsort(cost, kind="stable")[:MAX_CANDIDATES]]
+        result.append(rows)
+    return result
+
+
+def plan_week(t: DietTargets, days: int = 7, db: Optional[FoodDatabase] = None) -> List[Dict[str, Any]]:
+    """One breakfast, lunch, dinner and snack per day, meeting the targets with the most variety."""
+    db = db or food_db()
+    allowed = ~db.allergen_mask[:, [db.allergens.index(a) for a in t.exclude if a in db.allergens]].any(axis=1)
+    cands = _candidates(db, t, allowed)
+    if any(len(c) == 0 for c in cands):
+        return []
+
+    # Day totals for every combination: shape (nb, nl, nd, ns, nutrient)
+    n = db.nutrients
+    b, l, d, s = (n[c] for c in cands)
+    totals = (b[:, None, None, None] + l[None, :, None, None] + d[None, None, :, None] + s[None, None, None, :])
+    base, servings = _day_cost(totals, t)
+    # The same dish for lunch and dinner is not a plan
+    base[:, cands[1][:, None] == cands[2][None, :], :] = np.inf
+
+    uses = np.zeros(len(db.names), dtype=np.float32)
+    yesterday = np.zeros(len(db.names), dtype=np.float32)
+    shape = base.shape
+    plan = []
+    for day in range(days):
+        pen = [VARIETY_PENALTY * uses[c] + REPEAT_PENALTY * yesterday[c] for c in cands]
+        cost = base + pen[0][:, None, None, None] + pen[1][None, :, None, None] \
+            + pen[2][None, None, :, None] + pen[3][None, None, None, :]
+        pick = np.unravel_index(int(np.argmin(cost)), shape)
+        rows = [int(cands[k][i]) for k, i in enumerate(pick)]
+        scale = float(servings[pick])
+
+        yesterday[:] = 0
+        for r in rows:
+            uses[r] += 1
+            yesterday[r] = 1
+        day_totals = n[rows].sum(axis=0) * scale
+        plan.append({
+            "day": day + 1,
+            "servings": scale,
+            "meals": {slot: db.names[r] for slot, r in zip(SLOTS, rows)},
+            "totals": {name: round(float(v), 1) for name, v in zip(NUTRIENTS, day_totals)},
+        })
+    return plan
@@ -0,0 +1,179 @@
+"""
+Medication adherence from a daily rollup.
+
+Each log_medication call increments the taken or missed count of one
+(medication, UTC day) row in medication_adherence_days. A day is adherent when
+something was taken and nothing missed. Streaks are carried forward when a
+day's row is created (prior_streak / prior_best_streak from the latest earlier
+row), so current and longest streaks never require walking back through old
+days.
+
+An adherence summary reads, in one query joined to medications, at most
+ADHERENCE_WINDOWS[-1] rollup rows per medication plus its latest row, however
+long the log history is. On first start with an empty rollup table it is
+backfilled from the existing medication_logs.
+"""
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import Medication, MedicationAdherenceDay, MedicationLog, utc_now
+
+logger = logging.getLogger(__name__)
+
+ADHERENCE_WINDOWS = (7, 30, 90)  # days, ending today
+
+
+def _adherent(taken: int, missed: int) -> bool:
+    return taken > 0 and missed == 0
+
+
+def _streak(row: Any) -> int:
+    """Adherent-day streak ending on the row's day."""
+    return row.prior_streak + 1 if _adherent(row.taken_count, row.missed_count) else 0
+
+
+def _best_streak(row: Any) -> int:
+    """Longest streak up to and including the row's day."""
+    return max(row.prior_best_streak, _streak(row))
+
+
+def _carried(prev: Any, day: date) -> Dict[str, int]:
+    """prior_* values for a new row on `day` whose latest earlier row is `prev`."""
+    if prev is None:
+        return {"prior_streak": 0, "prior_best_streak": 0}
+    return {
+        "prior_streak": _streak(prev) if prev.day == day - timedelta(days=1) else 0,
+        "prior_best_streak": _best_streak(prev),
+    }
+
+
+async def record_dose(db: AsyncSession, medication_id: str, user_id: str, taken: bool, day: date) -> None:
+    """Count one taken / missed log in the medication's row for `day`."""
+    column = MedicationAdherenceDay.taken_count if taken else MedicationAdherenceDay.missed_count
+    increment = (
+        update(MedicationAdherenceDay)
+        .where(MedicationAdherenceDay.medication_id == medication_id, MedicationAdherenceDay.day == day)
+        .values({column: column + 1})
+        .execution_options(synchronize_session=False)
+    )
+    if (await db.execute(increment)).rowcount:
+        return
+
+    prev = (await db.execute(
+        select(MedicationAdherenceDay)
+        .where(MedicationAdherenceDay.medication_id == medication_id, MedicationAdherenceDay.day < day)
+        .order_by(MedicationAdherenceDay.day.desc()).limit(1)
+    )).scalar_one_or_none()
+    try:
+        async with db.begin_nested():
+            db.add(MedicationAdherenceDay(
+                medication_id=medication_id,
+                day=day,
+                user_id=user_id,
+                taken_count=int(taken),
+                missed_count=int(not taken),
+                **_carried(prev, day),
+            ))
+    except IntegrityError:
+        await db.execute(increment)  # the row was created concurrently
+
+
+def _window_stats(taken: int, missed: int) -> Dict[str, Any]:
+    total = taken + missed
+    return {
+        "taken": taken,
+        "missed": missed,
+        "adherence_pct": round(100.0 * taken / total, 1) if total else None,
+    }
+
+
+async def adherence_summary(db: AsyncSession, user_id: str, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Per-medication taken / missed counts and adherence per window, plus streaks."""
+    today = today or utc_now().date()
+    start = today - timedelta(days=ADHERENCE_WINDOWS[-1] - 1)
+    latest_day = (
+        select(func.max(MedicationAdherenceDay.day))
+        .where(MedicationAdherenceDay.medication_id == Medication.id)
+        .correlate(Medication)
+        .scalar_subquery()
+    )
+    rows = (await db.execute(
+        select(
+            Medication.id, Medication.name, Medication.dosage, Medication.frequency, Medication.is_active,
+            MedicationAdherenceDay.day, MedicationAdherenceDay.taken_count, MedicationAdherenceDay.missed_count,
+            MedicationAdherenceDay.prior_streak, MedicationAdherenceDay.prior_best_streak,
+        )
+        .outerjoin(MedicationAdherenceDay, and_(
+            MedicationAdherenceDay.medication_id == Medication.id,
+            or_(MedicationAdherenceDay.day >= start, MedicationAdherenceDay.day == latest_day),
+        ))
+        .where(Medication.user_id == user_id)
+        .order_by(Medication.name, Medication.id, MedicationAdherenceDay.day)
+    )).all()
+
+    by_med: Dict[str, List[Any]] = {}
+    for row in rows:
+        by_med.setdefault(row.id, []).append(row)
+
+    summary = []
+    for med_rows in by_med.values():
+        med = med_rows[0]
+        days = [r for r in med_rows if r.day is not None]
+        windows = {}
+        for window in ADHERENCE_WINDOWS:
+            since = today - timedelta(days=window - 1)
+            in_window = [r for r in days if r.day >= since]
+            windows[f"{window}d"] = _window_stats(
+                sum(r.taken_count for r in in_window), sum(r.missed_count for r in in_window)
+            )
+        last = days[-1] if days else None
+        # A streak stays current until a whole day passes without an adherent log
+        current = _streak(last) if last is not None and last.day >= today - timedelta(days=1) else 0
+        summary.append({
+            "medication_id": med.id,
+            "name": med.name,
+            "dosage": med.dosage,
+            "frequency": med.frequency,
+            "is_active": med.is_active,
+            "windows": windows,
+            "current_streak": current,
+            "longest_streak": _best_streak(last) if last is not None else 0,
+            "last_logged": last.day.isoformat() if last is not None else None,
+        })
+    return summary
+
+
+async def backfill_adherence(session_factory) -> None:
+    """Build the rollup from existing medication_logs (first start only)."""
+    async with session_factory() as session:
+        if (await session.execute(select(MedicationAdherenceDay.day).limit(1))).first() is not None:
+            return
+        missed = func.sum(case((MedicationLog.taken.is_(False), 1), else_=0))
+        day = func.date(MedicationLog.logged_at)
+        groups = (await session.execute(
+            select(MedicationLog.medication_id, MedicationLog.user_id, day, func.count() - missed, missed)
+            .where(MedicationLog.logged_at.is_not(None))
+            .group_by(MedicationLog.medication_id, MedicationLog.user_id, day)
+            .order_by(MedicationLog.medication_id, day)
+        )).all()
+        prev: Optional[MedicationAdherenceDay] = None
+        for medication_id, user_id, log_day, taken, missed_count in groups:
+            row = MedicationAdherenceDay(
+                medication_id=medication_id,
+                day=date.fromisoformat(str(log_day)[:10]),
+                user_id=user_id,
+                taken_count=int(taken),
+                missed_count=int(missed_count),
+            )
+            carried = _carried(prev if prev is not None and prev.medication_id == medication_id else None, row.day)
+            row.prior_streak, row.prior_best_streak = carried["prior_streak"], carried["prior_best_streak"]
+            session.add(row)
+            prev = row
+        await session.commit()
+    if groups:
+        logger.info(f"Backfilled medication adherence: {len(groups)} medication-days")
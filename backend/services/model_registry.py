@@ -0,0 +1,389 @@
+"""
+Risk model registry.
+
+Risk models are small logistic models (features, coefficients, intercept,
+standard scaler, category thresholds) serialized as JSON, one file per disease
+in RISK_MODEL_DIR named "<disease_type>.json":
+
+    {"disease_type": "diabetes", "version": "2026.03", "features": [...],
+     "coefficients": [...], "intercept": -3.5,
+     "scaler": {"mean": [...], "scale": [...]}, "thresholds": [0.3, 0.6]}
+
+Every "<disease_type>.json" in the directory is a registered disease, so a new
+model is served by dropping its file in; the stem must be lowercase letters,
+digits and underscores. Models are loaded, validated and warmed in
+main.lifespan before the API serves, then kept in memory. The directory is
+polled every RISK_MODEL_RELOAD_SECONDS; a changed, added or removed file is
+picked up in a worker thread and the whole {disease: model} mapping is swapped
+in one assignment, so requests never wait on a reload and each one scores
+against a consistent set of models. A file that fails to validate is logged and
+the previous version of that model stays live (a new disease is not registered
+until its file validates). Diabetes and heart disease fall back to the built-in
+coefficients below (version "builtin") when they have no file.
+Publish new files with an atomic rename (write "x.json.tmp", then mv).
+
+Write the live models out as a starting point for trained ones with
+    python -m services.model_registry export [--dir DIR]
+from backend/.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RISK_CATEGORIES = ("low", "moderate", "high")
+RISK_THRESHOLDS = (0.3, 0.6)  # low < 0.3 <= moderate < 0.6 <= high
+BUILTIN_VERSION = "builtin"
+WARMUP_ROWS = 256
+MODEL_FILE_RE = re.compile(r"^([a-z0-9_]+)\.json$")  # <disease_type>.json
+
+# Built-in feature weights (mock — replace with trained model coefficients via RISK_MODEL_DIR)
+BUILTIN_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "diabetes": {
+        "age": 0.03,
+        "bmi": 0.08,
+        "glucose": 0.04,
+        "blood_pressure_systolic": 0.015,
+        "blood_pressure_diastolic": 0.01,
+        "insulin": 0.005,
+        "skin_thickness": 0.002,
+        "pregnancies": 0.02,
+        "smoking": 0.15,
+        "alcohol": 0.1,
+    },
+    "heart_disease": {
+        "age": 0.04,
+        "bmi": 0.05,
+        "cholesterol": 0.03,
+        "blood_pressure_systolic": 0.025,
+        "blood_pressure_diastolic": 0.02,
+        "smoking": 0.25,
+        "alcohol": 0.08,
+        "glucose": 0.02,
+    },
+}
+BUILTIN_INTERCEPT = -3.5  # bias towards low risk for safety
+
+
+def _round_half_even(x: float, digits: int) -> float:
+    """
+    Round like np.round (scale, round half to even, unscale) rather than the
+    correctly rounded built-in round(x, digits), so score_one and score_matrix
+    give bit-identical results.
+    """
+    scale = 10.0 ** digits
+    return round(x * scale) / scale
+
+
+def _probability(z: float) -> float:
+    """Rounded logistic of z. math.exp, like RiskModel._scores: np.exp can differ in the last bit."""
+    return _round_half_even(1.0 / (1.0 + math.exp(min(-z, 700.0))), 4)
+
+
+@dataclass(frozen=True, eq=False)
+class RiskModel:
+    """One immutable, memory-resident model version."""
+
+    disease_type: str
+    version: str
+    features: Tuple[str, ...]
+    coefficients: np.ndarray
+    intercept: float
+    mean: np.ndarray
+    scale: np.ndarray
+    thresholds: Tuple[float, ...] = RISK_THRESHOLDS
+    _terms: List[Tuple[str, float, float, float]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        terms = list(zip(self.features, self.coefficients.tolist(), self.mean.tolist(), self.scale.tolist()))
+        object.__setattr__(self, "_terms", terms)
+
+    # ── scoring ──────────────────────────────────────
+
+    def categorize(self, score: float) -> str:
+        return RISK_CATEGORIES[bisect_right(self.thresholds, score)]
+
+    def score_one(self, data: Dict[str, Any]) -> Tuple[float, Dict[str, float]]:
+        """Score one input dict: (rounded score, normalized importances, largest first)."""
+        z = self.intercept
+        importance: Dict[str, float] = {}
+        for feature, coef, mean, scale in self._terms:
+            value = data.get(feature)
+            if value is None:
+                continue
+            if isinstance(value, bool):
+                value = 1.0 if value else 0.0
+            contribution = (float(value) - mean) / scale * coef
+            z += contribution
+            importance[feature] = _round_half_even(abs(contribution), 4)
+
+        # Normalize importance
+        total = sum(importance.values()) or 1
+        importance = {k: _round_half_even(v / total, 3) for k, v in importance.items()}
+        importance = dict(sorted(importance.items(), key=lambda x: -x[1]))
+        return _probability(z), importance
+
+    def _contributions(self, X: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        return np.where(mask, (X - self.mean) / self.scale * self.coefficients, 0.0)
+
+    @staticmethod
+    def _row_sums(values: np.ndarray, start: float = 0.0) -> np.ndarray:
+        """Row sums added column by column, in the same order as score_one (not np.sum's pairwise order)."""
+        total = np.full(values.shape[0], start)
+        for j in range(values.shape[1]):
+            total += values[:, j]
+        return total
+
+    def _scores(self, contributions: np.ndarray) -> np.ndarray:
+        z = self._row_sums(contributions, self.intercept)
+        # math.exp per row: np.exp may differ from it in the last bit (see _probability)
+        e = np.fromiter(map(math.exp, np.minimum(-z, 700.0).tolist()), dtype=float, count=len(z))
+        return np.round(1.0 / (1.0 + e), 4)
+
+    def scores(self, X: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """Rounded scores only, for every row of X (columns in self.features)."""
+        return self._scores(self._contributions(X, mask))
+
+    def score_matrix(self, X: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized score_one for every row of X (columns in self.features) at once.
+        Returns (scores, category indices into RISK_CATEGORIES, normalized importances,
+        per-row feature order by contribution, largest first, missing features last).
+        """
+        contributions = self._contributions(X, mask)
+        scores = self._scores(contributions)
+        categories = np.digitize(scores, self.thresholds)
+        magnitude = np.round(np.abs(contributions), 4)
+        total = self._row_sums(magnitude)[:, None]
+        total[total == 0] = 1
+        importance = np.round(magnitude / total, 3)
+        order = np.argsort(np.where(mask, -importance, np.inf), axis=1, kind="stable")
+        return scores, categories, importance, order
+
+    # ── (de)serialization ────────────────────────────
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RiskModel":
+        """Build and validate a model from its JSON form; raises ValueError if malformed."""
+        try:
+            features = tuple(data["features"])
+            coefficients = np.asarray(data["coefficients"], dtype=float)
+            scaler = data.get("scaler") or {}
+            mean = np.asarray(scaler.get("mean", [0.0] * len(features)), dtype=float)
+            scale = np.asarray(scaler.get("scale", [1.0] * len(features)), dtype=float)
+            thresholds = tuple(float(t) for t in data.get("thresholds", RISK_THRESHOLDS))
+            model = cls(
+                disease_type=str(data["disease_type"]),
+                version=str(data["version"]),
+                features=features,
+                coefficients=coefficients,
+                intercept=float(data["intercept"]),
+                mean=mean,
+                scale=scale,
+                thresholds=thresholds,
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"malformed model: {e}") from e
+
+        if not features or len(set(features)) != len(features):
+            raise ValueError("features must be non-empty and unique")
+        for name, arr in (("coefficients", coefficients), ("scaler.mean", mean), ("scaler.scale", scale)):
+            if arr.shape != (len(features),) or not np.all(np.isfinite(arr)):
+                raise ValueError(f"{name} must be {len(features)} finite numbers")
+        if np.any(scale == 0):
+            raise ValueError("scaler.scale must be non-zero")
+        if len(thresholds) != len(RISK_CATEGORIES) - 1 or list(thresholds) != sorted(thresholds) \
+                or not all(0 < t < 1 for t in thresholds):
+            raise ValueError(f"thresholds must be {len(RISK_CATEGORIES) - 1} ascending values in (0, 1)")
+        if not math.isfinite(model.intercept):
+            raise ValueError("intercept must be finite")
+        return model
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "disease_type": self.disease_type,
+            "version": self.version,
+            "features": list(self.features),
+            "coefficients": self.coefficients.tolist(),
+            "intercept": self.intercept,
+            "scaler": {"mean": self.mean.tolist(), "scale": self.scale.tolist()},
+            "thresholds": list(self.thresholds),
+        }
+
+
+def builtin_model(disease_type: str) -> RiskModel:
+    weights = BUILTIN_WEIGHTS[disease_type]
+    n = len(weights)
+    return RiskModel(
+        disease_type=disease_type,
+        version=BUILTIN_VERSION,
+        features=tuple(weights),
+        coefficients=np.array(list(weights.values())),
+        intercept=BUILTIN_INTERCEPT,
+        mean=np.zeros(n),
+        scale=np.ones(n),
+    )
+
+
+def warm_model(model: RiskModel) -> None:
+    """
+    Exercise both scoring paths once so the first real request doesn't pay for
+    first-call setup, and reject models that produce non-finite scores.
+    """
+    rng = np.random.default_rng(0)
+    X = model.mean + model.scale * rng.standard_normal((WARMUP_ROWS, len(model.features)))
+    mask = rng.random(X.shape) > 0.2
+    scores, _, _, _ = model.score_matrix(X, mask)
+    score, _ = model.score_one(dict(zip(model.features, X[0].tolist())))
+    if not np.all(np.isfinite(scores)) or not math.isfinite(score):
+        raise ValueError("model produces non-finite scores")
+
+
+def load_model_file(path: str, disease_type: str) -> RiskModel:
+    with open(path, encoding="utf-8") as f:
+        model = RiskModel.from_dict(json.load(f))
+    if model.disease_type != disease_type:
+        raise ValueError(f"file declares disease_type {model.disease_type!r}")
+    warm_model(model)
+    return model
+
+
+# ── Registry ─────────────────────────────────────────
+
+class ModelRegistry:
+    """Memory-resident {disease_type: RiskModel}, hot-reloaded from model_dir."""
+
+    def __init__(self, model_dir: str, reload_seconds: float = 30.0):
+        self.model_dir = model_dir
+        self.reload_seconds = reload_seconds
+        self._models: Dict[str, RiskModel] = {}  # replaced wholesale on reload, never mutated
+        self._signature: Optional[Tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, disease_type: str) -> RiskModel:
+        models = self._models
+        if not models:
+            # Used outside the app lifespan (CLI, benchmarks): load on first use
+            self.reload()
+            models = self._models
+        return models[disease_type]
+
+    def snapshot(self) -> Dict[str, RiskModel]:
+        """The current {disease_type: model} set; later reloads don't change it."""
+        if not self._models:
+            self.reload()
+        return self._models
+
+    def versions(self) -> Dict[str, str]:
+        return {d: m.version for d, m in self._models.items()}
+
+    def disease_types(self) -> Tuple[str, ...]:
+        """The registered disease types (built-ins plus every valid model file)."""
+        return tuple(self.snapshot())
+
+    def _path(self, disease_type: str) -> str:
+        return os.path.join(self.model_dir, f"{disease_type}.json")
+
+    def _model_files(self) -> Dict[str, Tuple[int, int]]:
+        """{disease_type: (mtime_ns, size)} for every model file in model_dir."""
+        files: Dict[str, Tuple[int, int]] = {}
+        try:
+            entries = list(os.scandir(self.model_dir))
+        except FileNotFoundError:
+            return files
+        for entry in entries:
+            match = MODEL_FILE_RE.match(entry.name)
+            if match is None:
+                continue
+            try:
+                if entry.is_file():
+                    st = entry.stat()
+                    files[match.group(1)] = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                continue  # replaced or removed while scanning; picked up next poll
+        return files
+
+    def reload(self, force: bool = False) -> bool:
+        """(Re)load changed model files (blocking). Returns True if the live set was swapped."""
+        files = self._model_files()
+        signature = tuple(sorted(files.items()))
+        if signature == self._signature and not force:
+            return False
+        previous = self._models
+        models: Dict[str, RiskModel] = {}
+        for disease_type in dict.fromkeys([*BUILTIN_WEIGHTS, *sorted(files)]):
+            path = self._path(disease_type)
+            try:
+                if disease_type in files:
+                    models[disease_type] = load_model_file(path, disease_type)
+                    continue
+            except (OSError, ValueError) as e:
+                logger.error(f"Rejected risk model {path}: {e}")
+                if disease_type in previous:
+                    models[disease_type] = previous[disease_type]
+                    continue
+            if disease_type not in BUILTIN_WEIGHTS:
+                continue  # file removed or never valid: not registered
+            model = previous.get(disease_type)
+            if model is None or model.version != BUILTIN_VERSION:
+                model = builtin_model(disease_type)
+                warm_model(model)
+            models[disease_type] = model
+
+        self._models = models
+        self._signature = signature
+        changed = {d: m.version for d, m in models.items() if previous.get(d) is not m}
+        removed = sorted(set(previous) - set(models))
+        logger.info(f"Risk models loaded: {changed}" + (f", removed: {removed}" if removed else ""))
+        return True
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.reload, True)
+        if self.reload_seconds > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.error(f"Risk model reload failed: {e}")
+
+
+model_registry = ModelRegistry(settings.RISK_MODEL_DIR, settings.RISK_MODEL_RELOAD_SECONDS)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Risk model registry tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write the live models as <disease_type>.json files")
+    export.add_argument("--dir", default=settings.RISK_MODEL_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    for disease, model in model_registry.snapshot().items():
+        target = os.path.join(args.dir, f"{disease}.json")
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(model.to_dict(), f, indent=2)
+        os.replace(target + ".tmp", target)
+        print(f"Wrote {target}")
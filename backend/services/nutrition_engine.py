@@ -1,19 +1,66 @@
 """
 Nutrition & Lifestyle recommendation engine.
 Generates personalised plans based on user risk profile.
+
+A plan is a pure function of the {disease_type: risk_category} combination and
+the daily diet targets derived from the user's profile (services.meal_planner,
+rounded so similar profiles coincide), so each combination is built once and
+memoized as a frozen structure (read-only mappings and tuples shared by every
+caller) together with its canonical JSON and that JSON's SHA-256, which is the
+key of the stored plan body (NutritionPlanContent).
 """
-from typing import Dict, Any, List, Optional
+import hashlib
+import json
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, NamedTuple, Tuple
+
+from services.meal_planner import DietTargets, diet_targets, plan_week
+
+PLAN_CACHE_SIZE = 256  # distinct (risk combination, diet targets) pairs kept
+
+
+class CachedPlan(NamedTuple):
+    plan: Mapping[str, Any]  # frozen: MappingProxyType / tuple all the way down
+    body_json: str  # canonical JSON (sorted keys, compact)
+    sha256: str
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def plan_key(risk_predictions: List[Dict[str, Any]]) -> Tuple[Tuple[str, str], ...]:
+    """Canonical, hashable form of the risk combination (later entries win, as before)."""
+    risks = {str(r["disease_type"]): str(r["risk_category"]) for r in risk_predictions}
+    return tuple(sorted(risks.items()))
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def cached_plan(key: Tuple[Tuple[str, str], ...], targets: DietTargets) -> CachedPlan:
+    plan = _build_plan(dict(key), targets)
+    body_json = json.dumps(plan, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return CachedPlan(_freeze(plan), body_json, hashlib.sha256(body_json.encode("utf-8")).hexdigest())
 
 
 def generate_nutrition_plan(
     risk_predictions: List[Dict[str, Any]],
-    profile: Optional[Dict[str, Any]] = None,
-) -> Dict[str, Any]:
+    profile: Any = None,
+) -> Mapping[str, Any]:
     """
-    Generate diet + lifestyle recommendations driven by risk prediction results.
+    Generate diet + lifestyle recommendations driven by risk prediction results
+    and the user's UserProfile (optional). The returned plan is shared and read-only.
     """
-    risks = {r["disease_type"]: r["risk_category"] for r in risk_predictions}
+    key = plan_key(risk_predictions)
+    return cached_plan(key, diet_targets(dict(key), profile)).plan
 
+
+def _build_plan(risks: Dict[str, str], targets: DietTargets) -> Dict[str, Any]:
+    """Build the (mutable) plan for one risk combination; see cached_plan."""
     diet: Dict[str, Any] = {
         "general_guidelines": [
             "Eat a balanced diet rich in fruits, vegetables, whole grains, and lean proteins.",
@@ -21,7 +68,7 @@ def generate_nutrition_plan(
             "Stay hydrated — aim for 8+ glasses of water daily.",
             "Eat regular, moderate‑sized meals to maintain stable blood sugar.",
         ],
-        "meal_plan": _build_meal_plan(risks, profile),
+        "meal_plan": _build_meal_plan(risks, targets),
         "foods_to_increase": [],
         "foods_to_limit": [],
     }
@@ -88,29 +135,30 @@ def generate_nutrition_plan(
     }
 
 
-def _build_meal_plan(risks: Dict[str, str], profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-    """Build a sample daily meal plan."""
+def _build_meal_plan(risks: Dict[str, str], targets: DietTargets) -> Dict[str, Any]:
+    """
+    Build a 7-day meal plan for the diet targets. Options A / B per meal are
+    the first two days' picks.
+    """
     is_high_risk = any(v == "high" for v in risks.values())
+    week = plan_week(targets)
+    notes = {
+        "breakfast": "Avoid sugary cereals" if is_high_risk else None,
+        "lunch": "Watch portion sizes of carbohydrates" if is_high_risk else None,
+        "dinner": "Keep dinner light — eat at least 2-3 hours before bed" if is_high_risk else None,
+    }
 
-    return {
-        "breakfast": {
-            "option_a": "Oatmeal with berries, chia seeds, and a handful of almonds",
-            "option_b": "Greek yogurt with fresh fruit and granola",
-            "notes": "Avoid sugary cereals" if is_high_risk else None,
-        },
-        "lunch": {
-            "option_a": "Grilled chicken salad with mixed greens, olive oil dressing",
-            "option_b": "Lentil soup with whole-grain bread",
-            "notes": "Watch portion sizes of carbohydrates" if is_high_risk else None,
-        },
-        "dinner": {
-            "option_a": "Baked salmon with steamed broccoli and quinoa",
-            "option_b": "Stir‑fried tofu with vegetables and brown rice",
-            "notes": "Keep dinner light — eat at least 2-3 hours before bed" if is_high_risk else None,
-        },
-        "snacks": [
-            "Apple slices with peanut butter",
-            "Mixed nuts (unsalted)",
-            "Carrot sticks with hummus",
-        ],
+    meal_plan: Dict[str, Any] = {
+        "targets": {k: v for k, v in targets._asdict().items() if k != "exclude"},
+        "excluded_allergens": list(targets.exclude),
+        "days": week,
     }
+    if week:
+        for meal, note in notes.items():
+            meal_plan[meal] = {
+                "option_a": week[0]["meals"][meal],
+                "option_b": week[1 % len(week)]["meals"][meal],
+                "notes": note,
+            }
+        meal_plan["snacks"] = list(dict.fromkeys(day["meals"]["snack"] for day in week[:3]))
+    return meal_plan
@@ -0,0 +1,97 @@
+"""
+Report thumbnails and previews.
+
+Each stored file gets small WebP renditions (PREVIEW_SIZES, longest side in px)
+stored next to it under "<stem>.preview-<size>.webp", once per content hash,
+rendered by the report job worker in the shared image process pool. PDFs are
+previewed from a raster of their first page: rendered with PyMuPDF when it is
+installed, otherwise the largest image embedded in page 1 (which covers scanned
+reports). PyMuPDF is an optional extra (`pip install pymupdf`, AGPL-licensed)
+and not in requirements.txt, so without it a PDF with only a text layer on
+page 1 gets no preview: its preview_sizes is [] and preview_status() reports
+"unavailable". Previews are served by the authenticated report file route, so
+list pages fetch a few KB per report instead of the original upload.
+"""
+import io
+import logging
+import os
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_SIZES = (256, 1024)
+LIST_PREVIEW_SIZE = 256
+DETAIL_PREVIEW_SIZE = 1024
+PREVIEW_WEBP_QUALITY = 80
+
+
+def preview_key(key: str, size: int) -> str:
+    """Storage key of the `size` preview of the file stored under `key`."""
+    stem, _ext = os.path.splitext(key)
+    return f"{stem}.preview-{size}.webp"
+
+
+def _first_page_image(path: str, content_type: str):
+    from PIL import Image, ImageOps
+
+    if content_type != "application/pdf":
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img)
+            img.load()
+            return img
+
+    try:
+        import fitz  # PyMuPDF (optional)
+
+        with fitz.open(path) as doc:
+            page = doc[0]
+            zoom = max(PREVIEW_SIZES) / max(page.rect.width, page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    except ImportError:
+        pass
+
+    from pypdf import PdfReader
+
+    page = PdfReader(path).pages[0]
+    images = list(page.images)
+    if not images:
+        return None
+    largest = max(images, key=lambda im: len(im.data))
+    return Image.open(io.BytesIO(largest.data))
+
+
+def render_previews(path: str, content_type: str, outputs: Dict[int, str]) -> List[int]:
+    """
+    Process-pool entry point: write one WebP preview per {size: output path}.
+    Returns the sizes written (empty if the file has nothing to rasterize).
+    """
+    try:
+        img = _first_page_image(path, content_type)
+    except Exception as e:
+        logger.warning(f"Could not rasterize {path} for previews: {e}")
+        return []
+    if img is None:
+        return []
+
+    img = img.convert("RGB")
+    written = []
+    for size in sorted(outputs, reverse=True):
+        img.thumbnail((size, size))  # shrink progressively from the largest size
+        img.save(outputs[size], format="WEBP", quality=PREVIEW_WEBP_QUALITY, method=4)
+        written.append(size)
+    return sorted(written)
+
+
+def preview_status(preview_sizes: Optional[list]) -> str:
+    """"pending" until the worker has tried, then "ready" or "unavailable" (nothing to rasterize)."""
+    if preview_sizes is None:
+        return "pending"
+    return "ready" if preview_sizes else "unavailable"
+
+
+def preview_url(report_id: str, preview_sizes: Optional[list], size: int) -> Optional[str]:
+    """URL of the report's `size` preview, or None if it hasn't been generated."""
+    if not preview_sizes or size not in preview_sizes:
+        return None
+    return f"/api/v1/reports/{report_id}/file?size={size}"
@@ -0,0 +1,488 @@
+"""
+Local reference-range engine for lab result flagging.
+
+Extracted values (from the PDF parser, Gemini or the simulated fallback) are
+re-flagged deterministically: test names are mapped to a canonical name, values
+are converted to the canonical unit (e.g. glucose mmol/L → mg/dL), and the
+status comes from an age/sex-aware range table instead of whatever the LLM put
+in "status". Ranges are resolved through a precomputed (test × sex × age) grid,
+so flagging a report — or every report in the database — is one NumPy pass.
+
+Tests not in the table fall back to the lab's printed reference range. Bump
+RANGES_VERSION when the table changes and run
+    python -m services.reference_ranges
+from backend/ to re-flag historical reports (no LLM calls). When re-flagging
+changes a report's flags its summary is rebuilt from the values, so it never
+contradicts them; a replaced Gemini summary is marked summary_needs_reanalysis.
+"""
+import asyncio
+import logging
+import re
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import MedicalReport, UserProfile
+from services.health_index import invalidate_user_index
+from services.report_analyzer import generate_ai_summary_from_values, lab_status_from_ref
+
+logger = logging.getLogger(__name__)
+
+RANGES_VERSION = "2026.1"
+
+# Status codes used in the vectorized pass
+UNKNOWN, NORMAL, LOW, BORDERLINE, HIGH = -1, 0, 1, 2, 3
+STATUS_NAMES = {NORMAL: "normal", LOW: "low", BORDERLINE: "borderline", HIGH: "high"}
+
+SEX_ANY, SEX_MALE, SEX_FEMALE = 0, 1, 2
+MAX_AGE = 120
+DEFAULT_AGE = 40  # used when the profile has no date of birth
+
+
+class RefRange(NamedTuple):
+    test: str
+    low: float
+    high: float
+    borderline_to: Optional[float] = None  # (high, borderline_to] → "borderline", above → "high"
+    sex: int = SEX_ANY
+    age_min: int = 0
+    age_max: int = MAX_AGE
+
+
+INF = float("inf")
+
+# ── Reference table (canonical units below) ──────────
+CANONICAL_UNITS: Dict[str, str] = {
+    "hemoglobin": "g/dL", "hematocrit": "%", "wbc": "10^3/uL", "platelets": "10^3/uL", "mcv": "fL",
+    "glucose": "mg/dL", "hba1c": "%", "total cholesterol": "mg/dL", "ldl cholesterol": "mg/dL",
+    "hdl cholesterol": "mg/dL", "triglycerides": "mg/dL", "creatinine": "mg/dL", "bun": "mg/dL",
+    "egfr": "mL/min/1.73m2", "sodium": "mmol/L", "potassium": "mmol/L", "chloride": "mmol/L",
+    "calcium": "mg/dL", "alt": "U/L", "ast": "U/L", "alp": "U/L", "tsh": "mIU/L",
+    "vitamin d": "ng/mL", "vitamin b12": "pg/mL", "ferritin": "ng/mL", "uric acid": "mg/dL",
+}
+
+RANGES: List[RefRange] = [
+    RefRange("hemoglobin", 12.0, 17.5),
+    RefRange("hemoglobin", 13.5, 17.5, sex=SEX_MALE, age_min=18),
+    RefRange("hemoglobin", 12.0, 15.5, sex=SEX_FEMALE, age_min=18),
+    RefRange("hemoglobin", 11.0, 16.0, age_max=17),
+    RefRange("hematocrit", 36, 50),
+    RefRange("hematocrit", 41, 50, sex=SEX_MALE, age_min=18),
+    RefRange("hematocrit", 36, 44, sex=SEX_FEMALE, age_min=18),
+    RefRange("wbc", 4.0, 11.0),
+    RefRange("platelets", 150, 400),
+    RefRange("mcv", 80, 100),
+    RefRange("glucose", 70, 99, borderline_to=125),
+    RefRange("hba1c", 4.0, 5.6, borderline_to=6.4),
+    RefRange("total cholesterol", 0, 199, borderline_to=239),
+    RefRange("ldl cholesterol", 0, 99, borderline_to=159),
+    RefRange("hdl cholesterol", 40, INF),
+    RefRange("hdl cholesterol", 40, INF, sex=SEX_MALE),
+    RefRange("hdl cholesterol", 50, INF, sex=SEX_FEMALE),
+    RefRange("triglycerides", 0, 149, borderline_to=199),
+    RefRange("creatinine", 0.6, 1.3),
+    RefRange("creatinine", 0.74, 1.35, sex=SEX_MALE, age_min=18),
+    RefRange("creatinine", 0.59, 1.04, sex=SEX_FEMALE, age_min=18),
+    RefRange("bun", 7, 20),
+    RefRange("egfr", 60, INF),
+    RefRange("sodium", 135, 145),
+    RefRange("potassium", 3.5, 5.1),
+    RefRange("chloride", 98, 107),
+    RefRange("calcium", 8.6, 10.3),
+    RefRange("alt", 7, 56),
+    RefRange("ast", 10, 40),
+    RefRange("alp", 44, 147),
+    RefRange("alp", 100, 390, age_max=17),
+    RefRange("tsh", 0.4, 4.0),
+    RefRange("tsh", 0.4, 6.0, age_min=70),
+    RefRange("vitamin d", 30, 100),
+    RefRange("vitamin b12", 200, 900),
+    RefRange("ferritin", 15, 300),
+    RefRange("ferritin", 24, 336, sex=SEX_MALE, age_min=18),
+    RefRange("ferritin", 11, 307, sex=SEX_FEMALE, age_min=18),
+    RefRange("uric acid", 2.4, 7.0),
+    RefRange("uric acid", 3.4, 7.0, sex=SEX_MALE, age_min=18),
+    RefRange("uric acid", 2.4, 6.0, sex=SEX_FEMALE, age_min=18),
+]
+
+ALIASES: Dict[str, str] = {
+    "hb": "hemoglobin", "hgb": "hemoglobin", "haemoglobin": "hemoglobin",
+    "hct": "hematocrit", "haematocrit": "hematocrit", "pcv": "hematocrit",
+    "white blood cells": "wbc", "white blood cell count": "wbc", "wbc count": "wbc", "leukocytes": "wbc",
+    "total leukocyte count": "wbc", "tlc": "wbc",
+    "platelet count": "platelets", "plt": "platelets",
+    "mean corpuscular volume": "mcv",
+    "fasting glucose": "glucose", "glucose fasting": "glucose", "fasting blood glucose": "glucose",
+    "fasting blood sugar": "glucose", "fbs": "glucose", "fbg": "glucose", "fasting plasma glucose": "glucose",
+    "blood glucose": "glucose",
+    "a1c": "hba1c", "hemoglobin a1c": "hba1c", "haemoglobin a1c": "hba1c", "glycated hemoglobin": "hba1c",
+    "glycosylated hemoglobin": "hba1c", "hba1c glycated hemoglobin": "hba1c",
+    "cholesterol": "total cholesterol", "cholesterol total": "total cholesterol", "tc": "total cholesterol",
+    "ldl": "ldl cholesterol", "ldl c": "ldl cholesterol", "ldl cholesterol direct": "ldl cholesterol",
+    "ldl cholesterol calculated": "ldl cholesterol",
+    "hdl": "hdl cholesterol", "hdl c": "hdl cholesterol",
+    "tg": "triglycerides", "triglyceride": "triglycerides",
+    "serum creatinine": "creatinine", "creat": "creatinine",
+    "blood urea nitrogen": "bun", "urea nitrogen": "bun",
+    "estimated gfr": "egfr", "gfr": "egfr",
+    "na": "sodium", "serum sodium": "sodium",
+    "k": "potassium", "serum potassium": "potassium",
+    "cl": "chloride",
+    "ca": "calcium", "serum calcium": "calcium",
+    "sgpt": "alt", "alanine aminotransferase": "alt", "alt sgpt": "alt",
+    "sgot": "ast", "aspartate aminotransferase": "ast", "ast sgot": "ast",
+    "alkaline phosphatase": "alp",
+    "thyroid stimulating hormone": "tsh",
+    "25 oh vitamin d": "vitamin d", "vitamin d 25 oh": "vitamin d", "25 hydroxy vitamin d": "vitamin d",
+    "vitamin d3": "vitamin d",
+    "b12": "vitamin b12", "cobalamin": "vitamin b12",
+    "serum ferritin": "ferritin",
+    "serum uric acid": "uric acid", "urate": "uric acid",
+}
+
+# (test, normalized unit) → (scale, offset) into the canonical unit; "" means "as printed, canonical"
+_COUNT_UNITS = {"10^3/ul": 1.0, "10^9/l": 1.0, "k/ul": 1.0, "thou/ul": 1.0, "10^3/mm3": 1.0, "/ul": 1e-3}
+UNIT_CONVERSIONS: Dict[Tuple[str, str], Tuple[float, float]] = {
+    ("glucose", "mmol/l"): (18.016, 0.0),
+    ("total cholesterol", "mmol/l"): (38.67, 0.0),
+    ("ldl cholesterol", "mmol/l"): (38.67, 0.0),
+    ("hdl cholesterol", "mmol/l"): (38.67, 0.0),
+    ("triglycerides", "mmol/l"): (88.57, 0.0),
+    ("hemoglobin", "g/l"): (0.1, 0.0),
+    ("hemoglobin", "mmol/l"): (1.611, 0.0),
+    ("hba1c", "mmol/mol"): (0.0915, 2.15),
+    ("hematocrit", "l/l"): (100.0, 0.0),
+    ("creatinine", "umol/l"): (1 / 88.42, 0.0),
+    ("bun", "mmol/l"): (2.801, 0.0),
+    ("calcium", "mmol/l"): (4.008, 0.0),
+    ("vitamin d", "nmol/l"): (1 / 2.496, 0.0),
+    ("vitamin b12", "pmol/l"): (1.355, 0.0),
+    ("uric acid", "umol/l"): (1 / 59.48, 0.0),
+    ("ferritin", "ug/l"): (1.0, 0.0),
+    ("alt", "iu/l"): (1.0, 0.0),
+    ("ast", "iu/l"): (1.0, 0.0),
+    ("alp", "iu/l"): (1.0, 0.0),
+    ("tsh", "uiu/ml"): (1.0, 0.0),
+    ("sodium", "meq/l"): (1.0, 0.0),
+    ("potassium", "meq/l"): (1.0, 0.0),
+    ("chloride", "meq/l"): (1.0, 0.0),
+    **{("wbc", u): (s, 0.0) for u, s in _COUNT_UNITS.items()},
+    **{("platelets", u): (s, 0.0) for u, s in _COUNT_UNITS.items()},
+}
+
+TESTS: List[str] = sorted(CANONICAL_UNITS)
+_TEST_INDEX: Dict[str, int] = {t: i for i, t in enumerate(TESTS)}
+
+_PAREN_RE = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_NUMBER_RE = re.compile(r"[<>≤≥]?\s*(-?\d+(?:\.\d+)?)")
+
+
+def _normalize_unit(unit: str) -> str:
+    u = str(unit or "").strip().lower().replace("µ", "u").replace("μ", "u").replace(" ", "")
+    u = u.replace("mcg", "ug").replace("×", "x").replace("*", "^")
+    return u[1:] if u.startswith("x10") else u
+
+
+def _build_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Resolve every (test, sex, age) to its most specific range once, so a
+    lookup is a single fancy-index. Sex-specific beats any-sex; narrower age
+    bands beat wider ones. Unknown sex uses the any-sex ranges.
+    """
+    grid = np.full((len(TESTS), 3, MAX_AGE + 1), -1, dtype=np.int32)
+    specificity = np.full(grid.shape, -1, dtype=np.int32)
+    for r_idx, r in enumerate(RANGES):
+        t = _TEST_INDEX[r.test]
+        sexes = [r.sex] if r.sex != SEX_ANY else [SEX_ANY, SEX_MALE, SEX_FEMALE]
+        score = (2 if r.sex != SEX_ANY else 0) * 1000 + (MAX_AGE - (r.age_max - r.age_min))
+        for s in sexes:
+            ages = slice(r.age_min, r.age_max + 1)
+            better = specificity[t, s, ages] < score
+            grid[t, s, ages] = np.where(better, r_idx, grid[t, s, ages])
+            specificity[t, s, ages] = np.where(better, score, specificity[t, s, ages])
+    low = np.array([r.low for r in RANGES], dtype=np.float64)
+    high = np.array([r.high for r in RANGES], dtype=np.float64)
+    borderline_to = np.array([r.borderline_to if r.borderline_to is not None else r.high for r in RANGES])
+    return grid, low, high, borderline_to
+
+
+_RANGE_GRID, _LOW, _HIGH, _BORDERLINE_TO = _build_tables()
+
+
+@lru_cache(maxsize=4096)
+def canonical_test(name: str) -> Optional[str]:
+    """Map a printed test name ("Fasting Glucose (panel 2)", "HbA1c", "SGPT") to its canonical name."""
+    key = _NON_ALNUM_RE.sub(" ", _PAREN_RE.sub(" ", str(name).lower())).strip()
+    if key in _TEST_INDEX:
+        return key
+    return ALIASES.get(key)
+
+
+@lru_cache(maxsize=4096)
+def _conversion(test: str, unit: str) -> Optional[Tuple[float, float]]:
+    u = _normalize_unit(unit)
+    if not u or u == _normalize_unit(CANONICAL_UNITS[test]):
+        return 1.0, 0.0
+    return UNIT_CONVERSIONS.get((test, u))
+
+
+def _parse_number(value: Any) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    m = _NUMBER_RE.match(str(value or "").strip())
+    return float(m.group(1)) if m else float("nan")
+
+
+def profile_demographics(profile: Optional[UserProfile], today: Optional[date] = None) -> Tuple[Optional[int], int]:
+    """(age in years or None, sex code) from a UserProfile."""
+    if profile is None:
+        return None, SEX_ANY
+    return age_from_dob(profile.date_of_birth, today), _sex(profile.gender)
+
+
+def age_from_dob(date_of_birth: Optional[str], today: Optional[date] = None) -> Optional[int]:
+    """Age in whole years from an ISO date of birth; None if missing or unparseable."""
+    try:
+        dob = date.fromisoformat(str(date_of_birth)[:10])
+    except (TypeError, ValueError):
+        return None
+    today = today or date.today()
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def _sex(gender: Optional[str]) -> int:
+    g = (gender or "").strip().lower()
+    if g in ("m", "male", "man"):
+        return SEX_MALE
+    if g in ("f", "female", "woman"):
+        return SEX_FEMALE
+    return SEX_ANY
+
+
+# ── Vectorized flagging ──────────────────────────────
+
+def flag_arrays(
+    test_idx: np.ndarray,
+    values: np.ndarray,
+    sexes: np.ndarray,
+    ages: np.ndarray,
+) -> np.ndarray:
+    """
+    Status codes for canonical-unit values. test_idx < 0 or NaN values → UNKNOWN.
+    All arguments are equal-length arrays; ages may be -1 for unknown.
+    """
+    known = (test_idx >= 0) & ~np.isnan(values)
+    ages = np.where(ages < 0, DEFAULT_AGE, np.clip(ages, 0, MAX_AGE))
+    r = np.where(known, _RANGE_GRID[np.maximum(test_idx, 0), sexes, ages], -1)
+    known &= r >= 0
+    r = np.maximum(r, 0)
+    low, high, borderline_to = _LOW[r], _HIGH[r], _BORDERLINE_TO[r]
+    status = np.select(
+        [values < low, values > borderline_to, values > high],
+        [LOW, HIGH, BORDERLINE],
+        default=NORMAL,
+    )
+    return np.where(known, status, UNKNOWN)
+
+
+def flag_reports(
+    reports: Sequence[Dict[str, Any]],
+    demographics: Sequence[Tuple[Optional[int], int]],
+) -> List[Tuple[Dict[str, Any], List[str]]]:
+    """
+    Re-derive "status" for every value of every report in one pass.
+    `reports` are extracted_values dicts; `demographics` the matching (age, sex).
+    Returns (values, abnormal) per report. Tests not in the table keep a status
+    derived from the lab's printed reference range (or their existing status).
+    """
+    rows: List[Tuple[int, str, Dict[str, Any]]] = []
+    test_idx, numbers, sexes, ages = [], [], [], []
+    for report_no, (values, (age, sex)) in enumerate(zip(reports, demographics)):
+        for name, v in (values or {}).items():
+            if not isinstance(v, dict):
+                continue
+            rows.append((report_no, name, v))
+            test = canonical_test(name)
+            conv = _conversion(test, v.get("unit") or "") if test else None
+            if conv is None:
+                test_idx.append(-1)
+                numbers.append(float("nan"))
+            else:
+                test_idx.append(_TEST_INDEX[test])
+                numbers.append(_parse_number(v.get("value")) * conv[0] + conv[1])
+            sexes.append(sex)
+            ages.append(-1 if age is None else age)
+
+    codes = flag_arrays(
+        np.array(test_idx, dtype=np.int32),
+        np.array(numbers, dtype=np.float64),
+        np.array(sexes, dtype=np.int8),
+        np.array(ages, dtype=np.int32),
+    ) if rows else np.empty(0, dtype=np.int64)
+
+    out: List[Tuple[Dict[str, Any], List[str]]] = [({}, []) for _ in reports]
+    for (report_no, name, v), code in zip(rows, codes.tolist()):
+        if code != UNKNOWN:
+            status = STATUS_NAMES[code]
+        elif v.get("ref") and not np.isnan(_parse_number(v.get("value"))):
+            status = lab_status_from_ref(_parse_number(v.get("value")), _strip_ref(v.get("ref")))
+        else:
+            status = str(v.get("status") or "normal").lower()
+        values, abnormal = out[report_no]
+        values[name] = {**v, "status": status}
+        if status != "normal":
+            abnormal.append(name)
+    return out
+
+
+def _strip_ref(ref: Any) -> str:
+    return re.sub(r"\s+", "", str(ref)).replace("–", "-")
+
+
+def flag_values(
+    values: Dict[str, Any],
+    age: Optional[int] = None,
+    sex: int = SEX_ANY,
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Re-flag one report's extracted_values. Returns (values, abnormal)."""
+    return flag_reports([values], [(age, sex)])[0]
+
+
+def _flag_statuses(values: Optional[Dict[str, Any]], abnormal: Optional[List[str]]) -> Dict[str, str]:
+    values = values or {}
+    return {name: str((values.get(name) or {}).get("status", "")) for name in abnormal or []}
+
+
+def reflagged_summary(
+    summary: Optional[str],
+    old_values: Optional[Dict[str, Any]],
+    old_abnormal: Optional[List[str]],
+    values: Dict[str, Any],
+    abnormal: List[str],
+) -> Tuple[Optional[str], bool]:
+    """
+    (summary, needs_reanalysis) for a report whose flags went from old_* to the
+    new ones. An unchanged set of flags keeps the summary; otherwise it is
+    rebuilt from the values, and needs_reanalysis is set when the replaced
+    summary was a narrative one (Gemini's) rather than generated from the values.
+    """
+    if _flag_statuses(old_values, old_abnormal) == _flag_statuses(values, abnormal):
+        return summary, False
+    narrative = bool(summary) and summary != generate_ai_summary_from_values(old_values or {}, old_abnormal or [])
+    return generate_ai_summary_from_values(values, abnormal), narrative
+
+
+async def user_demographics(db: AsyncSession, user_id: str) -> Tuple[Optional[int], int]:
+    profile = (await db.execute(
+        select(UserProfile).where(UserProfile.user_id == user_id)
+    )).scalar_one_or_none()
+    return profile_demographics(profile)
+
+
+def _set_flags(report: MedicalReport, values: Dict[str, Any], abnormal: List[str]) -> None:
+    summary, needs_reanalysis = reflagged_summary(
+        report.ai_summary, report.extracted_values, report.abnormal_flags, values, abnormal
+    )
+    report.extracted_values, report.abnormal_flags, report.ai_summary = values, abnormal, summary
+    if needs_reanalysis:
+        report.summary_needs_reanalysis = True
+
+
+async def apply_reference_ranges(db: AsyncSession, report: MedicalReport) -> None:
+    """
+    Re-flag a report in place for its owner's age/sex and stamp the table
+    version; the summary is rebuilt if the flags changed.
+    """
+    if report.extracted_values:
+        age, sex = await user_demographics(db, report.user_id)
+        values, abnormal = flag_values(report.extracted_values, age, sex)
+        _set_flags(report, values, abnormal)
+    report.ranges_version = RANGES_VERSION
+
+
+# ── Bulk re-flag ─────────────────────────────────────
+
+async def reflag_user_reports(db: AsyncSession, user_id: str, profile: Optional[UserProfile]) -> int:
+    """Re-flag all of one user's reports, e.g. after their age/sex changed (caller commits)."""
+    reports = (await db.execute(
+        select(MedicalReport).where(MedicalReport.user_id == user_id, MedicalReport.extracted_values.is_not(None))
+    )).scalars().all()
+    demographics = profile_demographics(profile)
+    flagged = flag_reports([r.extracted_values for r in reports], [demographics] * len(reports))
+    for report, (values, abnormal) in zip(reports, flagged):
+        _set_flags(report, values, abnormal)
+        report.ranges_version = RANGES_VERSION
+    return len(reports)
+
+
+async def reflag_reports(session_factory, batch_size: int = 1000, force: bool = False) -> int:
+    """
+    Re-flag every report analyzed with an older RANGES_VERSION (or all, with force).
+    Keyset-paginated by id; one vectorized pass and one bulk UPDATE per batch.
+    The owners' resident chat indexes are dropped after each commit (this
+    process only: run from the CLI, a running API keeps its indexes until restart).
+    """
+    updated = 0
+    last_id = ""
+    while True:
+        async with session_factory() as session:
+            query = (
+                select(
+                    MedicalReport.id, MedicalReport.user_id, MedicalReport.extracted_values, MedicalReport.abnormal_flags,
+                    MedicalReport.ai_summary, MedicalReport.summary_needs_reanalysis,
+                    UserProfile.date_of_birth, UserProfile.gender,
+                )
+                .outerjoin(UserProfile, UserProfile.user_id == MedicalReport.user_id)
+                .where(MedicalReport.id > last_id, MedicalReport.extracted_values.is_not(None))
+                .order_by(MedicalReport.id).limit(batch_size)
+            )
+            if not force:
+                query = query.where(
+                    (MedicalReport.ranges_version.is_(None)) | (MedicalReport.ranges_version != RANGES_VERSION)
+                )
+            rows = (await session.execute(query)).all()
+            if not rows:
+                return updated
+
+            flagged = flag_reports(
+                [r.extracted_values for r in rows],
+                [(age_from_dob(r.date_of_birth), _sex(r.gender)) for r in rows],
+            )
+            params = []
+            for r, (values, abnormal) in zip(rows, flagged):
+                summary, needs_reanalysis = reflagged_summary(
+                    r.ai_summary, r.extracted_values, r.abnormal_flags, values, abnormal
+                )
+                params.append({
+                    "id": r.id, "extracted_values": values, "abnormal_flags": abnormal, "ai_summary": summary,
+                    "summary_needs_reanalysis": needs_reanalysis or r.summary_needs_reanalysis,
+                    "ranges_version": RANGES_VERSION,
+                })
+            await session.execute(update(MedicalReport), params)
+            await session.commit()
+            for user_id in {r.user_id for r in rows}:
+                invalidate_user_index(user_id)
+            updated += len(rows)
+            last_id = rows[-1].id
+            logger.info(f"Re-flagged {updated} reports (ranges {RANGES_VERSION}).")
+
+
+async def _main(force: bool) -> None:
+    from core.database import AsyncSessionLocal, init_db
+
+    await init_db()
+    count = await reflag_reports(AsyncSessionLocal, force=force)
+    print(f"Re-flagged {count} reports with reference ranges {RANGES_VERSION}.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-flag stored lab reports with the local reference ranges.")
+    parser.add_argument("--force", action="store_true", help="re-flag reports already on the current version")
+    asyncio.run(_main(parser.parse_args().force))
@@ -1,12 +1,16 @@
 """
 Medical report analysis using Gemini Vision when API key is available.
-Falls back to simulated extraction otherwise.
+PDFs with a text layer are parsed locally first (no LLM call); anything the
+lab-line parser can't handle goes to Gemini page by page, or to simulated
+extraction when no key is configured.
 """
-import base64
+import io
 import json
 import logging
 import re
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from services.gemini_client import get_genai_client
 
 logger = logging.getLogger(__name__)
 
@@ -35,22 +39,22 @@ def analyze_report_with_gemini(
     api_key: str,
 ) -> Tuple[Dict[str, Any], List[str], str]:
     """
-    Use Gemini Vision to analyze a medical report image.
+    Use Gemini Vision to analyze a medical report image (or a PDF without a usable text layer).
     Returns (values dict, abnormal list, ai_summary string).
     """
-    from google import genai
+    from google.genai import types
 
-    client = genai.Client(api_key=api_key)
-    b64 = base64.standard_b64encode(image_bytes).decode("utf-8")
+    client = get_genai_client(api_key)
 
+    # Raw bytes go straight into the Part; the SDK base64-encodes once when serializing
     contents = [
-        {
-            "role": "user",
-            "parts": [
-                {"text": REPORT_SYSTEM_PROMPT},
-                {"inline_data": {"mime_type": mime_type, "data": b64}},
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=REPORT_SYSTEM_PROMPT),
+                types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
             ],
-        }
+        )
     ]
 
     response = client.models.generate_content(
@@ -78,6 +82,175 @@ def analyze_report_with_gemini(
     return values, abnormal, summary
 
 
+# ── Local PDF text-layer extraction ──────────────────
+
+# One lab result per line: "<name> [:] <value> [H|L] [unit] [H|L] [reference range]"
+LAB_LINE_RE = re.compile(
+    r"""
+    ^\s*
+    (?P<name>[A-Za-z][A-Za-z0-9 ,()/+'.\-]{0,60}?[A-Za-z0-9)])
+    \s*(?::\s*|\s)\s*
+    (?P<value>\d+(?:\.\d+)?)
+    (?:\s+(?P<flag>[HL])\b)?
+    (?:\s*(?P<unit>%|(?:x?10\^\d+|[A-Za-z\u00b5\u03bc]{1,8})(?:/[A-Za-z0-9\u00b5\u03bc.^]{1,8}){0,2}))?
+    (?:\s+(?P<flag2>[HL])\b)?
+    (?:\s+(?P<ref>[<>\u2264\u2265]=?\s*\d+(?:\.\d+)?|\d+(?:\.\d+)?\s*[-\u2013]\s*\d+(?:\.\d+)?))?
+    \s*$
+    """,
+    re.VERBOSE,
+)
+_RANGE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*[-\u2013]\s*(\d+(?:\.\d+)?)")
+_BOUND_RE = re.compile(r"([<>\u2264\u2265])=?\s*(\d+(?:\.\d+)?)")
+_WS_RE = re.compile(r"[ \t]+")
+
+MIN_PDF_LAB_VALUES = 2          # fewer parsed lines than this → not a lab table we understand
+PDF_TEXTLESS_PAGE_LIMIT = 2     # leading pages with no text layer → scanned PDF, stop early
+
+
+def lab_status_from_ref(value: float, ref: Optional[str], flag: Optional[str] = None) -> str:
+    """Status from the lab's printed reference range ("a-b", "<x", ">x"), else its H/L flag."""
+    if ref:
+        m = _RANGE_RE.fullmatch(ref)
+        if m:
+            lo, hi = float(m.group(1)), float(m.group(2))
+            return "low" if value < lo else "high" if value > hi else "normal"
+        m = _BOUND_RE.fullmatch(ref)
+        if m:
+            bound = float(m.group(2))
+            if m.group(1) in "<\u2264":
+                return "high" if value > bound else "normal"
+            return "low" if value < bound else "normal"
+    if flag == "H":
+        return "high"
+    if flag == "L":
+        return "low"
+    return "normal"
+
+
+def parse_lab_line(line: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """Parse one text line into (test name, {value, unit, status, ref}), or None."""
+    m = LAB_LINE_RE.match(line)
+    if not m:
+        return None
+    unit, ref = m.group("unit"), m.group("ref")
+    # Without a reference range, only trust lab-style units ("mg/dL", "%", "10^3/uL");
+    # "<name> <number> [word]" is more likely a date, page number, ID or age than a result
+    if not ref and not (unit and any(c in unit for c in "/%^")):
+        return None
+    ref = _WS_RE.sub("", ref) if ref else None
+    value = m.group("value")
+    flag = m.group("flag") or m.group("flag2")
+    return _WS_RE.sub(" ", m.group("name")), {
+        "value": value,
+        "unit": unit or "",
+        "status": lab_status_from_ref(float(value), ref, flag),
+        "ref": ref or "",
+    }
+
+
+def parse_lab_text(text: str) -> Dict[str, Dict[str, str]]:
+    """Parse every lab line on one page; the first occurrence of a name on the page wins."""
+    values: Dict[str, Dict[str, str]] = {}
+    for line in text.splitlines():
+        parsed = parse_lab_line(line)
+        if parsed:
+            values.setdefault(parsed[0], parsed[1])
+    return values
+
+
+def _normalize_ref(ref: Any) -> str:
+    return _WS_RE.sub("", str(ref or "")).replace("\u2013", "-").lower()
+
+
+def merge_page_values(pages: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Merge per-page extracted_values (in document order) into one result.
+    A test name seen again with the same (or no) reference range is the same
+    result repeated, e.g. in a cumulative summary page: the first position wins,
+    unless only the later one carries a reference range. The same name with a
+    different reference range is a different assay/unit and is kept as
+    "<name> (p<page>)".
+    """
+    merged: Dict[str, Any] = {}
+    for page_no, values in enumerate(pages, start=1):
+        for name, v in (values or {}).items():
+            if not isinstance(v, dict):
+                continue
+            existing = merged.get(name)
+            if existing is None:
+                merged[name] = v
+                continue
+            ref, existing_ref = _normalize_ref(v.get("ref")), _normalize_ref(existing.get("ref"))
+            if ref and existing_ref and ref != existing_ref:
+                merged.setdefault(f"{name} (p{page_no})", v)
+            elif ref and not existing_ref:
+                merged[name] = v
+    abnormal = [name for name, v in merged.items() if str(v.get("status", "normal")).lower() != "normal"]
+    return merged, abnormal
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """Yield each page's text layer in order, one page in memory at a time."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def extract_pdf_lab_values(path: str) -> Optional[Tuple[Dict[str, Any], List[str], str]]:
+    """
+    Parse lab results from a PDF's text layer without an LLM.
+    Returns (values, abnormal, text), or None when the PDF has to go to the
+    fallback path (no pypdf, unreadable/encrypted, scanned, or not a lab table).
+    """
+    try:
+        texts: List[str] = []
+        page_values: List[Dict[str, Any]] = []
+        for page_no, text in enumerate(iter_pdf_pages(path), start=1):
+            if page_no > PDF_TEXTLESS_PAGE_LIMIT and not any(t.strip() for t in texts):
+                logger.info(f"PDF {path} has no text layer, skipping local extraction.")
+                return None
+            texts.append(text)
+            page_values.append(parse_lab_text(text))
+    except ImportError:
+        return None
+    except Exception as e:
+        logger.warning(f"PDF text extraction failed for {path}: {e}")
+        return None
+
+    values, abnormal = merge_page_values(page_values)
+    if len(values) < MIN_PDF_LAB_VALUES:
+        return None
+    return values, abnormal, "\n\n".join(texts)
+
+
+def split_pdf_pages(path: str) -> List[bytes]:
+    """
+    Split a PDF into single-page PDFs for page-parallel LLM analysis.
+    Returns the whole file as one "page" if it can't be split (no pypdf, encrypted, malformed).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        from pypdf import PdfReader, PdfWriter
+
+        reader = PdfReader(io.BytesIO(data))
+        if len(reader.pages) <= 1:
+            return [data]
+        pages = []
+        for page in reader.pages:
+            writer = PdfWriter()
+            writer.add_page(page)
+            out = io.BytesIO()
+            writer.write(out)
+            pages.append(out.getvalue())
+        return pages
+    except Exception as e:
+        logger.warning(f"Could not split PDF {path} into pages, analyzing it whole: {e}")
+        return [data]
+
+
 def simulate_lab_extraction(_filename: str) -> Dict[str, Any]:
     """Fallback: simulated lab values when Gemini is not used."""
     values = {
@@ -0,0 +1,491 @@
+"""
+Background report analysis jobs.
+
+Uploads enqueue a ReportAnalysisJob row; a bounded pool of asyncio workers
+claims due jobs from the database (so queued work survives restarts), runs
+local PDF text-layer extraction, Gemini Vision (on a preprocessed image, or
+page-parallel on PDFs the local parser can't handle) or the simulated fallback
+off the event loop, and writes the results back to the MedicalReport. Statuses are re-derived by
+services.reference_ranges for the report owner's age/sex. Thumbnails are
+rendered once per stored file before analysis (services.previews). Failed Gemini calls are retried with
+exponential backoff; the last attempt falls back to simulated extraction.
+Jobs whose worker died mid-run are reclaimed once their lease expires, or
+failed if that was their last attempt. A running job renews its lease every
+LEASE_RENEW_SECONDS, and its result is only written while the worker still
+owns the lease, so a reclaimed job is never completed twice.
+Jobs for byte-identical files are coalesced through services.blob_store so
+only one analysis runs per content hash.
+"""
+import asyncio
+import logging
+import random
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.orm.exc import StaleDataError
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.database import MedicalReport, ReportAnalysisJob, StoredFile, generate_uuid, utc_now
+from services.blob_store import try_lead_analysis, store_analysis, abandon_analysis
+from services.health_index import index_record
+from services.report_analyzer import (
+    analyze_report_with_gemini,
+    extract_pdf_lab_values,
+    split_pdf_pages,
+    merge_page_values,
+    simulate_lab_extraction,
+    generate_ai_summary_from_values,
+)
+from services.image_preprocess import preprocess_report_image, run_in_process_pool
+from services.previews import render_previews, preview_key, PREVIEW_SIZES
+from services.storage import storage, storage_key
+from services.reference_ranges import RANGES_VERSION, flag_values, reflagged_summary, user_demographics
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 2.0
+LEASE_SECONDS = 300
+LEASE_RENEW_SECONDS = 60  # heartbeat while a job runs; well inside LEASE_SECONDS
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+FOLLOWER_RECHECK_SECONDS = 1.0
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+
+class RetryableAnalysisError(Exception):
+    """Gemini analysis failed but the job has attempts left."""
+
+
+class LeaseLostError(Exception):
+    """The job's lease expired and another worker reclaimed it; this run's writes are discarded."""
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class ReportJobQueue:
+    """DB-backed queue with an in-process worker pool."""
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._status_events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stopping = False
+
+    # ── lifecycle ────────────────────────────────────
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Report analysis queue started with {self.workers} workers.")
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was committed."""
+        self._wakeup.set()
+
+    # ── status notifications (for SSE) ───────────────
+
+    async def wait_for_change(self, report_id: str, timeout: float) -> None:
+        """Block until this report's job changes state in this process, or timeout."""
+        event = self._status_events.setdefault(report_id, asyncio.Event())
+        self._waiters[report_id] = self._waiters.get(report_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # Drop the entry with its last waiter, so reports nobody follows don't accumulate
+            remaining = self._waiters.pop(report_id) - 1
+            if remaining:
+                self._waiters[report_id] = remaining
+            else:
+                self._status_events.pop(report_id, None)
+
+    def report_changed(self, report_id: str) -> None:
+        """Wake status streams of a report changed outside the workers (e.g. deleted)."""
+        self._publish(report_id)
+
+    def _publish(self, report_id: str) -> None:
+        event = self._status_events.pop(report_id, None)
+        if event is not None:
+            event.set()
+
+    # ── workers ──────────────────────────────────────
+
+    async def _worker(self, n: int) -> None:
+        while not self._stopping:
+            try:
+                claimed = await self._claim()
+            except Exception as e:
+                logger.error(f"Report worker {n} failed to claim a job: {e}")
+                claimed = None
+
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, owner = claimed
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, owner))
+            try:
+                await self._run(job_id, owner)
+            except StaleDataError:
+                logger.info(f"Report job {job_id} abandoned: its report was deleted while it ran")
+            except LeaseLostError:
+                logger.warning(f"Report job {job_id} abandoned: its lease was taken over by another worker")
+            except Exception as e:
+                logger.error(f"Report job {job_id} crashed: {e}")
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _heartbeat(self, job_id: str, owner: str) -> None:
+        """Extend the lease of a running job until cancelled or the lease is lost."""
+        while True:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        update(ReportAnalysisJob)
+                        .where(ReportAnalysisJob.id == job_id, ReportAnalysisJob.lease_owner == owner,
+                               ReportAnalysisJob.status == "running")
+                        .values(lease_expires_at=utc_now() + timedelta(seconds=LEASE_SECONDS))
+                    )
+                    await session.commit()
+            except Exception as e:
+                logger.warning(f"Report job {job_id} lease renewal failed: {e}")
+                continue
+            if result.rowcount != 1:
+                return  # finished, or reclaimed: the final write will notice
+
+    @staticmethod
+    async def _commit_owned(session, job: ReportAnalysisJob, owner: str) -> None:
+        """
+        Commit job/report changes only if this worker still holds the job's
+        lease. The check is an UPDATE in the same transaction, so on SQLite it
+        holds the write lock until the commit and a reclaim can't slip between.
+        """
+        job_id = job.id
+        result = await session.execute(
+            update(ReportAnalysisJob)
+            .where(ReportAnalysisJob.id == job_id, ReportAnalysisJob.lease_owner == owner)
+            .values(lease_owner=owner)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            await session.rollback()
+            raise LeaseLostError(job_id)
+        await session.commit()
+
+    async def _claim(self) -> Optional[Tuple[str, str]]:
+        """Atomically move one due job to 'running' and return (its id, the lease owner token)."""
+        now = utc_now()
+        expired = and_(ReportAnalysisJob.status == "running", ReportAnalysisJob.lease_expires_at < now)
+        due = or_(
+            and_(ReportAnalysisJob.status == "queued", ReportAnalysisJob.next_run_at <= now),
+            and_(expired, ReportAnalysisJob.attempts < ReportAnalysisJob.max_attempts),
+        )
+        async with AsyncSessionLocal() as session:
+            await self._fail_exhausted(session, and_(expired, ReportAnalysisJob.attempts >= ReportAnalysisJob.max_attempts))
+            candidates = await session.execute(
+                select(ReportAnalysisJob.id).where(due)
+                .order_by(ReportAnalysisJob.next_run_at).limit(self.workers)
+            )
+            for job_id in candidates.scalars():
+                owner = generate_uuid()
+                result = await session.execute(
+                    update(ReportAnalysisJob)
+                    .where(ReportAnalysisJob.id == job_id, due)
+                    .values(
+                        status="running",
+                        attempts=ReportAnalysisJob.attempts + 1,
+                        lease_expires_at=now + timedelta(seconds=LEASE_SECONDS),
+                        lease_owner=owner,
+                    )
+                )
+                await session.commit()
+                if result.rowcount == 1:
+                    return job_id, owner
+        return None
+
+    async def _fail_exhausted(self, session, exhausted) -> None:
+        """Fail jobs whose worker died during their last attempt, instead of reclaiming them."""
+        rows = (await session.execute(
+            select(ReportAnalysisJob.id, ReportAnalysisJob.report_id).where(exhausted)
+        )).all()
+        if not rows:
+            return
+        now = utc_now()
+        await session.execute(
+            update(ReportAnalysisJob)
+            .where(ReportAnalysisJob.id.in_([r.id for r in rows]), exhausted)
+            .values(status="failed", last_error="Worker lease expired on the last attempt.",
+                    finished_at=now, lease_expires_at=None)
+        )
+        await session.execute(
+            update(MedicalReport)
+            .where(MedicalReport.id.in_([r.report_id for r in rows]))
+            .values(analysis_status="failed")
+        )
+        await session.commit()
+        for r in rows:
+            logger.error(f"Report job {r.id} failed: lease expired on its last attempt")
+            self._publish(r.report_id)
+
+    async def _run(self, job_id: str, owner: str) -> None:
+        async with AsyncSessionLocal() as session:
+            job = await session.get(ReportAnalysisJob, job_id)
+            if job is None:
+                return
+            report = await session.get(MedicalReport, job.report_id)
+            if report is None:
+                # Deleted after the job was claimed: finish it so it isn't reclaimed forever
+                job.status = "failed"
+                job.last_error = "Report was deleted."
+                job.finished_at = utc_now()
+                job.lease_expires_at = None
+                await self._commit_owned(session, job, owner)
+                logger.info(f"Report job {job_id} dropped: report {job.report_id} was deleted")
+                self._publish(job.report_id)
+                return
+
+            await self._ensure_previews(session, report, job.content_type)
+
+            # Single-flight per content hash: reuse a cached result or wait for the leader
+            sha256 = report.file_sha256
+            leading = False
+            if sha256 and await session.get(StoredFile, sha256) is not None:
+                role = await try_lead_analysis(session, sha256)
+                if role == "completed":
+                    blob = await session.get(StoredFile, sha256, populate_existing=True)
+                    # The blob may have been analyzed for another user: flag for this owner
+                    values, abnormal = flag_values(
+                        blob.extracted_values or {}, *await user_demographics(session, report.user_id)
+                    )
+                    summary, needs_reanalysis = reflagged_summary(
+                        blob.ai_summary, blob.extracted_values, blob.abnormal_flags, values, abnormal
+                    )
+                    await self._complete(session, job, owner, report, values, abnormal, summary, blob.ocr_text,
+                                         reused=True, summary_needs_reanalysis=needs_reanalysis)
+                    return
+                if role == "wait":
+                    # Not a failed attempt — just check back once the leader has finished
+                    job.status = "queued"
+                    job.attempts = job.attempts - 1
+                    job.next_run_at = utc_now() + timedelta(seconds=FOLLOWER_RECHECK_SECONDS)
+                    job.lease_expires_at = None
+                    await self._commit_owned(session, job, owner)
+                    return
+                leading = True
+
+            try:
+                values, abnormal, summary, ocr_text = await self._analyze(session, job, owner, report)
+            except RetryableAnalysisError as e:
+                delay = backoff_delay(job.attempts)
+                job.status = "queued"
+                job.last_error = str(e)[:2000]
+                job.next_run_at = utc_now() + timedelta(seconds=delay)
+                job.lease_expires_at = None
+                if leading:
+                    await abandon_analysis(session, sha256)
+                await self._commit_owned(session, job, owner)
+                logger.warning(f"Report job {job_id} attempt {job.attempts} failed, retrying in {delay:.1f}s: {e}")
+                self._publish(report.id)
+                return
+            except LeaseLostError:
+                raise
+            except Exception as e:
+                job.status = "failed"
+                job.last_error = str(e)[:2000]
+                job.finished_at = utc_now()
+                report.analysis_status = "failed"
+                if leading:
+                    await abandon_analysis(session, sha256)
+                await self._commit_owned(session, job, owner)
+                logger.error(f"Report job {job_id} failed: {e}")
+                self._publish(report.id)
+                return
+
+            if leading:
+                await store_analysis(session, sha256, values, abnormal, summary, ocr_text)
+            await self._complete(session, job, owner, report, values, abnormal, summary, ocr_text)
+
+    async def _ensure_previews(self, session, report: MedicalReport, content_type: str) -> None:
+        """Render thumbnails for the report's stored file if no job has done so yet."""
+        if not report.file_sha256:
+            return
+        blob = await session.get(StoredFile, report.file_sha256)
+        if blob is None or blob.preview_sizes is not None:
+            return
+        key = storage_key(blob.file_url)
+        outputs = {size: storage.staging_path() for size in PREVIEW_SIZES}
+        try:
+            path = await storage.local_path(key)
+            sizes = await run_in_process_pool(render_previews, path, content_type, outputs)
+            for size in sizes:
+                await storage.put_file(outputs[size], preview_key(key, size), "image/webp")
+        except Exception as e:
+            # Pool/storage failure, not an unrenderable file: leave unset so a later job retries
+            logger.warning(f"Preview generation failed for {blob.sha256}: {e}")
+            return
+        blob.preview_sizes = sizes
+        await session.commit()
+        if sizes:
+            self._publish(report.id)
+
+    async def _complete(
+        self,
+        session,
+        job: ReportAnalysisJob,
+        owner: str,
+        report: MedicalReport,
+        values: dict,
+        abnormal: list,
+        summary: str,
+        ocr_text: Optional[str] = None,
+        reused: bool = False,
+        summary_needs_reanalysis: bool = False,
+    ) -> None:
+        report.ocr_text = ocr_text
+        report.extracted_values = values
+        report.abnormal_flags = abnormal
+        report.ranges_version = RANGES_VERSION
+        report.ai_summary = summary
+        report.summary_needs_reanalysis = summary_needs_reanalysis
+        report.analysis_status = "completed"
+        job.status = "succeeded"
+        job.finished_at = utc_now()
+        job.lease_expires_at = None
+        await self._commit_owned(session, job, owner)
+
+        index_record(report.user_id, "report", report)
+        source = "reused cached analysis" if reused else f"attempt {job.attempts}"
+        logger.info(f"Report {report.id} analyzed (job {job.id}, {source}).")
+        self._publish(report.id)
+
+    async def _analyze(
+        self, session, job: ReportAnalysisJob, owner: str, report: MedicalReport
+    ) -> Tuple[dict, list, str, Optional[str]]:
+        """
+        Returns (values, abnormal, summary, ocr_text). PDFs try the local text-layer
+        parser first; images and unparseable PDFs go to Gemini when a key is set,
+        simulated extraction otherwise. Statuses come from the local reference ranges.
+        """
+        path = await storage.local_path(storage_key(report.file_url))
+        demographics = await user_demographics(session, report.user_id)
+        if job.content_type == "application/pdf":
+            local = await asyncio.to_thread(extract_pdf_lab_values, path)
+            if local is not None:
+                values, text = local[0], local[2]
+                values, abnormal = flag_values(values, *demographics)
+                return values, abnormal, generate_ai_summary_from_values(values, abnormal), text
+            if settings.GEMINI_API_KEY:
+                result = await self._analyze_pdf_pages(session, job, owner, report, path, demographics)
+                if result is not None:
+                    return result
+        elif job.content_type.startswith("image/") and settings.GEMINI_API_KEY:
+            content, mime_type = await preprocess_report_image(path, job.content_type)
+            try:
+                values, _abnormal, summary = await asyncio.to_thread(
+                    analyze_report_with_gemini, content, mime_type, settings.GEMINI_API_KEY
+                )
+                values, abnormal = flag_values(values, *demographics)
+                return values, abnormal, summary, None
+            except Exception as e:
+                if job.attempts < job.max_attempts:
+                    raise RetryableAnalysisError(str(e)) from e
+                logger.warning(f"Gemini report analysis failed after {job.attempts} attempts, using fallback: {e}")
+
+        extracted = simulate_lab_extraction(report.file_name)
+        values, abnormal = flag_values(extracted["values"], *demographics)
+        return values, abnormal, generate_ai_summary_from_values(values, abnormal), None
+
+    async def _analyze_pdf_pages(
+        self, session, job: ReportAnalysisJob, owner: str, report: MedicalReport, path: str, demographics: tuple
+    ) -> Optional[Tuple[dict, list, str, None]]:
+        """
+        Split the PDF and send pages to Gemini concurrently (at most
+        REPORT_PAGE_CONCURRENCY in flight). Each finished page is committed to
+        job.page_results and the merged values so far to the report, so
+        progress is visible while the job runs and retries skip finished pages.
+        Returns None if no page could be analyzed on the last attempt.
+        """
+        pages = await asyncio.to_thread(split_pdf_pages, path)
+        done: Dict[str, Any] = dict(job.page_results or {})
+        if job.pages_total != len(pages):
+            done = {}  # results from a different split can't be reused
+        job.pages_total = len(pages)
+        job.pages_done = len(done)
+        await self._commit_owned(session, job, owner)
+
+        semaphore = asyncio.Semaphore(max(1, settings.REPORT_PAGE_CONCURRENCY))
+        lock = asyncio.Lock()  # one session: page commits must not interleave
+
+        async def run_page(index: int, data: bytes) -> None:
+            async with semaphore:
+                values, _abnormal, summary = await asyncio.to_thread(
+                    analyze_report_with_gemini, data, "application/pdf", settings.GEMINI_API_KEY
+                )
+            async with lock:
+                done[str(index)] = {"values": values, "summary": summary}
+                job.page_results = dict(done)
+                job.pages_done = len(done)
+                report.extracted_values, report.abnormal_flags = self._merge_pages(done, len(pages), demographics)
+                await self._commit_owned(session, job, owner)
+            self._publish(report.id)
+
+        results = await asyncio.gather(
+            *(run_page(i, data) for i, data in enumerate(pages) if str(i) not in done),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        lost = next((e for e in errors if isinstance(e, LeaseLostError)), None)
+        if lost is not None:
+            raise lost
+        if errors:
+            if job.attempts < job.max_attempts:
+                raise RetryableAnalysisError(
+                    f"{len(errors)} of {len(pages)} pages failed: {errors[0]}"
+                ) from errors[0]
+            logger.warning(f"Gemini analysis of {len(errors)}/{len(pages)} pages failed after {job.attempts} attempts: {errors[0]}")
+            if not done:
+                return None
+
+        values, abnormal = self._merge_pages(done, len(pages), demographics)
+        if len(pages) == 1:
+            summary = done["0"]["summary"]
+        else:
+            summary = generate_ai_summary_from_values(values, abnormal)
+            missing = len(pages) - len(done)
+            if missing:
+                summary += f"\n\n{missing} of {len(pages)} pages could not be analyzed."
+        return values, abnormal, summary, None
+
+    @staticmethod
+    def _merge_pages(done: Dict[str, Any], total: int, demographics: tuple) -> Tuple[dict, list]:
+        ordered = [done[str(i)]["values"] for i in range(total) if str(i) in done]
+        values, _abnormal = merge_page_values(ordered)
+        return flag_values(values, *demographics)
+
+
+report_jobs = ReportJobQueue(workers=settings.REPORT_WORKERS)
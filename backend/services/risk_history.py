@@ -0,0 +1,107 @@
+"""
+Risk history queries: the latest prediction per disease and downsampled trends.
+
+The latest result per disease comes from one ROW_NUMBER() window query, so a
+burst of checks for one disease can't hide another. Trend series read only
+(created_at, risk_score) pairs and are reduced server-side with
+Largest-Triangle-Three-Buckets, which keeps peaks and dips that plain
+every-nth sampling drops, so payloads stay small however many assessments
+a user has.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models.database import RiskPrediction
+
+TREND_MAX_POINTS = 1000
+
+
+async def latest_per_disease(db: AsyncSession, user_id: str) -> List[RiskPrediction]:
+    """Most recent prediction for every disease the user has been assessed for."""
+    ranked = (
+        select(
+            RiskPrediction,
+            func.row_number().over(
+                partition_by=RiskPrediction.disease_type,
+                order_by=(RiskPrediction.created_at.desc(), RiskPrediction.id.desc()),
+            ).label("rn"),
+        )
+        .where(RiskPrediction.user_id == user_id)
+        .subquery()
+    )
+    latest = aliased(RiskPrediction, ranked)
+    result = await db.execute(
+        select(latest).where(ranked.c.rn == 1).order_by(latest.disease_type)
+    )
+    return list(result.scalars().all())
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets. The first and
+    last points are always kept; each bucket in between keeps the point forming
+    the largest triangle with the previously kept point and the next bucket's mean.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)  # threshold - 2 buckets over the interior
+    kept = np.empty(threshold, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = slice(edges[i + 1], edges[i + 2])
+        else:
+            nxt = slice(n - 1, n)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+async def risk_trend(
+    db: AsyncSession,
+    user_id: str,
+    points: int,
+    disease_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """{disease_type: {"total": n, "points": [{"created_at", "risk_score"}, ...]}}, oldest first."""
+    query = (
+        select(RiskPrediction.disease_type, RiskPrediction.created_at, RiskPrediction.risk_score)
+        .where(RiskPrediction.user_id == user_id)
+        .order_by(RiskPrediction.disease_type, RiskPrediction.created_at)
+    )
+    if disease_type:
+        query = query.where(RiskPrediction.disease_type == disease_type)
+    if since:
+        query = query.where(RiskPrediction.created_at >= since)
+
+    by_disease: Dict[str, tuple] = {}
+    for disease, created_at, score in (await db.execute(query)).all():
+        times, scores = by_disease.setdefault(disease, ([], []))
+        times.append(created_at)
+        scores.append(score)
+
+    series = {}
+    for disease, (times, scores) in by_disease.items():
+        x = np.array([t.timestamp() for t in times])
+        keep = lttb(x, np.asarray(scores, dtype=float), points)
+        series[disease] = {
+            "total": len(times),
+            "points": [
+                {"created_at": times[i].isoformat(), "risk_score": scores[i]}
+                for i in keep.tolist()
+            ],
+        }
+    return series
@@ -0,0 +1,302 @@
+"""
+Cohort percentiles for risk scores.
+
+Every stored prediction is counted in a score histogram per disease_type, both
+overall ("all") and per age band. Scores are rounded to 4 decimals, so a
+10,001-bin histogram is exact (no t-digest approximation error) and costs
+~80 KB per cohort. Looking up "higher than X% of assessments" reads two
+entries of a cached cumulative sum instead of scanning risk_predictions.
+
+Predictions are counted once committed. Counts live in memory and are merged
+into risk_score_sketches every RISK_SKETCH_FLUSH_SECONDS (and on shutdown) as
+deltas, with a compare-and-swap on the row's total so concurrent flushes from
+several app processes don't lose counts; each flush then re-reads the table,
+so a process sees the others' predictions within one flush interval. On first
+start with an empty table the histograms are backfilled from the existing
+predictions; the rows are inserted rather than merged, so when several
+processes start at once only one backfill is stored and the others load it.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from core.config import settings
+from models.database import RiskPrediction, RiskScoreSketch, utc_now
+
+logger = logging.getLogger(__name__)
+
+SCORE_BINS = 10_001  # risk_score is rounded to 4 dp: bin = round(score * 10_000)
+ALL_AGES = "all"
+# (label, lowest age in band); the last band is open-ended
+AGE_BANDS = [("<30", 0), ("30-39", 30), ("40-49", 40), ("50-59", 50), ("60-69", 60), ("70+", 70)]
+MIN_COHORT_SIZE = 20  # smaller age bands fall back to the all-ages cohort
+BACKFILL_CHUNK = 5_000
+
+CohortKey = Tuple[str, str]  # (disease_type, age band or ALL_AGES)
+
+
+def age_band(age: Any) -> Optional[str]:
+    if age is None:
+        return None
+    try:
+        age = float(age)
+    except (TypeError, ValueError):
+        return None
+    label = None
+    for name, low in AGE_BANDS:
+        if age >= low:
+            label = name
+    return label
+
+
+def score_bin(score: float) -> int:
+    return min(SCORE_BINS - 1, max(0, int(round(score * (SCORE_BINS - 1)))))
+
+
+class ScoreHistogram:
+    """Exact histogram of 4-dp scores with a lazily rebuilt cumulative sum."""
+
+    def __init__(self, counts: Optional[np.ndarray] = None):
+        self.counts = counts if counts is not None else np.zeros(SCORE_BINS, dtype=np.int64)
+        self.total = int(self.counts.sum())
+        self._cdf: Optional[np.ndarray] = None
+
+    def add(self, bins: np.ndarray) -> None:
+        np.add.at(self.counts, bins, 1)
+        self.total += len(bins)
+        self._cdf = None
+
+    def percentile(self, score: float) -> Optional[float]:
+        """Mid-rank percentile: share of scores below, plus half of the ties."""
+        if self.total == 0:
+            return None
+        if self._cdf is None:
+            self._cdf = np.cumsum(self.counts)
+        b = score_bin(score)
+        equal = int(self.counts[b])
+        below = int(self._cdf[b]) - equal
+        return round(100.0 * (below + 0.5 * equal) / self.total, 1)
+
+
+def _bins_by_cohort(disease_type: str, scores: Iterable[float], ages: Iterable[Any]) -> Dict[CohortKey, np.ndarray]:
+    by_key: Dict[CohortKey, list] = defaultdict(list)
+    for score, age in zip(scores, ages):
+        b = score_bin(score)
+        by_key[(disease_type, ALL_AGES)].append(b)
+        band = age_band(age)
+        if band is not None:
+            by_key[(disease_type, band)].append(b)
+    return {key: np.asarray(bins, dtype=np.intp) for key, bins in by_key.items()}
+
+
+def to_sparse(counts: np.ndarray) -> Dict[str, int]:
+    nonzero = np.flatnonzero(counts)
+    return {str(i): int(counts[i]) for i in nonzero.tolist()}
+
+
+def from_sparse(sparse: Optional[Dict[str, int]]) -> np.ndarray:
+    counts = np.zeros(SCORE_BINS, dtype=np.int64)
+    for b, n in (sparse or {}).items():
+        counts[int(b)] += int(n)
+    return counts
+
+
+class RiskPercentiles:
+    """In-memory score histograms per (disease_type, age band), persisted periodically."""
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self._hists: Dict[CohortKey, ScoreHistogram] = {}
+        # Counts recorded since the last flush, merged into the stored rows
+        self._pending: Dict[CohortKey, np.ndarray] = {}
+        self._session_factory = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def _hist(self, key: CohortKey) -> ScoreHistogram:
+        hist = self._hists.get(key)
+        if hist is None:
+            hist = self._hists[key] = ScoreHistogram()
+        return hist
+
+    def record(self, disease_type: str, scores: Iterable[float], ages: Iterable[Any]) -> None:
+        """Count newly committed predictions (one score and input age per prediction)."""
+        for key, bins in _bins_by_cohort(disease_type, scores, ages).items():
+            self._hist(key).add(bins)
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = np.zeros(SCORE_BINS, dtype=np.int64)
+            np.add.at(pending, bins, 1)
+
+    def percentile(self, disease_type: str, score: float, age: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Where the score ranks among all stored scores for the disease, within the
+        age band when that cohort is large enough. None until anything is recorded.
+        """
+        band = age_band(age)
+        hist = self._hists.get((disease_type, band)) if band else None
+        cohort = band
+        if hist is None or hist.total < MIN_COHORT_SIZE:
+            hist = self._hists.get((disease_type, ALL_AGES))
+            cohort = ALL_AGES
+        if hist is None or hist.total == 0:
+            return None
+        return {"percentile": hist.percentile(score), "cohort": cohort, "cohort_size": hist.total}
+
+    # ── Persistence ──────────────────────────────────
+    async def load(self, session_factory) -> None:
+        async with session_factory() as session:
+            stored = await self._read(session)
+        if not stored:
+            stored = await self.backfill(session_factory)
+        self._set_stored(stored)
+
+    def _set_stored(self, stored: Dict[CohortKey, np.ndarray]) -> None:
+        """Histograms = the stored counts plus anything recorded here but not flushed yet."""
+        hists = {key: ScoreHistogram(counts) for key, counts in stored.items()}
+        for key, pending in self._pending.items():
+            hist = hists.setdefault(key, ScoreHistogram())
+            hist.counts += pending
+            hist.total += int(pending.sum())
+        self._hists = hists
+
+    @staticmethod
+    async def _read(session) -> Dict[CohortKey, np.ndarray]:
+        rows = await session.execute(
+            select(RiskScoreSketch.disease_type, RiskScoreSketch.age_band, RiskScoreSketch.counts)
+        )
+        return {(disease_type, band): from_sparse(counts) for disease_type, band, counts in rows}
+
+    async def backfill(self, session_factory) -> Dict[CohortKey, np.ndarray]:
+        """
+        Histograms of the existing predictions, stored as new rows (first start
+        only). If another process stored its backfill first, that one is returned.
+        """
+        stored: Dict[CohortKey, np.ndarray] = {}
+        count = 0
+        async with session_factory() as session:
+            result = await session.stream(
+                select(RiskPrediction.disease_type, RiskPrediction.risk_score, RiskPrediction.input_data)
+                .execution_options(yield_per=BACKFILL_CHUNK)
+            )
+            async for chunk in result.partitions(BACKFILL_CHUNK):
+                by_disease: Dict[str, Tuple[list, list]] = defaultdict(lambda: ([], []))
+                for disease_type, score, input_data in chunk:
+                    scores, ages = by_disease[disease_type]
+                    scores.append(score)
+                    ages.append((input_data or {}).get("age"))
+                for disease_type, (scores, ages) in by_disease.items():
+                    for key, bins in _bins_by_cohort(disease_type, scores, ages).items():
+                        counts = stored.get(key)
+                        if counts is None:
+                            counts = stored[key] = np.zeros(SCORE_BINS, dtype=np.int64)
+                        np.add.at(counts, bins, 1)
+                count += len(chunk)
+            if not stored:
+                return stored
+            try:
+                await session.execute(insert(RiskScoreSketch), [
+                    {"disease_type": disease_type, "age_band": band, "counts": to_sparse(counts),
+                     "total": int(counts.sum()), "updated_at": utc_now()}
+                    for (disease_type, band), counts in stored.items()
+                ])
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+                logger.info("Risk percentiles were backfilled by another process")
+                return await self._read(session)
+        logger.info(f"Backfilled risk percentiles from {count} predictions")
+        return stored
+
+    async def flush(self) -> None:
+        """Merge counts recorded since the last flush into risk_score_sketches, then re-read it."""
+        if self._session_factory is None:
+            return
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            try:
+                async with self._session_factory() as session:
+                    for key in list(pending):
+                        await self._merge(session, key, pending[key])
+                        del pending[key]
+                    stored = await self._read(session)
+            except Exception:
+                # Keep the unmerged deltas for the next attempt
+                for key, delta in pending.items():
+                    current = self._pending.get(key)
+                    self._pending[key] = delta if current is None else current + delta
+                raise
+            self._set_stored(stored)
+
+    @staticmethod
+    async def _merge(session, key: CohortKey, delta: np.ndarray) -> None:
+        """
+        Add delta to the stored row in its own transaction. The update only
+        applies if the row's total is unchanged since it was read (every merge
+        adds to it), so a concurrent flush from another process is retried on,
+        not overwritten.
+        """
+        disease_type, band = key
+        where = and_(RiskScoreSketch.disease_type == disease_type, RiskScoreSketch.age_band == band)
+        while True:
+            row = (await session.execute(select(RiskScoreSketch.counts, RiskScoreSketch.total).where(where))).first()
+            if row is None:
+                stmt = insert(RiskScoreSketch).values(
+                    disease_type=disease_type, age_band=band, counts=to_sparse(delta),
+                    total=int(delta.sum()), updated_at=utc_now(),
+                )
+            else:
+                counts = from_sparse(row.counts) + delta
+                stmt = (
+                    update(RiskScoreSketch)
+                    .where(where, func.coalesce(RiskScoreSketch.total, 0) == (row.total or 0))
+                    .values(counts=to_sparse(counts), total=int(counts.sum()), updated_at=utc_now())
+                )
+            try:
+                result = await session.execute(stmt)
+                if row is None or result.rowcount == 1:
+                    await session.commit()
+                    return
+            except IntegrityError:
+                pass  # the row was created concurrently
+            await session.rollback()
+
+    async def start(self, session_factory) -> None:
+        self._session_factory = session_factory
+        await self.load(session_factory)
+        if self.flush_seconds > 0:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Risk percentile flush on shutdown failed: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Risk percentile flush failed: {e}")
+
+
+risk_percentiles = RiskPercentiles(settings.RISK_SKETCH_FLUSH_SECONDS)
+
+
+def stored_percentile(prediction: RiskPrediction) -> Dict[str, Any]:
+    """percentile / percentile_cohort fields for a stored prediction (both None if unranked)."""
+    rank = risk_percentiles.percentile(
+        prediction.disease_type, prediction.risk_score, (prediction.input_data or {}).get("age")
+    ) or {}
+    return {"percentile": rank.get("percentile"), "percentile_cohort": rank.get("cohort")}
@@ -1,97 +1,161 @@
 """
 Disease Risk Prediction Service.
 
-Uses a simple logistic-regression–style scoring algorithm for the MVP.
-In production, replace with trained ML models (scikit-learn, XGBoost, etc.).
+Uses simple logistic-regression–style models served from the model registry
+(services.model_registry): trained coefficients are shipped as model files,
+with built-in mock weights as the fallback.
+
+Single predictions score one dict at a time; predict_risk_batch scores whole
+cohorts as one NumPy feature matrix. Both paths sum in the same order, round
+the same way and use math.exp (services.model_registry), so their results are
+bit-identical, importance order included; benchmarks/bench_risk_batch checks it.
 """
-import math
-from typing import Dict, Any, Tuple
-
-
-# Feature weights (mock — replace with trained model coefficients)
-DIABETES_WEIGHTS: Dict[str, float] = {
-    "age": 0.03,
-    "bmi": 0.08,
-    "glucose": 0.04,
-    "blood_pressure_systolic": 0.015,
-    "blood_pressure_diastolic": 0.01,
-    "insulin": 0.005,
-    "skin_thickness": 0.002,
-    "pregnancies": 0.02,
-    "smoking": 0.15,
-    "alcohol": 0.1,
-}
-
-HEART_DISEASE_WEIGHTS: Dict[str, float] = {
-    "age": 0.04,
-    "bmi": 0.05,
-    "cholesterol": 0.03,
-    "blood_pressure_systolic": 0.025,
-    "blood_pressure_diastolic": 0.02,
-    "smoking": 0.25,
-    "alcohol": 0.08,
-    "glucose": 0.02,
-}
-
-
-def _sigmoid(x: float) -> float:
-    return 1.0 / (1.0 + math.exp(-x))
-
-
-def _compute_risk(data: Dict[str, Any], weights: Dict[str, float]) -> Tuple[float, Dict[str, float]]:
-    """Compute a risk score using weighted features put through a sigmoid."""
-    z = -3.5  # intercept (bias towards low risk for safety)
-    importance: Dict[str, float] = {}
-
-    for feature, weight in weights.items():
-        value = data.get(feature)
-        if value is None:
-            continue
-        if isinstance(value, bool):
-            value = 1.0 if value else 0.0
-        contribution = float(value) * weight
-        z += contribution
-        importance[feature] = round(abs(contribution), 4)
-
-    # Normalize importance
-    total = sum(importance.values()) or 1
-    importance = {k: round(v / total, 3) for k, v in sorted(importance.items(), key=lambda x: -x[1])}
-
-    return round(_sigmoid(z), 4), importance
-
-
-def categorize_risk(score: float) -> str:
-    if score < 0.3:
-        return "low"
-    elif score < 0.6:
-        return "moderate"
-    else:
-        return "high"
+from typing import Dict, Any, List, Sequence, Tuple
 
+import numpy as np
 
-def predict_diabetes_risk(data: Dict[str, Any]) -> Dict[str, Any]:
-    score, importance = _compute_risk(data, DIABETES_WEIGHTS)
-    category = categorize_risk(score)
-    explanation = _generate_explanation("diabetes", score, category, importance)
+from services.model_registry import model_registry, RiskModel, RISK_CATEGORIES
+
+
+def _predict(disease_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    model = model_registry.get(disease_type)
+    score, importance = model.score_one(data)
+    category = model.categorize(score)
+    explanation = _generate_explanation(disease_type.replace("_", " "), score, category, importance)
     return {
-        "disease_type": "diabetes",
+        "disease_type": disease_type,
         "risk_score": score,
         "risk_category": category,
         "feature_importance": importance,
         "explanation": explanation,
+        "model_version": model.version,
     }
 
 
+def predict_diabetes_risk(data: Dict[str, Any]) -> Dict[str, Any]:
+    return _predict("diabetes", data)
+
+
 def predict_heart_disease_risk(data: Dict[str, Any]) -> Dict[str, Any]:
-    score, importance = _compute_risk(data, HEART_DISEASE_WEIGHTS)
-    category = categorize_risk(score)
-    explanation = _generate_explanation("heart disease", score, category, importance)
+    return _predict("heart_disease", data)
+
+
+# ── Batch scoring ────────────────────────────────────
+
+def pack_features(records: Sequence[Dict[str, Any]], features: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack input dicts into an (n, len(features)) float matrix plus a presence mask.
+    Missing values (absent or None) are 0 in the matrix and False in the mask; bools become 1/0.
+    """
+    n = len(records)
+    X = np.zeros((n, len(features)))
+    mask = np.zeros((n, len(features)), dtype=bool)
+    for j, feature in enumerate(features):
+        column = [r.get(feature) for r in records]
+        present = np.fromiter((v is not None for v in column), dtype=bool, count=n)
+        X[present, j] = [float(v) for v in column if v is not None]
+        mask[:, j] = present
+    return X, mask
+
+
+def importance_dicts(
+    importance: np.ndarray, order: np.ndarray, mask: np.ndarray, features: Sequence[str]
+) -> List[Dict[str, float]]:
+    """Per-row {feature: importance} dicts in `order`, missing features omitted."""
+    return [
+        {features[j]: row[j] for j in cols[:k]}
+        for row, cols, k in zip(importance.tolist(), order.tolist(), mask.sum(axis=1).tolist())
+    ]
+
+
+def predict_risk_batch(disease_type: str, records: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Score many input dicts for one disease; same result shape as predict_*_risk."""
+    model: RiskModel = model_registry.get(disease_type)  # one version for the whole batch
+    X, mask = pack_features(records, model.features)
+    return _matrix_results(disease_type, model, X, mask)
+
+
+def predict_all_risks(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Score one input against every registered disease model. The input is
+    packed once over the union of the models' features; each model scores its
+    own columns of that row.
+    """
+    models = model_registry.snapshot()
+    features = list(dict.fromkeys(f for model in models.values() for f in model.features))
+    X, mask = pack_features([data], features)
+    results = []
+    for disease_type, model in models.items():
+        cols = [features.index(f) for f in model.features]
+        results.extend(_matrix_results(disease_type, model, X[:, cols], mask[:, cols]))
+    return results
+
+
+def _matrix_results(disease_type: str, model: RiskModel, X: np.ndarray, mask: np.ndarray) -> List[Dict[str, Any]]:
+    scores, categories, importance, order = model.score_matrix(X, mask)
+    importances = importance_dicts(importance, order, mask, model.features)
+    disease = disease_type.replace("_", " ")
+    results = []
+    for score, category, imp in zip(scores.tolist(), categories.tolist(), importances):
+        category = RISK_CATEGORIES[category]
+        results.append({
+            "disease_type": disease_type,
+            "risk_score": score,
+            "risk_category": category,
+            "feature_importance": imp,
+            "explanation": _generate_explanation(disease, score, category, imp),
+            "model_version": model.version,
+        })
+    return results
+
+
+def what_if_grid(
+    disease_type: str,
+    data: Dict[str, Any],
+    axes: Sequence[Tuple[str, float, float, int]],
+) -> Dict[str, Any]:
+    """
+    Response surface around one input: score every combination of the given
+    (feature, min_delta, max_delta, steps) perturbations in one vectorized pass.
+    Yes/no features (smoking, alcohol) always vary over [no, yes]. Raises
+    ValueError for features the model doesn't use or that have no base value.
+    """
+    model = model_registry.get(disease_type)
+    X0, mask0 = pack_features([data], model.features)
+    grids = []
+    for feature, min_delta, max_delta, steps in axes:
+        if feature not in model.features:
+            raise ValueError(f"{feature} is not used by the {disease_type.replace('_', ' ')} model.")
+        if any(feature == f for f, _ in grids):
+            raise ValueError(f"{feature} appears in more than one axis.")
+        j = model.features.index(feature)
+        if isinstance(data.get(feature), bool):
+            values = np.array([0.0, 1.0])
+        elif not mask0[0, j]:
+            raise ValueError(f"Provide a value for {feature} to vary it.")
+        else:
+            values = np.round(np.maximum(X0[0, j] + np.linspace(min_delta, max_delta, steps), 0.0), 4)
+        grids.append((feature, values))
+
+    mesh = np.meshgrid(*(values for _, values in grids), indexing="ij")
+    X = np.repeat(X0, mesh[0].size, axis=0)
+    mask = np.repeat(mask0, mesh[0].size, axis=0)
+    for (feature, _), m in zip(grids, mesh):
+        j = model.features.index(feature)
+        X[:, j] = m.ravel()
+        mask[:, j] = True
+    scores = model.scores(X, mask)
+    categories = np.asarray(RISK_CATEGORIES)[np.digitize(scores, model.thresholds)]
+
+    base_score = float(model.scores(X0, mask0)[0])
     return {
-        "disease_type": "heart_disease",
-        "risk_score": score,
-        "risk_category": category,
-        "feature_importance": importance,
-        "explanation": explanation,
+        "disease_type": disease_type,
+        "model_version": model.version,
+        "base_score": base_score,
+        "base_category": model.categorize(base_score),
+        "axes": [{"feature": feature, "values": values.tolist()} for feature, values in grids],
+        "scores": scores.reshape(mesh[0].shape).tolist(),
+        "categories": categories.reshape(mesh[0].shape).tolist(),
     }
 
 
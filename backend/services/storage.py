@@ -0,0 +1,350 @@
+"""
+Pluggable blob storage for uploaded report files and their previews.
+
+Files are addressed by a storage key — the file name recorded in
+MedicalReport.file_url / StoredFile.file_url ("/uploads/<key>"), normally
+"<sha256>.<ext>". Two backends:
+
+- LocalShardedStorage: files live under hash-prefix subdirectories
+  (UPLOAD_DIR/ab/cd/<key>) so no directory grows past a few thousand entries.
+  Writes are staged in UPLOAD_DIR/.tmp and published with an atomic rename.
+  Files left in the old flat layout are still found until migrated.
+- S3Storage: any S3-compatible object store (AWS, MinIO, or
+  benchmarks/fake_s3.py locally). Reads go through a bounded local cache;
+  objects are immutable, so cached copies never go stale.
+
+Callers that need the bytes on disk (FileResponse, pypdf, Pillow) ask for
+local_path(), which is the file itself locally or a cached download for S3.
+
+Move existing files between layouts/backends with
+    python -m services.storage migrate --from local --to s3 [--delete-source]
+from backend/.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TMP_DIRNAME = ".tmp"
+CACHE_DIRNAME = ".cache"
+
+
+def storage_key(file_url: str) -> str:
+    """Map a stored file_url ("/uploads/<key>") to its storage key."""
+    return os.path.basename(file_url)
+
+
+def file_url_for(key: str) -> str:
+    return f"/uploads/{key}"
+
+
+def _shard(key: str) -> str:
+    return os.path.join(key[:2], key[2:4], key)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class StorageBackend(ABC):
+    """Interface used by upload, serve, delete and the analysis worker."""
+
+    name = "abstract"
+
+    @abstractmethod
+    def staging_path(self) -> str:
+        """A fresh local path to stream a new file into before put_file()."""
+
+    @abstractmethod
+    async def put_file(self, src_path: str, key: str, content_type: Optional[str] = None) -> bool:
+        """
+        Publish the finished local file `src_path` under `key`, consuming it.
+        Returns False if `key` already existed (the new copy is discarded).
+        """
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove `key`; missing keys are ignored."""
+
+    @abstractmethod
+    async def local_path(self, key: str) -> str:
+        """Path of a local file holding the object's bytes. Raises FileNotFoundError."""
+
+    @abstractmethod
+    def iter_keys(self) -> Iterator[str]:
+        """Every stored key (blocking; used by the migration tool)."""
+
+
+# ── Local disk ───────────────────────────────────────
+
+class LocalShardedStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, TMP_DIRNAME)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, _shard(key))
+
+    def _existing_path(self, key: str) -> Optional[str]:
+        for path in (self.path_for(key), os.path.join(self.root, key)):  # sharded, then legacy flat
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def staging_path(self) -> str:
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+
+    def _publish(self, src_path: str, key: str) -> bool:
+        if self._existing_path(key):
+            _remove_quietly(src_path)
+            return False
+        target = self.path_for(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.dirname(os.path.abspath(src_path)) != os.path.abspath(self.tmp_dir):
+            # Stage on this filesystem first so the final rename is atomic
+            staged = self.staging_path()
+            shutil.copyfile(src_path, staged)
+            _remove_quietly(src_path)
+            src_path = staged
+        os.replace(src_path, target)
+        return True
+
+    async def put_file(self, src_path: str, key: str, content_type: Optional[str] = None) -> bool:
+        return await asyncio.to_thread(self._publish, src_path, key)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._existing_path, key) is not None
+
+    async def delete(self, key: str) -> None:
+        def _delete() -> None:
+            for path in (self.path_for(key), os.path.join(self.root, key)):
+                _remove_quietly(path)
+        await asyncio.to_thread(_delete)
+
+    async def local_path(self, key: str) -> str:
+        path = await asyncio.to_thread(self._existing_path, key)
+        if path is None:
+            raise FileNotFoundError(key)
+        return path
+
+    def iter_keys(self) -> Iterator[str]:
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                if not name.startswith(".") and not name.endswith(".part"):
+                    yield name
+
+
+# ── S3-compatible object storage ─────────────────────
+
+class S3Storage(StorageBackend):
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        prefix: str = "",
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 512 * 1024 * 1024,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3).") from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+            config=Config(s3={"addressing_style": "path"}, retries={"max_attempts": 3}),
+        )
+        self.cache_dir = cache_dir or os.path.join(settings.UPLOAD_DIR, CACHE_DIRNAME)
+        self.cache_max_bytes = cache_max_bytes
+        self.tmp_dir = os.path.join(self.cache_dir, TMP_DIRNAME)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def staging_path(self) -> str:
+        return os.path.join(self.tmp_dir, f"{uuid.uuid4().hex}.part")
+
+    def _head(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _upload(self, src_path: str, key: str, content_type: Optional[str]) -> bool:
+        try:
+            if self._head(key):
+                return False
+            extra = {"ContentType": content_type} if content_type else {}
+            with open(src_path, "rb") as f:
+                self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=f, **extra)
+            return True
+        finally:
+            _remove_quietly(src_path)
+
+    async def put_file(self, src_path: str, key: str, content_type: Optional[str] = None) -> bool:
+        return await asyncio.to_thread(self._upload, src_path, key, content_type)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._head, key)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+        await asyncio.to_thread(_remove_quietly, os.path.join(self.cache_dir, _shard(key)))
+
+    def _download(self, key: str, target: str) -> None:
+        from botocore.exceptions import ClientError
+
+        staged = self.staging_path()
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+            with open(staged, "wb") as f:
+                for chunk in obj["Body"].iter_chunks(1024 * 1024):
+                    f.write(chunk)
+        except ClientError as e:
+            _remove_quietly(staged)
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key) from e
+            raise
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(staged, target)
+
+    def _prune_cache(self) -> None:
+        """Evict least recently used cached objects above cache_max_bytes."""
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+            dirnames[:] = [d for d in dirnames if d != TMP_DIRNAME]
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_atime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            _remove_quietly(path)
+            total -= size
+
+    async def local_path(self, key: str) -> str:
+        target = os.path.join(self.cache_dir, _shard(key))
+        if await asyncio.to_thread(os.path.isfile, target):
+            await asyncio.to_thread(os.utime, target)  # mark recently used
+            return target
+        # Concurrent misses may download twice; each publishes atomically, so that's harmless
+        await asyncio.to_thread(self._download, key, target)
+        await asyncio.to_thread(self._prune_cache)
+        return target
+
+    def iter_keys(self) -> Iterator[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"][len(self.prefix):]
+
+
+def create_storage(backend: Optional[str] = None) -> StorageBackend:
+    backend = (backend or settings.STORAGE_BACKEND).lower()
+    if backend == "local":
+        return LocalShardedStorage(settings.UPLOAD_DIR)
+    if backend == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region=settings.S3_REGION,
+            access_key_id=settings.S3_ACCESS_KEY_ID,
+            secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+            prefix=settings.S3_PREFIX,
+            cache_max_bytes=settings.STORAGE_CACHE_MAX_MB * 1024 * 1024,
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend!r}")
+
+
+storage = create_storage()
+
+
+# ── Migration ────────────────────────────────────────
+
+async def migrate(source: StorageBackend, target: StorageBackend, delete_source: bool = False) -> int:
+    """
+    Copy every key from `source` to `target` (existing keys are skipped), e.g. a
+    flat UPLOAD_DIR into the sharded layout (local → local) or local disk → S3.
+    Keys don't change, so no database rows need rewriting.
+    """
+    moved = 0
+    keys = await asyncio.to_thread(lambda: list(source.iter_keys()))
+    same_local = isinstance(source, LocalShardedStorage) and isinstance(target, LocalShardedStorage) \
+        and os.path.abspath(source.root) == os.path.abspath(target.root)
+    for key in keys:
+        src_path = await source.local_path(key)
+        if same_local:
+            if src_path == target.path_for(key):
+                continue  # already sharded
+            staged = target.staging_path()
+            await asyncio.to_thread(os.replace, src_path, staged)  # same filesystem: a move
+        else:
+            staged = target.staging_path()
+            await asyncio.to_thread(shutil.copyfile, src_path, staged)
+        if await target.put_file(staged, key):
+            moved += 1
+        if delete_source and not same_local:
+            await source.delete(key)
+        if moved and moved % 1000 == 0:
+            logger.info(f"Migrated {moved} files...")
+    return moved
+
+
+async def _main(args) -> None:
+    source = create_storage(args.source)
+    target = create_storage(args.target)
+    moved = await migrate(source, target, delete_source=args.delete_source)
+    print(f"Migrated {moved} files from {source.name} to {target.name}.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move stored report files between storage backends/layouts.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    m = sub.add_parser("migrate", help="copy every stored file to the target backend")
+    m.add_argument("--from", dest="source", default="local", choices=["local", "s3"])
+    m.add_argument("--to", dest="target", default="local", choices=["local", "s3"],
+                   help="local → local shards a flat UPLOAD_DIR in place")
+    m.add_argument("--delete-source", action="store_true", help="remove each file from the source after copying")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,116 +1,59 @@
 """
 Symptom analysis service.
 
-Uses keyword-based NLP classification for the MVP.
-In production, integrate a trained NLP model or use Gemini for classification.
+Uses keyword-based NLP classification over the condition knowledge base in
+services.symptom_kb. In production, integrate a trained NLP model or use
+Gemini for classification.
 """
-from typing import Dict, Any, List, Optional
-
-# ── Symptom → Condition mapping (MVP knowledge base) ──
-CONDITION_DB: List[Dict[str, Any]] = [
-    {
-        "name": "Common Cold",
-        "keywords": ["cough", "runny nose", "sneeze", "sore throat", "congestion", "mild fever"],
-        "urgency": "low",
-        "description": "Viral upper respiratory tract infection. Usually resolves within 7-10 days.",
-    },
-    {
-        "name": "Influenza (Flu)",
-        "keywords": ["fever", "body ache", "chills", "fatigue", "cough", "headache", "muscle pain"],
-        "urgency": "moderate",
-        "description": "Viral infection that can cause severe symptoms. Rest and fluids are essential.",
-    },
-    {
-        "name": "Migraine",
-        "keywords": ["headache", "nausea", "light sensitivity", "throbbing", "aura", "vision"],
-        "urgency": "moderate",
-        "description": "Recurrent headache disorder. May require prescription medication.",
-    },
-    {
-        "name": "Gastroenteritis",
-        "keywords": ["diarrhea", "vomiting", "nausea", "stomach", "abdominal pain", "cramp"],
-        "urgency": "moderate",
-        "description": "Inflammation of the stomach and intestines. Stay hydrated.",
-    },
-    {
-        "name": "Allergic Reaction",
-        "keywords": ["rash", "itching", "hives", "swelling", "watery eyes", "sneeze"],
-        "urgency": "moderate",
-        "description": "Immune system response to an allergen. May range from mild to severe.",
-    },
-    {
-        "name": "Urinary Tract Infection",
-        "keywords": ["burning urination", "frequent urination", "pelvic pain", "cloudy urine", "urgency"],
-        "urgency": "moderate",
-        "description": "Bacterial infection of the urinary system. Requires antibiotic treatment.",
-    },
-    {
-        "name": "Pneumonia",
-        "keywords": ["chest pain", "breathing difficulty", "high fever", "productive cough", "shortness of breath"],
-        "urgency": "high",
-        "description": "Lung infection that can be serious. Seek medical attention.",
-    },
-    {
-        "name": "Heart Attack Warning Signs",
-        "keywords": ["chest pain", "left arm pain", "jaw pain", "shortness of breath", "sweating", "nausea"],
-        "urgency": "emergency",
-        "description": "Potential cardiac emergency. Call emergency services immediately.",
-    },
-    {
-        "name": "Stroke Warning Signs",
-        "keywords": ["sudden numbness", "confusion", "trouble speaking", "vision loss", "severe headache", "dizziness", "face drooping"],
-        "urgency": "emergency",
-        "description": "Potential neurological emergency. Call emergency services immediately.",
-    },
-    {
-        "name": "Type 2 Diabetes Symptoms",
-        "keywords": ["frequent urination", "excessive thirst", "blurred vision", "fatigue", "slow healing", "tingling"],
-        "urgency": "moderate",
-        "description": "Metabolic disorder affecting blood sugar regulation. Requires medical evaluation.",
-    },
-]
-
-
-def _extract_symptoms(text: str) -> List[str]:
-    """Extract keywords from user text (simple tokenization)."""
-    text_lower = text.lower()
-    # Flatten all known keywords
-    all_keywords = set()
-    for condition in CONDITION_DB:
-        all_keywords.update(condition["keywords"])
-
-    found = []
-    for kw in all_keywords:
-        if kw in text_lower:
-            found.append(kw)
-    return found
-
-
-def _match_conditions(symptoms: List[str]) -> List[Dict[str, Any]]:
-    """Score each condition against the extracted symptoms."""
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from services.symptom_kb import SymptomIndex, symptom_kb
+
+# Bump when matching, scoring or recommendation logic changes; stored logs
+# produced by an older version are re-analyzed by services.symptom_reanalysis.
+ANALYZER_VERSION = "4"
+
+# Highest urgency a condition can reach on spell-corrected keywords alone
+FUZZY_MAX_URGENCY = "moderate"
+URGENCY_PRIORITY = {"emergency": 4, "high": 3, "moderate": 2, "low": 1}
+
+
+def _extract_symptoms(text: str, index: SymptomIndex) -> Tuple[List[str], Set[str]]:
+    """
+    Known symptom keywords (or their synonyms) mentioned in the text, whole words
+    only, and the subset found only by spell-correcting a word.
+    """
+    keyword_ids, fuzzy_ids = index.match_fuzzy(text)
+    return [index.keywords[kid] for kid in keyword_ids], {index.keywords[kid] for kid in fuzzy_ids}
+
+
+def _match_conditions(symptoms: List[str], index: SymptomIndex, fuzzy: Set[str] = frozenset()) -> List[Dict[str, Any]]:
+    """
+    Top 3 conditions for the matched keywords, ranked by BM25. A condition matched
+    only through spell-corrected keywords is capped at FUZZY_MAX_URGENCY.
+    """
+    keyword_ids = [index.keyword_ids[s] for s in symptoms if s in index.keyword_ids]
     results = []
-    for condition in CONDITION_DB:
-        matched = [s for s in symptoms if s in condition["keywords"]]
-        if matched:
-            score = len(matched) / len(condition["keywords"])
-            results.append({
-                "name": condition["name"],
-                "probability": round(min(score, 0.95), 2),  # cap at 95% — never 100%
-                "description": condition["description"],
-                "urgency": condition["urgency"],
-            })
-
-    # Sort by probability descending, take top 3
-    results.sort(key=lambda x: -x["probability"])
-    return results[:3]
+    for ci, probability in index.top_conditions(keyword_ids, k=3):
+        condition = index.conditions[ci]
+        urgency = condition["urgency"]
+        exact = any(s in condition["keywords"] and s not in fuzzy for s in symptoms)
+        if not exact and URGENCY_PRIORITY[urgency] > URGENCY_PRIORITY[FUZZY_MAX_URGENCY]:
+            urgency = FUZZY_MAX_URGENCY
+        results.append({
+            "name": condition["name"],
+            "probability": probability,
+            "description": condition.get("description"),
+            "urgency": urgency,
+        })
+    return results
 
 
 def _determine_urgency(conditions: List[Dict[str, Any]]) -> str:
     """Return the highest urgency from matched conditions."""
-    priority = {"emergency": 4, "high": 3, "moderate": 2, "low": 1}
     if not conditions:
         return "low"
-    return max(conditions, key=lambda c: priority.get(c.get("urgency", "low"), 0))["urgency"]
+    return max(conditions, key=lambda c: URGENCY_PRIORITY.get(c.get("urgency", "low"), 0))["urgency"]
 
 
 def _generate_recommendations(urgency: str, conditions: List[Dict[str, Any]]) -> List[str]:
@@ -135,10 +78,17 @@ def _generate_recommendations(urgency: str, conditions: List[Dict[str, Any]]) ->
     return recs
 
 
-def analyze_symptoms(description: str) -> Dict[str, Any]:
+def analyzer_version(index: SymptomIndex) -> str:
+    """Analyzer logic version plus the knowledge-base version it ran against."""
+    return f"{ANALYZER_VERSION}+kb.{index.version or 'unversioned'}"
+
+
+def analyze_symptoms(description: str, index: Optional[SymptomIndex] = None) -> Dict[str, Any]:
     """Main entry point for symptom analysis."""
-    symptoms = _extract_symptoms(description)
-    conditions = _match_conditions(symptoms)
+    if index is None:
+        index = symptom_kb.index  # one snapshot per call, even if a reload swaps it meanwhile
+    symptoms, fuzzy = _extract_symptoms(description, index)
+    conditions = _match_conditions(symptoms, index, fuzzy)
     urgency = _determine_urgency(conditions)
     recommendations = _generate_recommendations(urgency, conditions)
 
@@ -150,4 +100,5 @@ def analyze_symptoms(description: str) -> Dict[str, Any]:
         ],
         "urgency_level": urgency,
         "recommendations": recommendations,
+        "analyzer_version": analyzer_version(index),
     }
@@ -0,0 +1,421 @@
+"""
+Symptom → condition knowledge base.
+
+Conditions and keyword synonyms are loaded from a JSON file
+(SYMPTOM_KB_PATH, data/symptom_conditions.json by default):
+
+    {"version": "2026.10",
+     "synonyms": {"shortness of breath": ["breathless", ...], ...},
+     "conditions": [{"name": ..., "keywords": [...], "urgency": "moderate",
+                     "description": ...}, ...]}
+
+and compiled into a SymptomIndex: a word-level keyword trie (synonyms map to
+their canonical keyword) plus CSR posting arrays keyword → conditions with
+precomputed BM25 weights, so scoring a text is a few numpy calls over the
+postings of the matched keywords, whatever the size of the knowledge base.
+Words that match no keyword and are not ordinary English words (the lexicon
+in SYMPTOM_LEXICON_PATH) are spell-corrected ("nausia" → "nausea") through a
+character-trigram index over the keyword vocabulary, verified by bounded edit
+distance. Keywords found only through a correction are reported separately,
+so callers can treat them as weaker evidence.
+The file is polled every SYMPTOM_KB_RELOAD_SECONDS and a changed file is
+compiled in a worker thread and swapped in with one assignment; a file that
+fails to validate is logged and the previous index stays live.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+URGENCY_LEVELS = ("low", "moderate", "high", "emergency")
+
+# BM25 parameters (standard Okapi defaults). Each keyword occurs at most once
+# per condition, so a condition's "length" is its number of keywords.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Typo tolerance: only tokens exact matching missed and the lexicon doesn't
+# know are looked up, and a correction must keep the first letter and be
+# within the edit-distance bound. Shorter words only accept a swap of two
+# adjacent letters ("pian" → "pain"), since one substitution turns too many
+# everyday words into keywords ("rush").
+FUZZY_MIN_LENGTH = 5
+FUZZY_MIN_SWAP_LENGTH = 4
+FUZZY_CACHE_SIZE = 10_000
+
+
+def fuzzy_max_distance(token: str) -> int:
+    return 1 if len(token) < 8 else 2
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_KEYWORD = ""  # trie node key holding the id of the keyword ending there (never a token)
+
+
+def _normalize(token: str) -> str:
+    """Fold simple plurals so "sneezes" matches "sneeze" and "chills" matches "chill"."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_normalize(t) for t in _WORD_RE.findall(text.lower())]
+
+
+def inflections(word: str) -> List[str]:
+    """The word plus its regular inflected forms (over-generating is harmless for a stoplist)."""
+    forms = [word, word + "s", word + "es", word + "ed", word + "ing", word + "er", word + "est", word + "ly"]
+    if word.endswith("e"):
+        forms += [word + "d", word + "r", word + "st", word[:-1] + "ing"]
+    if word.endswith("y") and len(word) > 2:
+        forms += [word[:-1] + suffix for suffix in ("ies", "ied", "ier", "iest", "ily")]
+    vowels = "aeiou"
+    if len(word) >= 3 and word[-1] not in vowels + "wxy" and word[-2] in vowels and word[-3] not in vowels:
+        doubled = [word + word[-1] + suffix for suffix in ("ed", "ing", "er", "est")]
+        if len(word) == 3:
+            # One syllable always doubles: keep "runing" out so it is still corrected to "running"
+            forms = [f for f in forms if f[3:] not in ("ed", "ing", "er", "est")]
+        forms += doubled
+    return forms
+
+
+@lru_cache(maxsize=4)
+def load_lexicon(path: str) -> FrozenSet[str]:
+    """Common English words (one base form per line, '#' comments), with inflections, plural-folded."""
+    words: Set[str] = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            word = line.strip().lower()
+            if word and not word.startswith("#"):
+                for form in inflections(word):
+                    words.add(form)
+                    words.add(_normalize(form))
+    return frozenset(words)
+
+
+def trigrams(token: str) -> List[str]:
+    padded = f"  {token} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def bounded_edit_distance(a: str, b: str, max_dist: int) -> int:
+    """
+    Optimal-string-alignment distance (adjacent swaps count as one edit), or
+    max_dist + 1 as soon as it is certain to exceed max_dist.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_dist:
+            return max_dist + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], max_dist + 1)
+
+
+class SymptomIndex:
+    """
+    Compiled knowledge base: keyword trie, inverted keyword → condition
+    postings and per-condition BM25 weights.
+
+    Text is tokenized once and the trie is walked from every token, so each
+    keyword phrase matches on whole words only ("urgency" no longer fires
+    inside other words) and every keyword, including ones nested in longer
+    phrases, is found in a single pass regardless of knowledge-base size.
+    """
+
+    def __init__(
+        self,
+        conditions: List[Dict[str, Any]],
+        synonyms: Optional[Dict[str, List[str]]] = None,
+        version: str = "",
+        lexicon: FrozenSet[str] = frozenset(),
+    ):
+        self.version = version
+        self.lexicon = lexicon  # real words, never spell-corrected
+        self.conditions = conditions
+        self.keywords: List[str] = []
+        self.keyword_ids: Dict[str, int] = {}  # canonical keywords and synonyms → keyword id
+        self._trie: Dict[str, Any] = {}
+
+        condition_keywords = []
+        for condition in conditions:
+            ids = dict.fromkeys(self._add_keyword(kw) for kw in condition["keywords"])
+            condition_keywords.append(list(ids))
+        for keyword, alternatives in (synonyms or {}).items():
+            kid = self._add_keyword(keyword)
+            for alternative in alternatives:
+                self._add_phrase(alternative, kid)
+
+        # CSR postings: conditions of keyword k are cond[ptr[k]:ptr[k + 1]]
+        n_kw, n_cond = len(self.keywords), len(conditions)
+        lengths = np.array([len(ids) for ids in condition_keywords], dtype=np.float64)
+        doc_freq = np.zeros(n_kw, dtype=np.int64)
+        for ids in condition_keywords:
+            doc_freq[ids] += 1
+        self.ptr = np.zeros(n_kw + 1, dtype=np.int64)
+        np.cumsum(doc_freq, out=self.ptr[1:])
+        self.cond = np.empty(self.ptr[-1], dtype=np.int32)
+        fill = self.ptr[:-1].copy()
+        for ci, ids in enumerate(condition_keywords):
+            self.cond[fill[ids]] = ci
+            fill[ids] += 1
+
+        self.idf = np.log(1.0 + (n_cond - doc_freq + 0.5) / (doc_freq + 0.5))
+        avg_len = lengths.mean() if n_cond else 1.0
+        tf_norm = (BM25_K1 + 1) / (1 + BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(avg_len, 1e-9)))
+        kw_of_posting = np.repeat(np.arange(n_kw), doc_freq)
+        self.weight = self.idf[kw_of_posting] * tf_norm[self.cond]
+        # idf mass of each condition's keywords, for the displayed match probability
+        self.idf_total = np.bincount(self.cond, self.idf[kw_of_posting], minlength=n_cond)
+
+        # Character-trigram index over every word of every keyword and synonym
+        self.vocab = sorted({token for phrase in self.keyword_ids for token in tokenize(phrase)})
+        self._vocab_set = frozenset(self.vocab)
+        self._trigram_postings: Dict[str, List[int]] = {}
+        for vi, token in enumerate(self.vocab):
+            for gram in dict.fromkeys(trigrams(token)):
+                self._trigram_postings.setdefault(gram, []).append(vi)
+        self._corrections: Dict[str, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.conditions)
+
+    def _add_keyword(self, keyword: str) -> int:
+        kid = self.keyword_ids.get(keyword)
+        if kid is None:
+            kid = len(self.keywords)
+            self.keywords.append(keyword)
+            self._add_phrase(keyword, kid)
+        return kid
+
+    def _add_phrase(self, phrase: str, kid: int) -> None:
+        self.keyword_ids.setdefault(phrase, kid)
+        node = self._trie
+        for token in tokenize(phrase):
+            node = node.setdefault(token, {})
+        node.setdefault(_KEYWORD, kid)  # two spellings with the same tokens share the first id
+
+    def match(self, text: str, fuzzy: bool = True) -> List[int]:
+        """
+        Ids of the keywords present in text, in order of first appearance. With
+        fuzzy, misspelled words are corrected first; see match_fuzzy.
+        """
+        if not fuzzy:
+            return list(self._walk(tokenize(text))[0])
+        return self.match_fuzzy(text)[0]
+
+    def match_fuzzy(self, text: str) -> Tuple[List[int], Set[int]]:
+        """
+        (keyword ids, the subset found only through spell correction). Words no
+        keyword covered that aren't in the lexicon are corrected against the
+        keyword vocabulary and the text is matched again.
+        """
+        tokens = tokenize(text)
+        found, covered = self._walk(tokens)
+        corrected = list(tokens)
+        changed = False
+        for i, token in enumerate(tokens):
+            if (i in covered or len(token) < FUZZY_MIN_SWAP_LENGTH
+                    or token in self._vocab_set or token in self.lexicon):
+                continue
+            correction = self.correct(token)
+            if correction is not None:
+                corrected[i] = correction
+                changed = True
+        fuzzy_only: Set[int] = set()
+        if changed:
+            for kid in self._walk(corrected)[0]:
+                if kid not in found:
+                    found[kid] = None
+                    fuzzy_only.add(kid)
+        return list(found), fuzzy_only
+
+    def _walk(self, tokens: List[str]) -> Tuple[Dict[int, None], set]:
+        """Trie walk from every token: (keyword ids found, positions inside a match)."""
+        found: Dict[int, None] = {}
+        covered = set()
+        trie = self._trie
+        for i in range(len(tokens)):
+            node = trie.get(tokens[i])
+            j = i + 1
+            while node is not None:
+                kid = node.get(_KEYWORD)
+                if kid is not None:
+                    found[kid] = None
+                    covered.update(range(i, j))
+                if j == len(tokens):
+                    break
+                node = node.get(tokens[j])
+                j += 1
+        return found, covered
+
+    def correct(self, token: str) -> Optional[str]:
+        """Closest vocabulary word within the edit-distance bound, or None (memoized)."""
+        if token in self._corrections:
+            return self._corrections[token]
+        max_dist = fuzzy_max_distance(token)
+        grams = dict.fromkeys(trigrams(token))
+        # q-gram lemma: each edit (an adjacent swap included) destroys at most 4 trigrams
+        min_shared = max(1, len(grams) - 4 * max_dist)
+        swap_only = len(token) < FUZZY_MIN_LENGTH
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for vi in self._trigram_postings.get(gram, ()):
+                shared[vi] = shared.get(vi, 0) + 1
+        best, best_key = None, None
+        for vi, n in shared.items():
+            candidate = self.vocab[vi]
+            if n < min_shared or candidate[0] != token[0]:
+                continue
+            if swap_only and sorted(candidate) != sorted(token):
+                continue
+            dist = bounded_edit_distance(token, candidate, max_dist)
+            if dist <= max_dist and (best_key is None or (dist, -n, candidate) < best_key):
+                best, best_key = candidate, (dist, -n, candidate)
+        if len(self._corrections) >= FUZZY_CACHE_SIZE:
+            self._corrections.clear()
+        self._corrections[token] = best
+        return best
+
+    def top_conditions(self, keyword_ids: List[int], k: int = 3) -> List[Tuple[int, float]]:
+        """
+        (condition index, probability) for the k conditions with the highest BM25
+        score; probability is the idf-weighted share of the condition's keywords
+        that matched, capped at 95%.
+        """
+        if not keyword_ids:
+            return []
+        spans = [slice(self.ptr[kid], self.ptr[kid + 1]) for kid in keyword_ids]
+        conds = np.concatenate([self.cond[s] for s in spans])
+        if not len(conds):
+            return []
+        n = len(self.conditions)
+        scores = np.bincount(conds, np.concatenate([self.weight[s] for s in spans]), minlength=n)
+        hit = np.flatnonzero(scores)  # every weight is > 0
+        if len(hit) > k:
+            # Partial selection; keep everything tied with the k-th score so ties resolve below
+            kth = np.partition(scores[hit], len(hit) - k)[len(hit) - k]
+            hit = hit[scores[hit] >= kth]
+        # Highest score first; ties keep knowledge-base order
+        top = hit[np.lexsort((hit, -scores[hit]))][:k]
+
+        idfs = np.repeat(self.idf[keyword_ids], [s.stop - s.start for s in spans])
+        coverage = np.bincount(conds, idfs, minlength=n)[top] / self.idf_total[top]
+        return [(int(ci), round(min(float(c), 0.95), 2)) for ci, c in zip(top, coverage)]
+
+
+def validate_kb(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]], str]:
+    conditions = data.get("conditions")
+    if not isinstance(conditions, list) or not conditions:
+        raise ValueError("'conditions' must be a non-empty list")
+    for i, condition in enumerate(conditions):
+        if not isinstance(condition, dict) or not condition.get("name"):
+            raise ValueError(f"condition {i}: 'name' is required")
+        keywords = condition.get("keywords")
+        if not isinstance(keywords, list) or not keywords or not all(isinstance(k, str) and tokenize(k) for k in keywords):
+            raise ValueError(f"condition {condition['name']!r}: 'keywords' must be a non-empty list of phrases")
+        if condition.get("urgency") not in URGENCY_LEVELS:
+            raise ValueError(f"condition {condition['name']!r}: urgency must be one of {URGENCY_LEVELS}")
+    synonyms = data.get("synonyms") or {}
+    if not isinstance(synonyms, dict) or not all(
+        isinstance(v, list) and all(isinstance(s, str) and tokenize(s) for s in v) for v in synonyms.values()
+    ):
+        raise ValueError("'synonyms' must map keywords to lists of phrases")
+    return conditions, synonyms, str(data.get("version", ""))
+
+
+def load_kb_file(path: str, lexicon_path: Optional[str] = None) -> SymptomIndex:
+    with open(path, encoding="utf-8") as f:
+        conditions, synonyms, version = validate_kb(json.load(f))
+    lexicon = load_lexicon(lexicon_path or settings.SYMPTOM_LEXICON_PATH)
+    return SymptomIndex(conditions, synonyms, version, lexicon)
+
+
+# ── Hot-reloaded knowledge base ──────────────────────
+
+class SymptomKnowledgeBase:
+    """The live SymptomIndex, hot-reloaded from path."""
+
+    def __init__(self, path: str, reload_seconds: float = 30.0):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._index: Optional[SymptomIndex] = None  # replaced wholesale on reload, never mutated
+        self._signature: Optional[Tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def index(self) -> SymptomIndex:
+        index = self._index
+        if index is None:
+            # Used outside the app lifespan (CLI, benchmarks, chatbot tools in scripts)
+            self.reload()
+            index = self._index
+        return index
+
+    def _file_signature(self) -> Tuple:
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return (None, None)
+
+    def reload(self, force: bool = False) -> bool:
+        """(Re)load the file if it changed (blocking). Returns True if the live index was swapped."""
+        signature = self._file_signature()
+        if signature == self._signature and not force:
+            return False
+        try:
+            index = load_kb_file(self.path)
+        except (OSError, ValueError) as e:
+            self._signature = signature  # don't retry the same broken file every poll
+            if self._index is not None:
+                logger.error(f"Rejected symptom knowledge base {self.path}: {e}")
+                return False
+            raise
+        self._index = index
+        self._signature = signature
+        logger.info(
+            f"Symptom knowledge base {index.version or '(unversioned)'} loaded: "
+            f"{len(index)} conditions, {len(index.keywords)} keywords"
+        )
+        return True
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.reload, True)
+        if self.reload_seconds > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.error(f"Symptom knowledge base reload failed: {e}")
+
+
+symptom_kb = SymptomKnowledgeBase(settings.SYMPTOM_KB_PATH, settings.SYMPTOM_KB_RELOAD_SECONDS)
@@ -0,0 +1,204 @@
+"""
+Background re-analysis of stored symptom logs.
+
+Each SymptomLog records the analyzer_version (analyzer logic + knowledge-base
+version) that produced its classified_symptoms / possible_conditions /
+urgency_level / recommendations. When either changes, every log on another
+version is re-analyzed against the index the app is serving: rows are read in
+id-keyset chunks (raw_input plus the stored results only), analyzed in a spawn
+process pool off the event loop (each worker receives that index when it
+starts, instead of reading the knowledge-base file itself), and written back
+with one bulk UPDATE per chunk: the full result for rows whose output changed,
+only the version for the rest. Finished rows carry the new version, so an
+interrupted run resumes where it stopped. Between chunks the job sleeps long
+enough to keep its share of wall time at SYMPTOM_REANALYZE_DUTY, so online
+requests aren't starved of the database or CPU.
+
+The app runs it on startup and after knowledge-base reloads
+(SYMPTOM_REANALYZE_AUTO); from backend/ it can also be run by hand with
+    python -m services.symptom_reanalysis [--force]
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, or_
+
+from core.config import settings
+from models.database import SymptomLog
+from services.symptom_analyzer import analyze_symptoms, analyzer_version
+from services.symptom_kb import SymptomIndex, symptom_kb
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = ("classified_symptoms", "possible_conditions", "urgency_level", "recommendations")
+
+# Worker-process index: the one the app was serving when the pool started
+_worker_index: Optional[SymptomIndex] = None
+
+
+def _init_worker(index: SymptomIndex) -> None:
+    global _worker_index
+    _worker_index = index
+
+
+def analyze_texts(texts: List[str]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Process-pool entry point: (analyzer version, result fields per text)."""
+    index = _worker_index
+    results = []
+    for text in texts:
+        result = analyze_symptoms(text, index)
+        results.append({field: result[field] for field in RESULT_FIELDS})
+    return analyzer_version(index), results
+
+
+class SymptomReanalysisJob:
+    """Resumable, throttled re-analysis of SymptomLog rows on an older analyzer version."""
+
+    def __init__(self, workers: int, chunk_size: int, duty: float, poll_seconds: float):
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.duty = duty
+        self.poll_seconds = poll_seconds
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_index: Optional[SymptomIndex] = None
+        self._task: Optional[asyncio.Task] = None
+        self._done_version: Optional[str] = None
+
+    def _get_pool(self, index: SymptomIndex) -> ProcessPoolExecutor:
+        if self._pool is not None and self._pool_index is not index:
+            self._shutdown_pool()
+        if self._pool is None:
+            # spawn: forking a process that owns event-loop / DB threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(index,),
+            )
+            self._pool_index = index
+        return self._pool
+
+    def _shutdown_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_index = None
+
+    async def _analyze(self, index: SymptomIndex, texts: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool(index)
+        size = -(-len(texts) // self.workers)
+        parts = await asyncio.gather(*(
+            loop.run_in_executor(pool, analyze_texts, texts[i:i + size])
+            for i in range(0, len(texts), size)
+        ))
+        return [(version, result) for version, results in parts for result in results]
+
+    async def run(self, session_factory, force: bool = False) -> Dict[str, Any]:
+        """
+        Re-analyze every log not on the current analyzer version (all logs with
+        force), against the index being served when the run starts.
+        """
+        index = symptom_kb.index
+        target = analyzer_version(index)
+        processed = changed = skipped = 0
+        last_id = ""
+        try:
+            while True:
+                started = time.monotonic()
+                async with session_factory() as session:
+                    query = (
+                        select(SymptomLog.id, SymptomLog.raw_input, *(getattr(SymptomLog, f) for f in RESULT_FIELDS))
+                        .where(SymptomLog.id > last_id)
+                        .order_by(SymptomLog.id).limit(self.chunk_size)
+                    )
+                    if not force:
+                        query = query.where(
+                            or_(SymptomLog.analyzer_version.is_(None), SymptomLog.analyzer_version != target)
+                        )
+                    rows = (await session.execute(query)).all()
+                if not rows:
+                    break
+
+                analyzed = await self._analyze(index, [r.raw_input for r in rows])
+                full, version_only = [], []
+                for row, (version, result) in zip(rows, analyzed):
+                    if version != target:
+                        skipped += 1  # never stamp a row with a version the app isn't serving
+                        continue
+                    if all(getattr(row, f) == result[f] for f in RESULT_FIELDS):
+                        version_only.append({"id": row.id, "analyzer_version": version})
+                    else:
+                        full.append({"id": row.id, **result, "analyzer_version": version})
+                async with session_factory() as session:
+                    if full:
+                        await session.execute(update(SymptomLog), full)
+                    if version_only:
+                        await session.execute(update(SymptomLog), version_only)
+                    await session.commit()
+
+                processed += len(full) + len(version_only)
+                changed += len(full)
+                last_id = rows[-1].id
+                logger.info(f"Re-analyzed {processed} symptom logs ({changed} changed, analyzer {target}).")
+
+                if 0 < self.duty < 1:
+                    await asyncio.sleep((time.monotonic() - started) * (1 / self.duty - 1))
+        finally:
+            self._shutdown_pool()
+        if skipped:
+            logger.warning(f"Skipped {skipped} symptom logs analyzed with a version other than {target}.")
+        return {"analyzer_version": target, "processed": processed, "changed": changed}
+
+    async def start(self, session_factory) -> None:
+        self._task = asyncio.create_task(self._watch(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._shutdown_pool()
+
+    async def _watch(self, session_factory) -> None:
+        """Run once at startup, then again whenever the analyzer version changes (KB reload)."""
+        while True:
+            target = analyzer_version(symptom_kb.index)
+            if target != self._done_version:
+                try:
+                    await self.run(session_factory)
+                    self._done_version = target
+                except Exception as e:
+                    logger.error(f"Symptom log re-analysis failed: {e}")
+            if self.poll_seconds <= 0:
+                return
+            await asyncio.sleep(self.poll_seconds)
+
+
+symptom_reanalysis = SymptomReanalysisJob(
+    workers=settings.SYMPTOM_REANALYZE_WORKERS,
+    chunk_size=settings.SYMPTOM_REANALYZE_CHUNK,
+    duty=settings.SYMPTOM_REANALYZE_DUTY,
+    poll_seconds=settings.SYMPTOM_KB_RELOAD_SECONDS,
+)
+
+
+async def _main(force: bool) -> None:
+    from core.database import AsyncSessionLocal, init_db
+
+    await init_db()
+    summary = await symptom_reanalysis.run(AsyncSessionLocal, force=force)
+    print(f"Re-analyzed {summary['processed']} symptom logs, {summary['changed']} changed "
+          f"(analyzer {summary['analyzer_version']}).")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-analyze stored symptom logs with the current analyzer.")
+    parser.add_argument("--force", action="store_true", help="re-analyze logs already on the current version")
+    asyncio.run(_main(parser.parse_args().force))
@@ -0,0 +1,135 @@
+"""
+Streaming upload persistence.
+
+Uploaded files are copied to a local staging file chunk by chunk with the
+blocking writes pushed to a worker thread, hashing (SHA-256) and enforcing the
+size limit as bytes arrive, so peak memory per upload is one chunk. The
+finished file is then published to the configured storage backend under its
+content hash, so identical files share one copy.
+
+Publishing comes after the upload has taken its reference on the blob
+(services.blob_store.acquire_blob), in the same transaction. Deleting the
+last reference removes the file before that transaction commits, so a
+concurrent upload of the same bytes either holds a reference first (and the
+file is kept) or takes it after the delete, and then publishes the file again.
+
+Starlette spools the whole multipart body to a temporary file before the
+route runs, so UploadSizeLimit caps the raw request body of upload routes as
+it arrives: a Content-Length over the limit is rejected up front, and a body
+that crosses it mid-stream (chunked, or a lying header) is cut off with 413.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional, Set
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.storage import storage
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024            # 1 MB
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024        # 10 MB
+MULTIPART_OVERHEAD_BYTES = 64 * 1024       # boundaries and part headers around the file
+UPLOAD_TOO_LARGE_DETAIL = "File size cannot exceed 10MB."
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit while streaming."""
+
+
+class UploadSizeLimit:
+    """ASGI middleware: 413 for request bodies over max_bytes on the given paths."""
+
+    def __init__(self, app: ASGIApp, paths: Set[str], max_bytes: int = MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.paths = paths
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": UPLOAD_TOO_LARGE_DETAIL}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing; FastAPI re-raises HTTPExceptions as-is
+                    raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+@dataclass
+class StagedUpload:
+    path: str  # local staging file, consumed by publish_upload
+    size: int
+    sha256: str
+
+
+async def stage_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> StagedUpload:
+    """Stream `upload` to a staging file, hashing it; publish or discard it afterwards."""
+    return await _stream_to_file(upload, storage.staging_path(), max_bytes)
+
+
+async def publish_upload(staged: StagedUpload, key: str, content_type: Optional[str] = None) -> bool:
+    """
+    Publish the staged file under `key`, consuming it. If that key already
+    exists the new copy is discarded, so byte-identical uploads share one
+    stored file. Returns True if the file was written.
+    """
+    return await storage.put_file(staged.path, key, content_type)
+
+
+async def discard_upload(staged: StagedUpload) -> None:
+    """Remove the staging file if it wasn't published."""
+    await asyncio.to_thread(remove_file_quietly, staged.path)
+
+
+async def _stream_to_file(upload: UploadFile, tmp_path: str, max_bytes: int) -> StagedUpload:
+    """Copy the upload to `tmp_path` chunk by chunk; removes the file on any failure."""
+    digest = hashlib.sha256()
+    size = 0
+
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes.")
+            digest.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+        await asyncio.to_thread(f.close)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(remove_file_quietly, tmp_path)
+        raise
+
+    return StagedUpload(path=tmp_path, size=size, sha256=digest.hexdigest())
+
+
+def remove_file_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
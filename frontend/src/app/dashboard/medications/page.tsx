@@ -7,6 +7,7 @@ import { useToast } from "@/components/Toast";
 export default function MedicationsPage() {
     const { toast } = useToast();
     const [meds, setMeds] = useState<any[]>([]);
+    const [adherence, setAdherence] = useState<Record<string, any>>({});
     const [name, setName] = useState("");
     const [dosage, setDosage] = useState("");
     const [frequency, setFrequency] = useState("");
@@ -16,6 +17,14 @@ export default function MedicationsPage() {
 
     const load = async () => {
         try { setMeds(await api("/api/v1/medications/")); } catch { }
+        loadAdherence();
+    };
+
+    const loadAdherence = async () => {
+        try {
+            const data = await api("/api/v1/medications/adherence");
+            setAdherence(Object.fromEntries(data.medications.map((a: any) => [a.medication_id, a])));
+        } catch { }
     };
 
     const addMed = async () => {
@@ -43,6 +52,7 @@ export default function MedicationsPage() {
                 body: JSON.stringify({ medication_id: medId, taken }),
             });
             toast(taken ? "Marked as taken ✅" : "Marked as missed", taken ? "success" : "warning");
+            loadAdherence();
         } catch (err: any) {
             toast(err.message, "error");
         }
@@ -86,6 +96,16 @@ export default function MedicationsPage() {
                                 <div>
                                     <span className="font-medium">💊 {m.name}</span>
                                     <span className="text-sm text-[var(--text-secondary)] ml-2">{m.dosage} — {m.frequency}</span>
+                                    {adherence[m.id]?.last_logged && (
+                                        <p className="text-xs text-[var(--text-secondary)] mt-1">
+                                            {["7d", "30d", "90d"].map((w) => {
+                                                const pct = adherence[m.id].windows[w].adherence_pct;
+                                                return `${w} ${pct === null ? "—" : `${pct}%`}`;
+                                            }).join(" · ")}
+                                            {adherence[m.id].current_streak > 0 && ` · 🔥 ${adherence[m.id].current_streak}-day streak`}
+                                            {` · best ${adherence[m.id].longest_streak}`}
+                                        </p>
+                                    )}
                                 </div>
                                 <div className="flex gap-2">
                                     <button onClick={() => logMed(m.id, true)} className="text-xs px-3 py-1.5 rounded-lg bg-[var(--color-success-500)]/10 text-[var(--color-success-500)] hover:bg-[var(--color-success-500)]/20 transition font-medium">
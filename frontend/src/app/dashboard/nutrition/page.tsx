@@ -95,6 +95,29 @@ export default function NutritionPage() {
                         </div>
                     )}
 
+                    {result.diet_recommendations?.meal_plan?.days?.length > 0 && (
+                        <div className="glass-card p-6">
+                            <h3 className="font-semibold mb-1">📅 7-Day Plan</h3>
+                            <p className="text-xs text-[var(--text-secondary)] mb-3">
+                                Target {result.diet_recommendations.meal_plan.targets.kcal} kcal/day · protein {result.diet_recommendations.meal_plan.targets.protein_g} g · carbs {result.diet_recommendations.meal_plan.targets.carbs_g} g · fat {result.diet_recommendations.meal_plan.targets.fat_g} g
+                                {result.diet_recommendations.meal_plan.excluded_allergens?.length > 0 && ` · excludes ${result.diet_recommendations.meal_plan.excluded_allergens.join(", ")}`}
+                            </p>
+                            <div className="space-y-2">
+                                {result.diet_recommendations.meal_plan.days.map((d: any) => (
+                                    <div key={d.day} className="p-3 rounded-xl bg-[var(--bg)] text-sm">
+                                        <div className="flex justify-between font-medium">
+                                            <span>Day {d.day}</span>
+                                            <span className="text-xs text-[var(--text-secondary)]">{Math.round(d.totals.kcal)} kcal · {d.servings}× servings</span>
+                                        </div>
+                                        {["breakfast", "lunch", "dinner", "snack"].map((meal) => (
+                                            <p key={meal} className="text-[var(--text-secondary)]"><span className="capitalize">{meal}</span>: {d.meals[meal]}</p>
+                                        ))}
+                                    </div>
+                                ))}
+                            </div>
+                        </div>
+                    )}
+
                     <div className="grid sm:grid-cols-2 gap-4">
                         {result.diet_recommendations?.foods_to_increase?.length > 0 && (
                             <div className="glass-card p-6">
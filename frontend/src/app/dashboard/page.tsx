@@ -7,7 +7,7 @@ import { useAuth } from "@/lib/auth";
 interface DashboardData {
     user_name: string;
     health_score: number;
-    latest_risks: Record<string, { disease_type: string; risk_score: number; risk_category: string }>;
+    latest_risks: Record<string, { disease_type: string; risk_score: number; risk_category: string; percentile?: number | null; percentile_cohort?: string | null }>;
     total_assessments: number;
     total_symptom_checks: number;
     total_reports: number;
@@ -93,7 +93,14 @@ export default function DashboardPage() {
                                         <span className="font-medium">{r.disease_type.replace("_", " ").replace(/\b\w/g, c => c.toUpperCase())}</span>
                                         <span className={`ml-2 text-xs px-2 py-0.5 rounded-full risk-${r.risk_category}`}>{r.risk_category}</span>
                                     </div>
-                                    <span className="font-bold">{(r.risk_score * 100).toFixed(0)}%</span>
+                                    <div className="text-right">
+                                        <span className="font-bold">{(r.risk_score * 100).toFixed(0)}%</span>
+                                        {r.percentile != null && (
+                                            <div className="text-xs text-[var(--text-secondary)]">
+                                                Higher than {r.percentile.toFixed(0)}% ({r.percentile_cohort === "all" ? "all ages" : `age ${r.percentile_cohort}`})
+                                            </div>
+                                        )}
+                                    </div>
                                 </div>
                             ))}
                         </div>
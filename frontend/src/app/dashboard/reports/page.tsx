@@ -1,13 +1,14 @@
 "use client";
 
 import { useState, useEffect } from "react";
-import { api } from "@/lib/api";
+import { api, apiBlob } from "@/lib/api";
 import { useToast } from "@/components/Toast";
 
 export default function ReportsPage() {
     const { toast } = useToast();
     const [reports, setReports] = useState<any[]>([]);
     const [uploading, setUploading] = useState(false);
+    const [progress, setProgress] = useState("");
     const [selected, setSelected] = useState<any>(null);
 
     useEffect(() => { loadReports(); }, []);
@@ -26,14 +27,33 @@ export default function ReportsPage() {
         try {
             const form = new FormData();
             form.append("file", file);
-            const res = await api("/api/v1/reports/upload", { method: "POST", body: form });
-            setSelected(res);
+            const res: any = await api("/api/v1/reports/upload", { method: "POST", body: form });
+            loadReports();
+            // Analysis runs in the background — poll until the job finishes
+            let status: any = { job_status: "queued" };
+            while (status.job_status !== "succeeded" && status.job_status !== "failed") {
+                await new Promise((r) => setTimeout(r, 1500));
+                status = await api(`/api/v1/reports/${res.id}/status`);
+                if (status.pages_total > 1) setProgress(` page ${status.pages_done ?? 0}/${status.pages_total}`);
+            }
+            if (status.job_status === "failed") throw new Error("Report analysis failed. Please try again.");
+            setSelected(await api(`/api/v1/reports/${res.id}`));
             toast("Report analyzed successfully!", "success");
             loadReports();
         } catch (err: any) {
             toast(err.message, "error");
         } finally {
             setUploading(false);
+            setProgress("");
+        }
+    };
+
+    const openOriginal = async (fileUrl: string) => {
+        try {
+            const blob = await apiBlob(fileUrl);
+            window.open(URL.createObjectURL(blob), "_blank");
+        } catch (err: any) {
+            toast(err.message, "error");
         }
     };
 
@@ -58,7 +78,7 @@ export default function ReportsPage() {
                     <input type="file" accept=".pdf,.png,.jpg,.jpeg" onChange={upload} className="hidden" />
                     <div className="border-2 border-dashed border-[var(--border)] rounded-2xl p-8 hover:border-[var(--color-primary-500)] transition-colors">
                         <div className="text-4xl mb-3">📤</div>
-                        <p className="font-semibold">{uploading ? "Analyzing..." : "Click to upload a report"}</p>
+                        <p className="font-semibold">{uploading ? `Analyzing${progress}...` : "Click to upload a report"}</p>
                         <p className="text-sm text-[var(--text-secondary)] mt-1">Supports PDF, PNG, JPG — Max 10MB</p>
                     </div>
                 </label>
@@ -76,7 +96,16 @@ export default function ReportsPage() {
                                 className="w-full flex items-center justify-between p-3 rounded-xl bg-[var(--bg)] hover:bg-[var(--bg-card-hover)] transition text-left"
                             >
                                 <div className="flex items-center gap-3">
-                                    <span className="text-xl">{r.file_type === "pdf" ? "📄" : "🖼️"}</span>
+                                    {r.preview_url ? (
+                                        <Thumbnail src={r.preview_url} alt={r.file_name} />
+                                    ) : (
+                                        <span
+                                            className="text-xl"
+                                            title={r.preview_status === "unavailable" ? "No preview available for this file" : "Preview is being generated"}
+                                        >
+                                            {r.file_type === "pdf" ? "📄" : "🖼️"}
+                                        </span>
+                                    )}
                                     <div>
                                         <span className="font-medium text-sm">{r.file_name}</span>
                                         {r.abnormal_flags?.length > 0 && (
@@ -99,7 +128,14 @@ export default function ReportsPage() {
             {selected && (
                 <div className="space-y-4 animate-fade-in-up">
                     <div className="glass-card p-6">
-                        <h2 className="font-semibold mb-3">📊 Lab Values</h2>
+                        <div className="flex justify-between items-center mb-3">
+                            <h2 className="font-semibold">📊 Lab Values</h2>
+                            {selected.file_url && (
+                                <button onClick={() => openOriginal(selected.file_url)} className="text-xs text-[var(--color-primary-500)] hover:underline">
+                                    View original
+                                </button>
+                            )}
+                        </div>
                         <div className="grid sm:grid-cols-2 gap-3">
                             {selected.extracted_values && Object.entries(selected.extracted_values).map(([name, v]: [string, any]) => (
                                 <div key={name} className={`p-3 rounded-xl border ${v.status === "normal" ? "border-[var(--color-success-500)]/20 bg-[var(--color-success-500)]/5" :
@@ -122,6 +158,9 @@ export default function ReportsPage() {
                         <div className="glass-card p-6">
                             <h2 className="font-semibold mb-3">🤖 AI Summary</h2>
                             <p className="text-sm text-[var(--text-secondary)] whitespace-pre-wrap leading-relaxed">{selected.ai_summary}</p>
+                            {selected.summary_needs_reanalysis && (
+                                <p className="text-xs text-[var(--color-warning-500)] mt-3">⚠️ Your results were re-checked against ranges for your age and sex, so this summary was rebuilt from the values. A detailed AI summary needs the report to be analyzed again.</p>
+                            )}
                         </div>
                     )}
                 </div>
@@ -129,3 +168,24 @@ export default function ReportsPage() {
         </div>
     );
 }
+
+/** Authenticated preview image; the browser cache serves repeat views (immutable, ETag). */
+function Thumbnail({ src, alt }: { src: string; alt: string }) {
+    const [url, setUrl] = useState<string | null>(null);
+
+    useEffect(() => {
+        let objectUrl: string | null = null;
+        apiBlob(src)
+            .then((blob) => {
+                objectUrl = URL.createObjectURL(blob);
+                setUrl(objectUrl);
+            })
+            .catch(() => setUrl(null));
+        return () => {
+            if (objectUrl) URL.revokeObjectURL(objectUrl);
+        };
+    }, [src]);
+
+    if (!url) return <span className="w-10 h-10 rounded-lg bg-[var(--bg-card-hover)]" />;
+    return <img src={url} alt={alt} className="w-10 h-10 rounded-lg object-cover" />;
+}
@@ -7,7 +7,8 @@ import { useToast } from "@/components/Toast";
 export default function RiskPage() {
     const { toast } = useToast();
     const [loading, setLoading] = useState(false);
-    const [result, setResult] = useState<any>(null);
+    const [results, setResults] = useState<any[]>([]);
+    const [whatIf, setWhatIf] = useState<any>(null);
     const [form, setForm] = useState({
         age: "", bmi: "", glucose: "", cholesterol: "",
         blood_pressure_systolic: "", blood_pressure_diastolic: "",
@@ -21,7 +22,7 @@ export default function RiskPage() {
         return typeof n === "number" && !Number.isNaN(n) ? n : undefined;
     };
 
-    const assess = async (type: "diabetes" | "heart-disease") => {
+    const assess = async () => {
         const age = num(form.age);
         const bmi = num(form.bmi);
         const systolic = num(form.blood_pressure_systolic);
@@ -47,9 +48,24 @@ export default function RiskPage() {
             const insulinVal = num(form.insulin);
             if (insulinVal != null) body.insulin = insulinVal;
 
-            const res = await api(`/api/v1/risk/${type}`, { method: "POST", body: JSON.stringify(body) });
-            setResult(res);
+            // Every disease model in one request
+            const res = await api("/api/v1/risk/assess", { method: "POST", body: JSON.stringify(body) });
+            setResults(res);
             toast("Assessment complete! Results saved.", "success");
+            // Sensitivity grid for the highest risk (not saved): lower BMI × lower systolic BP
+            const top = res.reduce((a: any, b: any) => (b.risk_score > a.risk_score ? b : a));
+            setWhatIf(null);
+            api("/api/v1/risk/what-if", {
+                method: "POST",
+                body: JSON.stringify({
+                    disease_type: top.disease_type,
+                    base: body,
+                    axes: [
+                        { feature: "bmi", min_delta: -5, max_delta: 0, steps: 6 },
+                        { feature: "blood_pressure_systolic", min_delta: -20, max_delta: 0, steps: 5 },
+                    ],
+                }),
+            }).then(setWhatIf).catch(() => setWhatIf(null));
         } catch (err: any) {
             toast(err.message, "error");
         } finally {
@@ -99,22 +115,15 @@ export default function RiskPage() {
                     <button
                         className="btn-primary flex-1"
                         disabled={loading || !form.age?.trim() || !form.bmi?.trim() || !form.blood_pressure_systolic?.trim() || !form.blood_pressure_diastolic?.trim()}
-                        onClick={() => assess("diabetes")}
+                        onClick={assess}
                     >
-                        {loading ? "Analyzing..." : "🫀 Diabetes Risk"}
-                    </button>
-                    <button
-                        className="btn-secondary flex-1"
-                        disabled={loading || !form.age?.trim() || !form.bmi?.trim() || !form.blood_pressure_systolic?.trim() || !form.blood_pressure_diastolic?.trim()}
-                        onClick={() => assess("heart-disease")}
-                    >
-                        {loading ? "Analyzing..." : "💓 Heart Disease Risk"}
+                        {loading ? "Analyzing..." : "🩺 Assess Diabetes & Heart Disease Risk"}
                     </button>
                 </div>
             </div>
 
-            {result && (
-                <div className="glass-card p-6 animate-fade-in-up">
+            {results.map((result) => (
+                <div key={result.id} className="glass-card p-6 animate-fade-in-up">
                     <div className="flex items-center justify-between mb-4">
                         <h2 className="font-semibold text-lg">{result.disease_type.replace("_", " ").replace(/\b\w/g, (c: string) => c.toUpperCase())} Risk</h2>
                         <span className={`text-sm px-3 py-1 rounded-full font-semibold risk-${result.risk_category}`}>
@@ -148,7 +157,50 @@ export default function RiskPage() {
                         </div>
                     </div>
 
+                    {result.percentile != null && (
+                        <p className="text-sm mb-4">
+                            Higher than <span className="font-semibold">{result.percentile.toFixed(0)}%</span> of assessments
+                            {result.percentile_cohort === "all" ? "" : ` for ages ${result.percentile_cohort}`}
+                        </p>
+                    )}
+
                     <p className="text-sm text-[var(--text-secondary)] leading-relaxed">{result.explanation}</p>
+                    {result.model_version && (
+                        <p className="text-xs text-[var(--text-secondary)] mt-2">Model version: {result.model_version}</p>
+                    )}
+                </div>
+            ))}
+
+            {results.length > 0 && whatIf && (
+                <div className="glass-card p-6 animate-fade-in-up">
+                    <h2 className="font-semibold text-lg mb-1">What If? ({whatIf.disease_type.replace("_", " ")})</h2>
+                    <p className="text-sm text-[var(--text-secondary)] mb-4">Estimated risk if your BMI (rows) and systolic blood pressure (columns) were lower.</p>
+                    <div className="overflow-x-auto">
+                        <table className="w-full text-sm text-center">
+                            <thead>
+                                <tr>
+                                    <th className="p-2 text-xs text-[var(--text-secondary)]">BMI / BP</th>
+                                    {whatIf.axes[1].values.map((v: number) => (
+                                        <th key={v} className="p-2 text-xs text-[var(--text-secondary)]">{v.toFixed(0)}</th>
+                                    ))}
+                                </tr>
+                            </thead>
+                            <tbody>
+                                {whatIf.scores.map((row: number[], i: number) => (
+                                    <tr key={i}>
+                                        <td className="p-2 text-xs text-[var(--text-secondary)]">{whatIf.axes[0].values[i].toFixed(1)}</td>
+                                        {row.map((score: number, j: number) => (
+                                            <td key={j} className="p-1">
+                                                <span className={`block rounded-md py-1 text-xs font-semibold risk-${whatIf.categories[i][j]}`}>
+                                                    {(score * 100).toFixed(0)}%
+                                                </span>
+                                            </td>
+                                        ))}
+                                    </tr>
+                                ))}
+                            </tbody>
+                        </table>
+                    </div>
                 </div>
             )}
         </div>
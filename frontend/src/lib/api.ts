@@ -78,3 +78,13 @@ export async function api<T = unknown>(
 
     return res.json();
 }
+
+/** Fetch an authenticated file (e.g. an uploaded report) as a Blob. */
+export async function apiBlob(path: string): Promise<Blob> {
+    const token = getToken();
+    const res = await fetch(`${API_BASE}${path}`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+    });
+    if (!res.ok) throw new Error(res.status === 404 ? "File not found." : `Error ${res.status}`);
+    return res.blob();
+}